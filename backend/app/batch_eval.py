@@ -0,0 +1,79 @@
+"""
+Batch evaluation CLI for POST /api/chat/batch.
+
+Reads conversation scripts (JSONL, one per line) and streams the per-turn
+NDJSON results to a file or stdout as the server produces them. A line is
+either a list of messages or an object:
+
+    ["Hi", "I need a home loan", "Ravi", "Pune", "80000", "3 months"]
+    {"session_id": "eval-7", "messages": ["What is the cheapest home loan?"], "model": "GPT-4"}
+
+Run from backend/ against a running app:
+
+    python -m app.batch_eval scripts.jsonl --route rag-chat --concurrency 8 --out results.ndjson
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, List
+
+import httpx
+
+
+def load_scripts(path: str) -> List[Dict[str, Any]]:
+    scripts = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            script = json.loads(line)
+            scripts.append({"messages": script} if isinstance(script, list) else script)
+    return scripts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay conversation scripts through the batch chat endpoint.")
+    parser.add_argument("scripts", help="JSONL file, one script per line")
+    parser.add_argument("--url", default="http://127.0.0.1:8029")
+    parser.add_argument("--route", choices=["chat", "rag-chat"], default="chat")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--budget-ms", type=int, default=None, help="per-turn request budget")
+    parser.add_argument("--out", default=None, help="NDJSON output file (default: stdout)")
+    args = parser.parse_args()
+
+    body = {
+        "route": args.route,
+        "concurrency": args.concurrency,
+        "request_budget_ms": args.budget_ms,
+        "scripts": load_scripts(args.scripts),
+    }
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    summary = None
+    try:
+        with httpx.stream("POST", f"{args.url.rstrip('/')}/api/chat/batch", json=body, timeout=None) as response:
+            if response.status_code != 200:
+                response.read()
+                sys.exit(f"❌ {response.status_code}: {response.text}")
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                record = json.loads(line)
+                if "summary" in record:
+                    summary = record["summary"]
+                    continue
+                out.write(line + "\n")
+                out.flush()
+                if record["status"] != 200:
+                    print(f"⚠️ script {record['script']} turn {record['turn']}: {record['status']} {record.get('error')}",
+                          file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if summary:
+        print(json.dumps(summary, indent=2), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
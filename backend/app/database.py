@@ -11,8 +11,8 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise Exception("❌ DATABASE_URL is not set in .env")
 
-# Async SQLAlchemy engine
-engine = create_async_engine(DATABASE_URL, echo=True)
+# Async SQLAlchemy engine (SQL_ECHO=0 silences per-statement logging, e.g. under load tests)
+engine = create_async_engine(DATABASE_URL, echo=os.getenv("SQL_ECHO", "1").lower() not in ("0", "false", "no"))
 
 # Async session factory
 async_session_maker = sessionmaker(
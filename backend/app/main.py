@@ -1,16 +1,26 @@
-from fastapi import FastAPI, UploadFile, File, Response
+from fastapi import FastAPI, HTTPException, Request, UploadFile, File, Response
+from fastapi.responses import JSONResponse
 from sqlalchemy import text
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
 from app.agent import run_agent
 from app.preprocessing import preprocess_text
 from app.routers.routes import router
-from app.routers import intent, chat, rag_chat, websocket
+from app.routers import analytics, intent, batch, chat, rag_chat, rates, simulation, usage, websocket
 from app.database import engine
-from app.services.OpenAIClient import OpenAIClient
+from app.services.admission import AdmissionRejected, admission_controller
+from app.services.analytics import ANALYTICS_REFRESH_SECONDS, refresh_periodically
+from app.services.deadline import DeadlineExceeded
+from app.services.intent_storage import ensure_partitions, storage_report
+from app.services.llm_router import get_llm_router
 from app.services.Serper import SerperClient
 from app.models.intent import Intent
+from app.rag.embeddings import aembed_text, embedding_cache_stats
+from app.rag.load_knowledge import aget_vector_store, vector_store_ready
+from app.startup import profiler, PROFILE_STARTUP
+from app.observability import metrics_payload, track_db_pool
 
+import asyncio
 import os
 load_dotenv()
 
@@ -20,6 +30,11 @@ app = FastAPI()
 app.include_router(intent.router)
 app.include_router(chat.router, prefix="/api")
 app.include_router(rag_chat.router, prefix="/api")
+app.include_router(batch.router, prefix="/api")
+app.include_router(simulation.router, prefix="/api")
+app.include_router(rates.router, prefix="/api")
+app.include_router(usage.router)
+app.include_router(analytics.router)
 app.include_router(router)
 app.include_router(websocket.router)
 
@@ -35,32 +50,99 @@ app.add_middleware(
 
 # Clients
 serper_client = SerperClient()
-openai_api_key = os.getenv("OPENAI_API_KEY")
-if not openai_api_key:
-    raise RuntimeError("❌ OPENAI_API_KEY is not set.")
-openai_client = OpenAIClient(openai_api_key)
+if not (os.getenv("OPENAI_API_KEY") or os.getenv("GEMINI_API_KEY")):
+    raise RuntimeError("❌ Neither OPENAI_API_KEY nor GEMINI_API_KEY is set.")
+llm_client = get_llm_router()
+track_db_pool(engine.pool)
+
+async def warm_up():
+    """
+    Load the embedding model and build the FAQ index. Requests that need them
+    before this finishes simply wait for the same shared initialization.
+    """
+    try:
+        with profiler.phase("embedding_model"):
+            await aembed_text("warm up")
+        with profiler.phase("knowledge_index"):
+            await aget_vector_store()
+        print("✅ Embedding model and knowledge index ready.")
+    except Exception as e:
+        print("❌ Warm-up failed:", str(e))
+    if PROFILE_STARTUP:
+        print(profiler.report())
 
 @app.on_event("startup")
 async def startup():
     print("Connecting to database and creating tables...")
-    try:
-        async with engine.begin() as conn:
-            await conn.run_sync(Intent.metadata.create_all)
-        print("✅ DB connection and table creation successful.")
-    except Exception as e:
-        print("❌ DB connection failed:", str(e))
+    with profiler.phase("database"):
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Intent.metadata.create_all)
+                await conn.run_sync(ensure_partitions)  # monthly intents partitions on PostgreSQL
+            print("✅ DB connection and table creation successful.")
+        except Exception as e:
+            print("❌ DB connection failed:", str(e))
+    if ANALYTICS_REFRESH_SECONDS > 0:
+        app.state.analytics_task = asyncio.create_task(refresh_periodically())
+
+    # background (default): bind immediately and warm up behind /ready; blocking: finish before serving
+    if os.getenv("STARTUP_WARMUP", "background") == "blocking":
+        await warm_up()
+    else:
+        app.state.warmup_task = asyncio.create_task(warm_up())
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "reason": exc.reason},
+        headers={"Retry-After": str(max(1, round(exc.retry_after)))},
+    )
 
 @app.get("/")
 async def health_check():
     print("Health check passed!")
     return Response(status_code=200)
 
+@app.get("/ready")
+async def readiness_check():
+    return Response(status_code=200 if vector_store_ready() else 503)
+
+@app.get("/embeddings/cache")
+async def embeddings_cache():
+    return embedding_cache_stats()
+
 @app.get("/openai")
 def openai_api_call(model: str = "gpt-4", question: str = "What is the capital of France?"):
-    openai_client.set_model(model)
-    answer = openai_client.generate_response(question)
+    try:
+        llm_client.set_model(model)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    answer = llm_client.generate_response(question)
     return {"answer": answer}
 
+@app.get("/llm/health")
+async def llm_health():
+    return llm_client.health()
+
+@app.get("/admission")
+async def admission_stats():
+    return admission_controller.stats()
+
+@app.get("/storage")
+async def storage():
+    async with engine.connect() as conn:
+        return await conn.run_sync(storage_report)
+
+@app.get("/metrics")
+async def metrics():
+    body, content_type = metrics_payload()
+    return Response(content=body, media_type=content_type)
+
 @app.post("/run-agent")
 async def run_agent_route(prompt: str):
     response = run_agent(prompt)
@@ -0,0 +1,52 @@
+from sqlalchemy import Column, Integer, String, DateTime, Date
+from datetime import datetime
+
+from app.models.intent import Base
+
+# Conversation analytics rollups, maintained from `intents` by app.services.analytics.
+# Sessions and funnel stages are counted on the day the session started; turns on the day they happened.
+
+
+class AnalyticsDaily(Base):
+    __tablename__ = 'analytics_daily'
+
+    day = Column(Date, primary_key=True)
+    sessions = Column(Integer, nullable=False, default=0)  # sessions started this day
+    turns = Column(Integer, nullable=False, default=0)     # turns saved this day
+    # Sessions (by start day) that reached each stage of the funnel
+    greeting = Column(Integer, nullable=False, default=0)
+    loan_inquiry = Column(Integer, nullable=False, default=0)
+    loan_rag = Column(Integer, nullable=False, default=0)
+    farewell = Column(Integer, nullable=False, default=0)
+    high_income_check = Column(Integer, nullable=False, default=0)
+    irrelevant = Column(Integer, nullable=False, default=0)
+
+
+class AnalyticsDailyLoanType(Base):
+    __tablename__ = 'analytics_daily_loan_types'
+
+    day = Column(Date, primary_key=True)
+    loan_type = Column(String, primary_key=True)        # "unknown" until the user names one
+    sessions = Column(Integer, nullable=False, default=0)  # sessions (by start day) whose first known loan type this is
+    turns = Column(Integer, nullable=False, default=0)
+
+
+class AnalyticsSession(Base):
+    """Per-session state the rollups need to count each session and funnel stage once."""
+    __tablename__ = 'analytics_sessions'
+
+    session_id = Column(String, primary_key=True)
+    first_day = Column(Date, nullable=False)
+    last_at = Column(DateTime, nullable=False)
+    turns = Column(Integer, nullable=False, default=0)
+    stages = Column(Integer, nullable=False, default=0)  # bitmask of FUNNEL_STAGES reached
+    loan_type = Column(String, nullable=True)
+
+
+class AnalyticsWatermark(Base):
+    __tablename__ = 'analytics_watermark'
+
+    name = Column(String, primary_key=True)
+    last_intent_id = Column(Integer, nullable=False, default=0)  # intents rows up to this id are counted (if committed within the lag)
+    last_created_at = Column(DateTime, nullable=True)  # created_at of that row, to skip older partitions
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
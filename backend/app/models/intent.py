@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, JSON, DateTime
+from sqlalchemy import Column, Integer, String, Text, JSON, DateTime, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
@@ -9,6 +9,8 @@ Base = declarative_base()
 
 class Intent(Base):
     __tablename__ = 'intents'
+    # Every turn reads the session's latest row; on PostgreSQL the table is partitioned by month on created_at
+    __table_args__ = (Index('ix_intents_session_created', 'session_id', 'created_at'),)
 
     id = Column(Integer, primary_key=True, index=True)
 
@@ -21,7 +23,7 @@ class Intent(Base):
 
     # 🔑 Identifiers for user and session tracking
     user_uuid = Column(UUID(as_uuid=True), index=True, nullable=False)
-    session_id = Column(String, index=True, nullable=False)
+    session_id = Column(String, nullable=False)  # indexed together with created_at
 
     # 💬 Conversation log
     user_message = Column(Text, nullable=False)
@@ -37,6 +39,24 @@ class Intent(Base):
     # 📦 Structured payloads
     parameters = Column(JSON, nullable=True)  # location, income, timeline, etc.
     context = Column(JSON, nullable=True)     # chatbot state or summary
+    llm_usage = Column(JSON, nullable=True)   # tokens / latency / cost of this turn's LLM calls + session totals
 
     # 🕒 Timestamp
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class SessionSummary(Base):
+    """One row per session whose turns were compacted by the retention job (app.services.intent_storage)."""
+    __tablename__ = 'session_summaries'
+
+    session_id = Column(String, primary_key=True)
+    user_uuid = Column(UUID(as_uuid=True), index=True, nullable=False)
+    turns = Column(Integer, nullable=False, default=0)
+    first_at = Column(DateTime, nullable=False)
+    last_at = Column(DateTime, nullable=False)
+    intents = Column(JSON, nullable=True)       # intent -> turns
+    answer_tiers = Column(JSON, nullable=True)  # answer tier -> turns
+    parameters = Column(JSON, nullable=True)    # merged parameters as of the last compacted turn
+    memory = Column(JSON, nullable=True)        # rolling memory state as of the last compacted turn
+    llm_usage = Column(JSON, nullable=True)     # {"session_totals": ...} as of the last compacted turn
+    compacted_at = Column(DateTime, default=datetime.utcnow, nullable=False)
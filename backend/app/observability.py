@@ -0,0 +1,151 @@
+"""
+Per-stage latency metrics and sampled structured logs.
+
+Routes call `start_request(route, model)` once, wrap each stage in
+`with span("vector_search"): ...`, and `record_outcome(intent)` when the turn
+is persisted. Everything is exported in Prometheus format on GET /metrics,
+labelled by route, model and (for whole requests) intent outcome.
+
+Hot-path diagnostics go through `log_event(...)`: one JSON line per event,
+emitted for a LOG_SAMPLE_RATE fraction of calls instead of a print per call.
+"""
+import json
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.05"))
+
+# LLM stages dominate: buckets reach well past the default 10 s ceiling
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+STAGE_LATENCY = Histogram(
+    "loanbot_stage_duration_seconds", "Time spent in one stage of a chat turn",
+    ["route", "model", "stage"], buckets=LATENCY_BUCKETS,
+)
+STAGE_ERRORS = Counter(
+    "loanbot_stage_errors_total", "Stages that raised", ["route", "model", "stage"],
+)
+REQUEST_LATENCY = Histogram(
+    "loanbot_request_duration_seconds", "End-to-end chat turn latency",
+    ["route", "model", "intent"], buckets=LATENCY_BUCKETS,
+)
+REQUESTS = Counter(
+    "loanbot_requests_total", "Chat turns by outcome", ["route", "model", "intent"],
+)
+LLM_CALLS = Counter(
+    "loanbot_llm_calls_total", "LLM provider calls", ["provider", "model", "outcome"],
+)
+LLM_LATENCY = Histogram(
+    "loanbot_llm_call_duration_seconds", "LLM provider call latency",
+    ["provider", "model"], buckets=LATENCY_BUCKETS,
+)
+DB_POOL_CHECKED_OUT = Gauge("loanbot_db_pool_checked_out", "DB connections currently checked out of the pool")
+DB_POOL_SIZE = Gauge("loanbot_db_pool_size", "DB connections held open by the pool")
+
+logger = logging.getLogger("loanbot")
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class RequestTrace:
+    def __init__(self, route: str, model: str):
+        self.route = route
+        self.model = model
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.recorded = False
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+_current_stage: ContextVar[Optional[str]] = ContextVar("request_stage", default=None)
+
+
+def start_request(route: str, model: str = "") -> RequestTrace:
+    trace = RequestTrace(route, model)
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+def current_stage() -> Optional[str]:
+    """Name of the innermost span being timed (used to attribute LLM usage to a stage)."""
+    return _current_stage.get()
+
+
+@contextmanager
+def span(stage: str):
+    """Time one stage of the current request (a no-op label set outside a request)."""
+    trace = _current_trace.get()
+    route, model = (trace.route, trace.model) if trace else ("none", "")
+    stage_token = _current_stage.set(stage)
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.labels(route, model, stage).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        _current_stage.reset(stage_token)
+        STAGE_LATENCY.labels(route, model, stage).observe(elapsed)
+        if trace:
+            trace.stages[stage] = trace.stages.get(stage, 0.0) + elapsed
+
+
+def record_outcome(intent: str) -> None:
+    """Close the current request: count it under `intent` and log its stage breakdown (sampled)."""
+    trace = _current_trace.get()
+    if trace is None or trace.recorded:
+        return
+    trace.recorded = True
+    elapsed = time.perf_counter() - trace.started
+    REQUESTS.labels(trace.route, trace.model, intent).inc()
+    REQUEST_LATENCY.labels(trace.route, trace.model, intent).observe(elapsed)
+    log_event(
+        "request", route=trace.route, model=trace.model, intent=intent, total_ms=round(elapsed * 1000, 1),
+        stages_ms={stage: round(seconds * 1000, 1) for stage, seconds in trace.stages.items()},
+    )
+
+
+def record_llm_call(provider: str, model: str, seconds: float, outcome: str = "ok") -> None:
+    LLM_CALLS.labels(provider, model, outcome).inc()
+    if outcome == "ok":
+        LLM_LATENCY.labels(provider, model).observe(seconds)
+
+
+def log_event(event: str, sample_rate: Optional[float] = None, **fields) -> None:
+    """Emit `event` as one JSON line for a `sample_rate` fraction of calls."""
+    rate = LOG_SAMPLE_RATE if sample_rate is None else sample_rate
+    if rate < 1.0 and random.random() >= rate:
+        return
+    trace = _current_trace.get()
+    if trace and "route" not in fields:
+        fields["route"] = trace.route
+    logger.info(json.dumps({"event": event, **fields}, default=str, ensure_ascii=False))
+
+
+def track_db_pool(pool) -> None:
+    """Report `pool` usage on every scrape (pools without checkout accounting are skipped)."""
+    if hasattr(pool, "checkedout"):
+        DB_POOL_CHECKED_OUT.set_function(pool.checkedout)
+    if hasattr(pool, "size"):
+        DB_POOL_SIZE.set_function(pool.size)
+
+
+def metrics_payload():
+    """(body, content type) for the /metrics endpoint."""
+    return generate_latest(), CONTENT_TYPE_LATEST
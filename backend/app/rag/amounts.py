@@ -0,0 +1,42 @@
+"""
+Rupee amounts in free text: "₹80k", "Rs. 1.2 lakh", "up to ₹10 Crores".
+
+Shared by the rate table (facts in FAQ answers) and the loan simulation
+(incomes and amounts in chat messages).
+"""
+import re
+from typing import List, Optional
+
+# A number, optionally with a currency prefix and a unit; never a percentage ("10.30%")
+_AMOUNT = re.compile(
+    r"(?:₹|rs\.?|inr)?\s*(\d[\d,]*(?:\.\d+)?)(?!\.?\d|\s*%)\s*(k|thousand|lakhs?|lacs?|l|crores?|cr)?\b",
+    re.IGNORECASE,
+)
+_MULTIPLIERS = {"k": 1e3, "thousand": 1e3, "l": 1e5, "lakh": 1e5, "lakhs": 1e5, "lac": 1e5, "lacs": 1e5,
+                "cr": 1e7, "crore": 1e7, "crores": 1e7}
+
+
+def parse_amount(text: Optional[str]) -> Optional[float]:
+    """First rupee amount in `text`: "₹80k", "80,000", "1.2 lakh", "₹1 cr"."""
+    if text is None:
+        return None
+    if isinstance(text, (int, float)):
+        return float(text)
+    amounts = parse_amounts(text)
+    return amounts[0] if amounts else None
+
+
+def parse_amounts(text: str) -> List[float]:
+    """Every rupee amount in `text`, in order ("from Rs. 1 lakh to Rs. 20 lakhs" → [1e5, 2e6])."""
+    return [
+        float(match.group(1).replace(",", "")) * _MULTIPLIERS.get((match.group(2) or "").lower(), 1.0)
+        for match in _AMOUNT.finditer(text or "")
+    ]
+
+
+def format_inr(amount: float) -> str:
+    if amount >= 1e7:
+        return f"₹{amount / 1e7:.2f} crore"
+    if amount >= 1e5:
+        return f"₹{amount / 1e5:.2f} lakh"
+    return f"₹{amount:,.0f}"
@@ -0,0 +1,78 @@
+"""
+Parity check and latency benchmark for embedding backends.
+
+Parity: every FAQ question is embedded with each backend and compared to the
+reference backend (torch by default); we report mean / p99 / max cosine drift.
+Benchmark: median batch latency and throughput at batch sizes 1, 8 and 64.
+
+Usage (from backend/):
+    python -m app.rag.backend_bench --backends torch onnx onnx-int8
+"""
+import argparse
+import os
+import time
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from .backends import LOCAL_BACKENDS, create_backend
+
+CSV_PATH = os.path.join("Data", "loan_faq_dataset.csv")
+BATCH_SIZES = (1, 8, 64)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    return matrix / np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None)
+
+
+def cosine_drift(reference: np.ndarray, candidate: np.ndarray) -> Dict[str, float]:
+    drift = 1.0 - np.sum(_normalize(reference) * _normalize(candidate), axis=1)
+    return {
+        "mean": float(drift.mean()),
+        "p99": float(np.percentile(drift, 99)),
+        "max": float(drift.max()),
+    }
+
+
+def benchmark(backend, texts: List[str], batch_sizes=BATCH_SIZES, rounds: int = 20) -> Dict[int, Dict[str, float]]:
+    backend.encode(texts[:1])  # warm-up: load model, allocate arenas
+    results = {}
+    for batch_size in batch_sizes:
+        batch = (texts * (batch_size // len(texts) + 1))[:batch_size]
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            backend.encode(batch)
+            timings.append(time.perf_counter() - start)
+        median = float(np.median(timings))
+        results[batch_size] = {"latency_ms": median * 1000, "texts_per_sec": batch_size / median}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare embedding backends for drift and speed.")
+    parser.add_argument("--csv", default=CSV_PATH)
+    parser.add_argument("--backends", nargs="+", choices=LOCAL_BACKENDS, default=list(LOCAL_BACKENDS))
+    parser.add_argument("--reference", choices=LOCAL_BACKENDS, default="torch")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    texts = pd.read_csv(args.csv)["question"].dropna().astype(str).tolist()
+    names = [args.reference] + [b for b in args.backends if b != args.reference]
+    backends = {name: create_backend(name) for name in names}
+
+    reference = backends[args.reference].encode(texts)
+    for name, backend in backends.items():
+        drift = cosine_drift(reference, backend.encode(texts))
+        print(f"🧪 {name:>9} vs {args.reference}: cosine drift mean {drift['mean']:.2e} | "
+              f"p99 {drift['p99']:.2e} | max {drift['max']:.2e}")
+
+    for name, backend in backends.items():
+        for batch_size, stats in benchmark(backend, texts, rounds=args.rounds).items():
+            print(f"⏱️ {name:>9} batch={batch_size:<3} {stats['latency_ms']:8.2f} ms/batch "
+                  f"{stats['texts_per_sec']:9.1f} texts/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import os
+from threading import Lock
+from typing import Dict, List, Optional
+
+import numpy as np
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+ONNX_MODEL_DIR = os.getenv("EMBEDDING_ONNX_DIR", os.path.join("models", f"{MODEL_NAME}-onnx"))
+ONNX_MAX_LENGTH = 256  # same max_seq_length as the sentence-transformers model
+
+
+class EmbeddingBackend:
+    """
+    Turns a batch of texts into a float32 matrix (one row per text).
+    Implementations load their model lazily on the first encode().
+    """
+
+    name = "base"
+
+    @property
+    def model_id(self) -> str:
+        return f"{MODEL_NAME}/{self.name}"
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+
+class TorchBackend(EmbeddingBackend):
+    """SentenceTransformer on PyTorch (the original implementation)."""
+
+    name = "torch"
+
+    def __init__(self):
+        self._model = None
+        self._lock = Lock()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import SentenceTransformer
+                self._model = SentenceTransformer(MODEL_NAME)
+        return np.asarray(self._model.encode(texts, batch_size=max(1, len(texts))), dtype=np.float32)
+
+
+class OnnxBackend(EmbeddingBackend):
+    """
+    ONNX Runtime CPU inference of the exported model (see onnx_export.py).
+
+    Reproduces the sentence-transformers pipeline for all-MiniLM-L6-v2:
+    tokenize → transformer → mean pooling over the attention mask → L2 normalize.
+    Only onnxruntime and tokenizers are imported, never torch.
+    """
+
+    def __init__(self, model_dir: str = ONNX_MODEL_DIR, quantized: bool = False):
+        self.model_dir = model_dir
+        self.quantized = quantized
+        self.name = "onnx-int8" if quantized else "onnx"
+        self._session = None
+        self._tokenizer = None
+        self._lock = Lock()
+
+    def _load(self):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_file = os.path.join(self.model_dir, "model_int8.onnx" if self.quantized else "model.onnx")
+        if not os.path.exists(model_file):
+            raise RuntimeError(f"❌ {model_file} not found. Run `python -m app.rag.onnx_export` first.")
+
+        tokenizer = Tokenizer.from_file(os.path.join(self.model_dir, "tokenizer.json"))
+        tokenizer.enable_truncation(max_length=ONNX_MAX_LENGTH)
+        tokenizer.enable_padding()
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self._session = ort.InferenceSession(model_file, options, providers=["CPUExecutionProvider"])
+        self._tokenizer = tokenizer
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        with self._lock:
+            if self._session is None:
+                self._load()
+        encodings = self._tokenizer.encode_batch(texts)
+        input_ids = np.asarray([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.asarray([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {
+            "input_ids": input_ids,
+            "attention_mask": attention_mask,
+            "token_type_ids": np.zeros_like(input_ids),
+        }
+        expected = {i.name for i in self._session.get_inputs()}
+        hidden = self._session.run(None, {k: v for k, v in feeds.items() if k in expected})[0]
+
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+
+class RemoteBackend(EmbeddingBackend):
+    """Shared worker processes over a Unix socket (see embedding_worker.py)."""
+
+    name = "remote"
+
+    def __init__(self, socket_path: str):
+        from .embedding_worker import RemoteEncoder
+        self._encoder = RemoteEncoder(socket_path)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self._encoder.encode(texts)
+
+
+LOCAL_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+_backends: Dict[str, EmbeddingBackend] = {}
+_backends_lock = Lock()
+
+
+def create_backend(name: str, socket_path: Optional[str] = None) -> EmbeddingBackend:
+    if name == "torch":
+        return TorchBackend()
+    if name == "onnx":
+        return OnnxBackend()
+    if name == "onnx-int8":
+        return OnnxBackend(quantized=True)
+    if name == "remote":
+        if not socket_path:
+            raise ValueError("❌ EMBEDDING_WORKER_SOCKET must be set for the remote embedding backend.")
+        return RemoteBackend(socket_path)
+    raise ValueError(f"⚠️ Invalid embedding backend: {name}. Choose one of {', '.join(LOCAL_BACKENDS + ('remote',))}")
+
+
+def get_backend(name: Optional[str] = None) -> EmbeddingBackend:
+    """
+    Return the shared backend instance for `name`, defaulting to EMBEDDING_BACKEND
+    (or "remote" when only EMBEDDING_WORKER_SOCKET is set, else "torch").
+    """
+    socket_path = os.getenv("EMBEDDING_WORKER_SOCKET")
+    name = name or os.getenv("EMBEDDING_BACKEND") or ("remote" if socket_path else "torch")
+    with _backends_lock:
+        if name not in _backends:
+            _backends[name] = create_backend(name, socket_path)
+        return _backends[name]
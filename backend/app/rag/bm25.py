@@ -0,0 +1,74 @@
+import math
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.preprocessing import preprocess_text
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase word tokens (same normalization as /preprocess).
+    """
+    return preprocess_text(text).split() if text else []
+
+
+class BM25Index:
+    """
+    Inverted index with Okapi BM25 scoring.
+
+    Postings are kept per term as (doc_id, term_frequency) pairs, so a query
+    only touches the documents that share at least one term with it.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.doc_lengths: List[int] = []
+        self._idf: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add(self, text: str) -> int:
+        doc_id = len(self.doc_lengths)
+        tokens = tokenize(text)
+        for term, tf in Counter(tokens).items():
+            self.postings[term].append((doc_id, tf))
+        self.doc_lengths.append(len(tokens))
+        self._idf = {}  # document frequencies changed
+        return doc_id
+
+    def idf(self, term: str) -> float:
+        if not self._idf:
+            n = len(self.doc_lengths)
+            self._idf = {
+                t: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5))
+                for t, p in self.postings.items()
+            }
+        return self._idf.get(term, 0.0)
+
+    def search(self, query: str, limit: int = 50, allowed: Optional[Set[int]] = None) -> List[Tuple[int, float]]:
+        """
+        Return up to `limit` (doc_id, score) pairs, best first.
+        Documents sharing no term with the query are never scored; when
+        `allowed` is given, postings outside that set are skipped too.
+        """
+        if not self.doc_lengths:
+            return []
+        avgdl = sum(self.doc_lengths) / len(self.doc_lengths) or 1.0
+        scores: Dict[int, float] = defaultdict(float)
+
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for doc_id, tf in postings:
+                if allowed is not None and doc_id not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avgdl)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+        return ranked[:limit]
@@ -0,0 +1,89 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Tuple, Union
+
+import numpy as np
+
+
+class EmbeddingService:
+    """
+    Dynamic micro-batching front end for an embedding model.
+
+    Callers from any coroutine or thread enqueue single texts; one dedicated
+    worker thread drains the queue, waiting at most `max_wait_ms` to fill a
+    batch of up to `max_batch_size`, runs a single batched encode and resolves
+    each caller's future. The event loop never runs the model itself.
+    """
+
+    def __init__(self, encode_batch: Callable[[List[str]], np.ndarray],
+                 max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.encode_batch = encode_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches = 0
+        self.items = 0
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="embedding-service", daemon=True)
+                self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        self.start()
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future
+
+    async def embed(self, text: str) -> np.ndarray:
+        return await asyncio.wrap_future(self.submit(text))
+
+    def embed_sync(self, text: str) -> np.ndarray:
+        """Blocking shim for existing synchronous callers."""
+        return self.submit(text).result()
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "queued": self._queue.qsize(),
+        }
+
+    def _collect(self) -> List[Tuple[str, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            # Drop requests whose caller already gave up
+            batch = [(text, fut) for text, fut in self._collect() if fut.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            unique_texts = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                vectors = np.asarray(self.encode_batch(unique_texts), dtype=np.float32)
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+            by_text = dict(zip(unique_texts, vectors))
+            for text, fut in batch:
+                fut.set_result(by_text[text])
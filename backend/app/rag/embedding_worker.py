@@ -0,0 +1,165 @@
+"""
+Out-of-process embedding workers shared by all uvicorn workers on a host.
+
+The server binds one Unix socket and forks `--workers` processes that each
+load the model once and accept connections from the listening socket, so
+inference uses several cores while web workers never import torch.
+Web workers opt in by setting EMBEDDING_WORKER_SOCKET (see backends.py).
+
+Wire format, both directions: 4-byte big-endian length + payload.
+    request:  JSON {"texts": [...]}
+    response: JSON {"shape": [n, dim]} followed by a frame of float32 bytes,
+              or JSON {"error": "..."}
+
+Usage (from backend/):
+    python -m app.rag.embedding_worker --socket /tmp/loan-bot-embed.sock --workers 2
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import struct
+import threading
+from typing import List, Optional
+
+import numpy as np
+
+from app.rag.backends import LOCAL_BACKENDS, create_backend
+
+DEFAULT_SOCKET = "/tmp/loan-bot-embed.sock"
+_HEADER = struct.Struct(">I")
+
+
+def _recv_exact(conn: socket.socket, size: int) -> bytes:
+    chunks, remaining = [], size
+    while remaining:
+        chunk = conn.recv(min(remaining, 1 << 20))
+        if not chunk:
+            raise ConnectionError("Embedding worker connection closed")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def send_frame(conn: socket.socket, payload: bytes) -> None:
+    conn.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def recv_frame(conn: socket.socket) -> bytes:
+    (size,) = _HEADER.unpack(_recv_exact(conn, _HEADER.size))
+    return _recv_exact(conn, size)
+
+
+class RemoteEncoder:
+    """
+    Client side: one persistent connection, reconnected once on failure.
+    Thread-safe, though in practice only the batching worker thread calls it.
+    """
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET, timeout: float = 30.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._conn: Optional[socket.socket] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> socket.socket:
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.settimeout(self.timeout)
+        conn.connect(self.socket_path)
+        return conn
+
+    def _request(self, texts: List[str]) -> np.ndarray:
+        if self._conn is None:
+            self._conn = self._connect()
+        send_frame(self._conn, json.dumps({"texts": texts}).encode("utf-8"))
+        header = json.loads(recv_frame(self._conn))
+        if "error" in header:
+            raise RuntimeError(f"⚠️ Embedding worker error: {header['error']}")
+        return np.frombuffer(recv_frame(self._conn), dtype=np.float32).reshape(header["shape"])
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        with self._lock:
+            try:
+                return self._request(texts)
+            except (OSError, ConnectionError):
+                self.close()
+                return self._request(texts)
+
+    def close(self) -> None:
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            finally:
+                self._conn = None
+
+
+def _handle(conn: socket.socket, encode, encode_lock: threading.Lock) -> None:
+    with conn:
+        while True:
+            try:
+                request = json.loads(recv_frame(conn))
+            except (ConnectionError, OSError):
+                return
+            try:
+                with encode_lock:
+                    vectors = np.ascontiguousarray(encode(request["texts"]), dtype=np.float32)
+            except Exception as e:
+                send_frame(conn, json.dumps({"error": str(e)}).encode("utf-8"))
+                continue
+            send_frame(conn, json.dumps({"shape": list(vectors.shape)}).encode("utf-8"))
+            send_frame(conn, vectors.tobytes())
+
+
+def _worker_loop(listener: socket.socket, backend_name: str, threads: int) -> None:
+    # Only worker processes pay for the model runtime
+    if threads and backend_name == "torch":
+        import torch
+        torch.set_num_threads(threads)
+
+    backend = create_backend(backend_name)
+    backend.encode(["warmup"])
+    encode_lock = threading.Lock()
+    print(f"✅ Embedding worker {os.getpid()} ready ({backend.name}).")
+
+    def encode(texts):
+        return backend.encode(texts)
+
+    while True:
+        conn, _ = listener.accept()
+        threading.Thread(target=_handle, args=(conn, encode, encode_lock), daemon=True).start()
+
+
+def serve(socket_path: str = DEFAULT_SOCKET, workers: int = 1, threads: int = 0, backend: str = "torch") -> None:
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen(128)
+    print(f"🧩 Embedding server on {socket_path} with {workers} worker(s)")
+
+    ctx = multiprocessing.get_context("fork")
+    processes = [ctx.Process(target=_worker_loop, args=(listener, backend, threads), daemon=True) for _ in range(workers)]
+    for p in processes:
+        p.start()
+    try:
+        for p in processes:
+            p.join()
+    finally:
+        listener.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run shared embedding worker processes on a Unix socket.")
+    parser.add_argument("--socket", default=os.getenv("EMBEDDING_WORKER_SOCKET", DEFAULT_SOCKET))
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads per worker (0 = torch default)")
+    parser.add_argument("--backend", choices=LOCAL_BACKENDS, default="torch")
+    args = parser.parse_args()
+    serve(args.socket, args.workers, args.threads, args.backend)
+
+
+if __name__ == "__main__":
+    main()
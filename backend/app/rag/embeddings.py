@@ -1,30 +1,166 @@
-from sentence_transformers import SentenceTransformer
-from typing import List
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Hashable, List, Optional, Union
+import os
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity as sk_cosine_similarity
 
-# Load SentenceTransformer model once
-_model = SentenceTransformer("all-MiniLM-L6-v2")
+from .backends import MODEL_NAME, get_backend
+from .embedding_service import EmbeddingService
 
-def embed_text(text: str) -> List[float]:
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "32"))
+EMBEDDING_MAX_WAIT_MS = float(os.getenv("EMBEDDING_MAX_WAIT_MS", "5"))
+
+# torch | onnx | onnx-int8 | remote (see backends.py); the model loads on first use
+_backend = get_backend()
+# Vectors from different backends drift slightly, so the backend is part of the cache key
+MODEL_ID = _backend.model_id
+
+
+def encode_batch(texts: List[str]) -> np.ndarray:
     """
-    Generate an embedding vector for a given text.
+    Run the model on a list of texts in one forward pass (no caching).
+    """
+    return np.asarray(_backend.encode(texts), dtype=np.float32)
+
+
+_service = EmbeddingService(encode_batch, max_batch_size=EMBEDDING_MAX_BATCH_SIZE, max_wait_ms=EMBEDDING_MAX_WAIT_MS)
+
+
+class EmbeddingCache:
+    """
+    Thread-safe, size-bounded LRU of embeddings keyed by (model id, normalized text).
+    """
+
+    def __init__(self, max_size: int = EMBEDDING_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, np.ndarray]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._data.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, key: Hashable, vector: np.ndarray) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = vector
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_cache = EmbeddingCache()
+
+
+def normalize_text(text: str) -> str:
     """
+    Cache-key normalization: collapse whitespace and lowercase.
+    all-MiniLM-L6-v2 uses an uncased tokenizer, so this does not change the embedding.
+    """
+    return " ".join(text.split()).lower()
+
+
+def _cache_key(text: str):
     if not text or not isinstance(text, str):
         raise ValueError("Text must be a non-empty string")
-    return _model.encode(text).tolist()
+    return (MODEL_ID, normalize_text(text))
+
+
+def _remember(key, vector: np.ndarray) -> np.ndarray:
+    vector.flags.writeable = False
+    _cache.put(key, vector)
+    return vector
+
+
+def embed_text(text: str) -> np.ndarray:
+    """
+    Generate an embedding vector for a given text.
+
+    Results are memoized in a bounded LRU; the returned array is shared
+    between callers and therefore read-only. Cache misses are encoded by the
+    micro-batching service (this call blocks until the batch completes).
+    """
+    key = _cache_key(text)
+    vector = _cache.get(key)
+    if vector is None:
+        vector = _remember(key, _service.embed_sync(key[1]))
+    return vector
+
+
+async def aembed_text(text: str) -> np.ndarray:
+    """
+    Async variant of embed_text: awaits the batching worker instead of
+    blocking the event loop, so concurrent requests share one forward pass.
+    """
+    key = _cache_key(text)
+    vector = _cache.get(key)
+    if vector is None:
+        vector = _remember(key, await _service.embed(key[1]))
+    return vector
+
+
+def embed_texts(texts: List[str]) -> np.ndarray:
+    """
+    Embed many texts at once (e.g. at ingestion): cached texts are reused and
+    the misses are encoded in a single batched forward pass on the calling thread.
+    """
+    keys = [_cache_key(t) for t in texts]
+    vectors = [_cache.get(k) for k in keys]
+    missing = list(dict.fromkeys(k for k, v in zip(keys, vectors) if v is None))
+    if missing:
+        encoded = dict(zip(missing, encode_batch([k[1] for k in missing])))
+        vectors = [v if v is not None else encoded[k] for k, v in zip(keys, vectors)]
+        for k in missing:
+            _remember(k, encoded[k])
+    return np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+
+
+def embedding_cache_stats() -> Dict[str, Union[int, float]]:
+    """
+    Hit/miss counters and current size of the embedding cache,
+    plus batching counters from the embedding service.
+    """
+    return {**_cache.stats(), "batching": _service.stats()}
+
 
-def cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
+def cosine_similarity(vec1: Union[List[float], np.ndarray], vec2: Union[List[float], np.ndarray]) -> float:
     """
     Compute cosine similarity between two embedding vectors.
 
     Args:
-        vec1 (List[float]): First embedding.
-        vec2 (List[float]): Second embedding.
+        vec1 (List[float] | np.ndarray): First embedding.
+        vec2 (List[float] | np.ndarray): Second embedding.
 
     Returns:
         float: Cosine similarity score (between 0.0 and 1.0)
     """
-    vec1 = np.array(vec1).reshape(1, -1)
-    vec2 = np.array(vec2).reshape(1, -1)
-    return float(sk_cosine_similarity(vec1, vec2)[0][0])
+    vec1 = np.asarray(vec1, dtype=np.float32).ravel()
+    vec2 = np.asarray(vec2, dtype=np.float32).ravel()
+    denom = float(np.linalg.norm(vec1) * np.linalg.norm(vec2))
+    return float(np.dot(vec1, vec2) / denom) if denom else 0.0
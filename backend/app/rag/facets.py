@@ -0,0 +1,81 @@
+import re
+from typing import Dict, List, Optional
+
+# Canonical loan types, in the same vocabulary the routers use for merged["loan_type"]
+LOAN_TYPE_ALIASES = {
+    "msme": ["msme"],
+    "personal": ["personal"],
+    "home": ["home", "housing"],
+    "education": ["education", "student"],
+    "vehicle": ["vehicle", "car", "bike", "two wheeler", "auto"],
+    "business": ["business"],
+}
+
+LENDER_ALIASES = {
+    "SBI": ["sbi", "state bank of india"],
+    "HDFC Bank": ["hdfc"],
+    "ICICI Bank": ["icici"],
+    "Axis Bank": ["axis"],
+    "Kotak Mahindra Bank": ["kotak"],
+    "Yes Bank": ["yes bank"],
+    "IDFC First Bank": ["idfc"],
+    "Federal Bank": ["federal bank"],
+    "Bank of Baroda": ["bank of baroda", "baroda"],
+    "Standard Chartered": ["standard chartered"],
+    "Bajaj Finserv": ["bajaj"],
+    "Tata Capital": ["tata capital"],
+    "Mahindra Finance": ["mahindra finance"],
+    "Shriram Finance": ["shriram"],
+}
+
+FACET_KEYS = ("loan_type", "lender")
+
+
+def _compile(aliases: Dict[str, list]) -> Dict[str, re.Pattern]:
+    return {
+        name: re.compile(r"\b(" + "|".join(re.escape(a) for a in words) + r")\b", re.IGNORECASE)
+        for name, words in aliases.items()
+    }
+
+_LOAN_TYPE_PATTERNS = _compile(LOAN_TYPE_ALIASES)
+_LENDER_PATTERNS = _compile(LENDER_ALIASES)
+
+
+def detect_loan_type(text: str) -> Optional[str]:
+    for loan_type, pattern in _LOAN_TYPE_PATTERNS.items():
+        if pattern.search(text or ""):
+            return loan_type
+    return None
+
+
+def detect_lender(text: str) -> Optional[str]:
+    for lender, pattern in _LENDER_PATTERNS.items():
+        if pattern.search(text or ""):
+            return lender
+    return None
+
+
+def detect_lenders(text: str) -> List[str]:
+    """Every lender mentioned, in alias-table order ("SBI vs HDFC" → ["SBI", "HDFC Bank"])."""
+    return [lender for lender, pattern in _LENDER_PATTERNS.items() if pattern.search(text or "")]
+
+
+def parse_facets(*texts: str) -> Dict[str, Optional[str]]:
+    """
+    Extract lender and loan-type facets, e.g. "personal loan from SBI India"
+    → {"loan_type": "personal", "lender": "SBI"}.
+
+    Texts are tried in order, so pass the most reliable source (the CSV
+    `loan query` column) first and free text (the question) after it.
+    """
+    facets = {"loan_type": None, "lender": None}
+    for text in texts:
+        if not isinstance(text, str):
+            continue
+        facets["loan_type"] = facets["loan_type"] or detect_loan_type(text)
+        facets["lender"] = facets["lender"] or detect_lender(text)
+    return facets
+
+
+def normalize_facet(value) -> Optional[str]:
+    return str(value).strip().lower() if value else None
@@ -0,0 +1,73 @@
+"""
+Tiered answering for FAQ matches.
+
+The routers search with the user's message plus their profile, which is right
+for ranking but dilutes the score. The tier is decided on how close the bare
+message is to the matched FAQ question (the same scale `rag_bench` reports
+precision on):
+
+    faq_direct  >= FAQ_DIRECT_THRESHOLD: return the stored answer, personalized
+                with a local template — no LLM or web calls
+    faq_llm     >= FAQ_LLM_THRESHOLD: one LLM call grounded on the FAQ answer
+    web         otherwise: web search + summary + final LLM call
+
+Comparison and ranking questions skip these and are grounded on exact rows of
+the lender rate table (`table`). The tier is counted in Prometheus and stored
+with the turn (Intent.context).
+"""
+import asyncio
+import os
+from typing import Optional
+
+from prometheus_client import Counter
+
+from app.observability import current_trace, log_event
+from .embeddings import aembed_text, cosine_similarity
+from .facets import detect_lender
+
+FAQ_DIRECT_THRESHOLD = float(os.getenv("FAQ_DIRECT_THRESHOLD", "0.88"))
+FAQ_LLM_THRESHOLD = float(os.getenv("FAQ_LLM_THRESHOLD", "0.72"))
+
+TIER_DIRECT = "faq_direct"
+TIER_LLM = "faq_llm"
+TIER_WEB = "web"
+TIER_TABLE = "table"            # comparisons/rankings: one LLM call over exact lender table rows
+TIER_SIMULATION = "simulation"  # "how much can I borrow" answered by app.services.loan_simulation
+
+ANSWER_TIERS = Counter("loanbot_answer_tier_total", "Turns answered per tier", ["route", "tier"])
+
+
+async def faq_confidence(user_message: str, matched_question: str) -> float:
+    """Cosine similarity of the bare user message and the matched FAQ question (both memoized)."""
+    user_vec, question_vec = await asyncio.gather(aembed_text(user_message), aembed_text(matched_question))
+    return float(cosine_similarity(user_vec, question_vec))
+
+
+def choose_tier(confidence: float, user_message: str, matched_question: str) -> str:
+    if confidence >= FAQ_DIRECT_THRESHOLD:
+        # Never restate another lender's answer verbatim ("SBI" asked, "HDFC" FAQ matched)
+        asked, matched = detect_lender(user_message), detect_lender(matched_question)
+        if not asked or asked == matched:
+            return TIER_DIRECT
+        return TIER_LLM
+    if confidence >= FAQ_LLM_THRESHOLD:
+        return TIER_LLM
+    return TIER_WEB
+
+
+def record_tier(tier: str, confidence: float) -> None:
+    trace = current_trace()
+    ANSWER_TIERS.labels(trace.route if trace else "none", tier).inc()
+    log_event("answer_tier", tier=tier, confidence=round(confidence, 3))
+
+
+def personalize(answer: str, name: Optional[str] = None, loan_type: Optional[str] = None,
+                income: Optional[str] = None) -> str:
+    """Wrap a stored FAQ answer with what we know about the user; no model involved."""
+    lead = f"{name}, here's" if name else "Here's"
+    lead += " what you need to know"
+    if loan_type:
+        lead += f" about your {loan_type} loan"
+    if income:
+        lead += f" (monthly income {income})"
+    return f"{lead}:\n\n{answer.strip()}"
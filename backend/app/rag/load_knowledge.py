@@ -1,14 +1,72 @@
-import pandas as pd
+import asyncio
+import os
+from threading import Lock
+from typing import Optional, Tuple
 from .vector_store import SimpleVectorStore
-from .embeddings import embed_text  
+from .rate_table import LenderRateTable
+from .embeddings import embed_text, embed_texts
+from .facets import parse_facets
+
+CSV_PATH = os.path.join("Data", "loan_faq_dataset.csv")
+# float32 | float16 | int8 — see quantization.py
+VECTOR_STORE_DTYPE = os.getenv("VECTOR_STORE_DTYPE", "float32")
+
+_store: Optional[SimpleVectorStore] = None
+_rate_table: Optional[LenderRateTable] = None
+_store_lock = Lock()
+
+def load_qa_from_csv(file_path: str, storage: str = None) -> SimpleVectorStore:
+    return load_knowledge(file_path, storage)[0]
+
+def load_knowledge(file_path: str, storage: str = None) -> Tuple[SimpleVectorStore, LenderRateTable]:
+    """
+    Ingest the FAQ CSV once: the vector store for retrieval and the lender
+    rate table extracted from the same answers.
+    """
+    import pandas as pd  # heavy import, only needed while ingesting
 
-def load_qa_from_csv(file_path: str) -> SimpleVectorStore:
     df = pd.read_csv(file_path)
-    store = SimpleVectorStore()
+    rate_table = LenderRateTable.from_rows(
+        zip(df['loan query'], df['question'].astype(str), df['answer'].astype(str))
+    )
+    store = SimpleVectorStore(storage=storage or VECTOR_STORE_DTYPE)
+
+    # One batched forward pass for the whole corpus instead of one encode per row
+    embeddings = embed_texts(df['question'].astype(str).tolist())
 
-    for _, row in df.iterrows():
+    for (_, row), embedding in zip(df.iterrows(), embeddings):
         question = str(row['question'])
         answer = str(row['answer'])
-        store.add(question, answer, embed_func=embed_text)
+        # `loan query` is the curated topic ("personal loan from SBI India"); the question is a fallback
+        facets = parse_facets(row.get('loan query'), question)
+        store.add(question, answer, embed_func=embed_text, facets=facets, embedding=embedding)
+
+    return store, rate_table
+
+def get_vector_store() -> SimpleVectorStore:
+    """
+    The FAQ store shared by every router in this worker, built on first use.
+    """
+    global _store, _rate_table
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store, _rate_table = load_knowledge(CSV_PATH)
+                _store = store
+    return _store
+
+async def aget_vector_store() -> SimpleVectorStore:
+    """
+    Async accessor: builds the store in a worker thread so the event loop keeps serving.
+    """
+    if _store is not None:
+        return _store
+    return await asyncio.to_thread(get_vector_store)
+
+async def aget_rate_table() -> LenderRateTable:
+    """The lender rate table, built alongside the FAQ store."""
+    await aget_vector_store()
+    return _rate_table
 
-    return store
+def vector_store_ready() -> bool:
+    return _store is not None
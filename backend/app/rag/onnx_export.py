@@ -0,0 +1,71 @@
+"""
+Export all-MiniLM-L6-v2 to ONNX for the onnx / onnx-int8 embedding backends.
+
+Writes model.onnx, tokenizer.json and, with --quantize, a dynamically
+quantized model_int8.onnx (int8 weights for MatMul/Gemm) into --out.
+Needs torch, transformers and onnxruntime; run it once at build time, not in web workers.
+
+Usage (from backend/):
+    python -m app.rag.onnx_export --quantize
+"""
+import argparse
+import inspect
+import os
+
+from .backends import MODEL_NAME, ONNX_MAX_LENGTH, ONNX_MODEL_DIR
+
+HF_MODEL_ID = f"sentence-transformers/{MODEL_NAME}"
+
+
+def export(out_dir: str = ONNX_MODEL_DIR, quantize: bool = False, opset: int = 14) -> None:
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(out_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(HF_MODEL_ID)
+    model = AutoModel.from_pretrained(HF_MODEL_ID).eval()
+    tokenizer.save_pretrained(out_dir)  # includes tokenizer.json for the `tokenizers` runtime
+
+    sample = tokenizer(["export sample"], padding=True, truncation=True,
+                       max_length=ONNX_MAX_LENGTH, return_tensors="pt")
+    model_path = os.path.join(out_dir, "model.onnx")
+    dynamic = {0: "batch", 1: "sequence"}
+    export_kwargs = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        export_kwargs["dynamo"] = False  # newer torch defaults to the dynamo exporter (needs onnxscript)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+            model_path,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": dynamic,
+                "attention_mask": dynamic,
+                "token_type_ids": dynamic,
+                "last_hidden_state": dynamic,
+            },
+            opset_version=opset,
+            **export_kwargs,
+        )
+    print(f"✅ Exported {model_path}")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantized_path = os.path.join(out_dir, "model_int8.onnx")
+        quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+        print(f"✅ Quantized {quantized_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the embedding model to ONNX.")
+    parser.add_argument("--out", default=ONNX_MODEL_DIR)
+    parser.add_argument("--quantize", action="store_true", help="also write a dynamically quantized int8 model")
+    parser.add_argument("--opset", type=int, default=14)
+    args = parser.parse_args()
+    export(args.out, args.quantize, args.opset)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+from typing import List, Optional, Sequence
+import numpy as np
+
+STORAGE_MODES = ("float32", "float16", "int8")
+
+# Rows scored per matmul when scanning the whole store, to bound temporary float32 copies
+_CHUNK_ROWS = 65536
+
+
+class EmbeddingStorage:
+    """
+    Append-only matrix of embeddings scored with cosine similarity.
+
+    Rows are staged in a small Python list and packed into a contiguous
+    NumPy matrix on the first read after an append, so ingestion stays
+    O(1) per row and search always runs on the packed matrix.
+    """
+
+    dtype = np.float32
+
+    def __init__(self):
+        self.dim: Optional[int] = None
+        self._matrix = np.zeros((0, 0), dtype=self.dtype)
+        self._norms = np.zeros(0, dtype=np.float32)
+        self._pending: List[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return self._matrix.shape[0] + len(self._pending)
+
+    def append(self, vector) -> None:
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        if self.dim is None:
+            self.dim = vector.shape[0]
+            self._matrix = np.zeros((0, self.dim), dtype=self.dtype)
+        elif vector.shape[0] != self.dim:
+            raise ValueError(f"Embedding has dimension {vector.shape[0]}, expected {self.dim}")
+        self._pending.append(vector)
+
+    @property
+    def nbytes(self) -> int:
+        self._pack()
+        return self._matrix.nbytes + self._norms.nbytes
+
+    def get(self, idx: int) -> np.ndarray:
+        """Return row `idx` as float32 (dequantized if needed)."""
+        self._pack()
+        return self._dequantize(self._matrix[idx:idx + 1])[0]
+
+    def cosine_similarities(self, query_vector, ids: Optional[Sequence[int]] = None) -> np.ndarray:
+        """Cosine similarity between `query_vector` and rows `ids` (all rows when None)."""
+        self._pack()
+        query = np.asarray(query_vector, dtype=np.float32).ravel()
+        query_norm = float(np.linalg.norm(query)) or 1.0
+        projected = self._project_query(query)
+
+        if ids is None:
+            dots = np.concatenate([
+                self._dot(self._matrix[start:start + _CHUNK_ROWS], projected)
+                for start in range(0, self._matrix.shape[0], _CHUNK_ROWS)
+            ]) if self._matrix.shape[0] else np.zeros(0, dtype=np.float32)
+            norms = self._norms
+        else:
+            ids = np.asarray(ids, dtype=np.intp)
+            dots = self._dot(self._matrix[ids], projected)
+            norms = self._norms[ids]
+
+        return dots / (np.where(norms == 0, 1.0, norms) * query_norm)
+
+    # --- packing / quantization hooks -------------------------------------------------
+
+    def _pack(self) -> None:
+        if not self._pending:
+            return
+        staged = np.vstack(self._pending)
+        self._pending = []
+        self._matrix = np.concatenate([self._matrix, self._quantize(staged)])
+        self._norms = np.concatenate([self._norms, np.linalg.norm(staged, axis=1).astype(np.float32)])
+
+    def _quantize(self, rows: np.ndarray) -> np.ndarray:
+        return rows.astype(self.dtype)
+
+    def _dequantize(self, rows: np.ndarray) -> np.ndarray:
+        return rows.astype(np.float32)
+
+    def _project_query(self, query: np.ndarray) -> np.ndarray:
+        return query
+
+    def _dot(self, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        return rows.astype(np.float32, copy=False) @ query
+
+
+class Float32Storage(EmbeddingStorage):
+    dtype = np.float32
+
+
+class Float16Storage(EmbeddingStorage):
+    dtype = np.float16
+
+
+class Int8Storage(EmbeddingStorage):
+    """
+    Symmetric int8 scalar quantization with one scale per dimension:
+    x ≈ q * scale, q ∈ [-127, 127]. The scale is folded into the query
+    (q · (query * scale)), so scoring never materializes dequantized rows.
+    """
+
+    dtype = np.int8
+
+    def __init__(self):
+        super().__init__()
+        self.scales: Optional[np.ndarray] = None
+
+    @property
+    def nbytes(self) -> int:
+        return super().nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def _pack(self) -> None:
+        if not self._pending:
+            return
+        staged = np.vstack(self._pending)
+        needed = np.abs(staged).max(axis=0) / 127.0
+        if self.scales is None:
+            self.scales = np.where(needed == 0, 1.0, needed).astype(np.float32)
+        elif np.any(needed > self.scales):
+            # New rows exceed the current range: widen the scales and requantize existing rows
+            new_scales = np.maximum(self.scales, needed).astype(np.float32)
+            self._matrix = np.clip(np.rint(self._matrix * (self.scales / new_scales)), -127, 127).astype(np.int8)
+            self.scales = new_scales
+        super()._pack()
+
+    def _quantize(self, rows: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint(rows / self.scales), -127, 127).astype(np.int8)
+
+    def _dequantize(self, rows: np.ndarray) -> np.ndarray:
+        return rows.astype(np.float32) * self.scales
+
+    def _project_query(self, query: np.ndarray) -> np.ndarray:
+        return query * self.scales
+
+
+def make_storage(mode: str = "float32") -> EmbeddingStorage:
+    storages = {
+        "float32": Float32Storage,
+        "float16": Float16Storage,
+        "int8": Int8Storage,
+    }
+    if mode not in storages:
+        raise ValueError(f"⚠️ Invalid storage mode: {mode}. Choose one of {', '.join(STORAGE_MODES)}")
+    return storages[mode]()
@@ -0,0 +1,381 @@
+"""
+Benchmark and retrieval-quality suite for the RAG package.
+
+Speed:
+  * ingestion throughput of `load_qa_from_csv` (rows/s, embedding included)
+  * `embed_text` latency, cold (cache miss) and warm (cache hit), and
+    `embed_texts` latency at batch sizes 8 and 64
+  * `SimpleVectorStore.search` latency (p50/p95/p99, with and without facet
+    filters) and memory per entry, from the shipped CSV up to synthetic corpora
+    of 10k–1M entries (FAQ vectors plus noise, with lender / loan type swapped
+    in the question text so the lexical index and partitions stay realistic)
+
+Quality, on a held-out paraphrase set (Data/loan_faq_paraphrases.csv, built
+from loan_faq_dataset.csv by `--write-paraphrases`; paraphrases are never
+indexed):
+  * recall@1, recall@3 and MRR of the source question
+  * for each similarity threshold: how many queries are answered and how many
+    of those answers are right, plus the false-accept rate on off-topic
+    queries — so the 0.4 / 0.55 cut-offs used by the routers can be checked
+
+Results are printed and can be written as JSON (`--out`) and compared against a
+stored baseline (`--baseline`); the command exits non-zero when a metric
+regresses by more than `--tolerance`.
+
+Usage (from backend/):
+    python -m app.rag.rag_bench --sizes 287 10000 100000 --out rag_bench.json
+    python -m app.rag.rag_bench --baseline rag_bench.json
+    python -m app.rag.rag_bench --sizes 1000000 --skip-quality   # slow: builds a 1M-entry store
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app import observability
+
+from .embeddings import _cache, embed_text, embed_texts
+from .facets import LENDER_ALIASES, LOAN_TYPE_ALIASES, parse_facets
+from .faq_tiers import FAQ_DIRECT_THRESHOLD, FAQ_LLM_THRESHOLD
+from .load_knowledge import CSV_PATH, VECTOR_STORE_DTYPE, load_qa_from_csv
+from .vector_store import SimpleVectorStore
+
+PARAPHRASES_PATH = os.path.join("Data", "loan_faq_paraphrases.csv")
+# rag-chat / chat match threshold, rag-chat's "strong match" cut-off and the FAQ answering tiers
+ROUTER_THRESHOLDS = (0.4, 0.55, FAQ_LLM_THRESHOLD, FAQ_DIRECT_THRESHOLD)
+THRESHOLD_GRID = tuple(round(t, 2) for t in np.arange(0.3, 0.96, 0.05))
+
+# Metrics where a larger value is a regression (everything else: larger is better)
+LOWER_IS_BETTER = ("_ms", "bytes", "false_accept")
+
+OFF_TOPIC_QUERIES = (
+    "What is the capital of France?",
+    "How do I bake sourdough bread at home?",
+    "Best places to visit in Goa in December",
+    "Who won the cricket world cup in 2011?",
+    "How do I reset my WiFi router password?",
+    "Recommend a good science fiction novel",
+    "What is the weather like in Mumbai today?",
+    "How many calories are in a banana?",
+    "Explain how photosynthesis works",
+    "Book a cab from the airport to my hotel",
+    "What is a good skincare routine for oily skin?",
+    "How do I learn to play the guitar?",
+)
+
+# (pattern, replacement) rewrites used to paraphrase FAQ questions
+REWRITES = (
+    (r"^what is the maximum (loan )?amount i can (apply for|borrow|get)( as| for)?", r"how much can i get as"),
+    (r"^what is the minimum", r"tell me the lowest"),
+    (r"^what are the", r"list the"),
+    (r"^what is the", r"tell me the"),
+    (r"^can i", r"is it possible to"),
+    (r"^do i need to", r"is it required to"),
+    (r"^how can i", r"what is the way to"),
+    (r"\binterest rates?\b", r"rate of interest"),
+    (r"\bmaximum\b", r"highest"),
+    (r"\bminimum\b", r"lowest"),
+    (r"\beligible\b", r"qualified"),
+    (r"\brequired\b", r"needed"),
+    (r"\bapply for\b", r"get"),
+    (r"\bprocessing fees?\b", r"processing charges"),
+    (r"\bdocuments\b", r"paperwork"),
+    (r"\brepayment\b", r"payback"),
+    (r"\btenure\b", r"loan term"),
+    (r"\bfrom\b", r"at"),
+    (r" india\b", r""),
+    (r"\bcredit score\b", r"cibil score"),
+)
+
+
+# ---------- paraphrase set ----------
+
+def paraphrase(question: str, rng: random.Random) -> Optional[str]:
+    """A rule-based rewrite of `question` that differs from it, or None if no rule applies."""
+    text = question.strip().rstrip("?").lower()
+    applicable = [(p, r) for p, r in REWRITES if re.search(p, text)]
+    if not applicable:
+        return None
+    chosen = rng.sample(applicable, min(len(applicable), rng.randint(2, 4)))
+    for pattern, replacement in sorted(chosen, key=REWRITES.index):
+        text = re.sub(pattern, replacement, text, count=1)
+    text = " ".join(text.split())
+    if rng.random() < 0.5:
+        text += "?"
+    return text if text != question.strip().rstrip("?").lower() else None
+
+
+def build_paraphrases(csv_path: str, seed: int = 13) -> pd.DataFrame:
+    rng = random.Random(seed)
+    questions = pd.read_csv(csv_path)["question"].dropna().astype(str)
+    rows = []
+    for question in dict.fromkeys(questions):
+        if not question.strip().endswith("?"):
+            continue  # a few rows hold advice text in the question column
+        query = paraphrase(question, rng)
+        if query:
+            rows.append({"query": query, "source_question": question})
+    return pd.DataFrame(rows)
+
+
+# ---------- helpers ----------
+
+def _percentiles(timings: Sequence[float]) -> Dict[str, float]:
+    values = np.asarray(timings) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+    }
+
+
+def _timed(fn, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+# ---------- speed ----------
+
+def bench_ingestion(csv_path: str, storage: str) -> Tuple[SimpleVectorStore, Dict[str, float]]:
+    rows = len(pd.read_csv(csv_path))
+    _cache.clear()  # measure real encoding, not cache hits
+    start = time.perf_counter()
+    store = load_qa_from_csv(csv_path, storage=storage)
+    elapsed = time.perf_counter() - start
+    return store, {"rows": rows, "seconds": round(elapsed, 3), "rows_per_s": round(rows / elapsed, 1)}
+
+
+def bench_embedding(texts: List[str], rounds: int) -> Dict[str, Dict[str, float]]:
+    embed_text("warm up")
+    cold = []
+    for i in range(rounds):
+        text = f"{texts[i % len(texts)]} #{i}"  # unique, so every call misses the cache
+        cold.append(_timed(embed_text, text))
+    warm = [_timed(embed_text, texts[0]) for _ in range(rounds)]
+    report = {"embed_text_cold": _percentiles(cold), "embed_text_warm": _percentiles(warm)}
+    for batch_size in (8, 64):
+        timings = []
+        for r in range(max(3, rounds // 10)):
+            batch = [f"{texts[(r * batch_size + i) % len(texts)]} ~{r}" for i in range(batch_size)]
+            timings.append(_timed(embed_texts, batch))
+        report[f"embed_texts_batch{batch_size}"] = {
+            **_percentiles(timings),
+            "texts_per_s": round(batch_size / float(np.median(timings)), 1),
+        }
+    return report
+
+
+def synthetic_store(base: SimpleVectorStore, size: int, storage: str, seed: int = 0,
+                    noise: float = 0.15) -> SimpleVectorStore:
+    """`size` entries cloned from `base`: vectors jittered, lender / loan type swapped in the text."""
+    rng = np.random.default_rng(seed)
+    swap = random.Random(seed)
+    lenders = list(LENDER_ALIASES)
+    loan_types = list(LOAN_TYPE_ALIASES)
+    base_vectors = np.vstack([base.vectors.get(i) for i in range(len(base.entries))]).astype(np.float32)
+    dim = base_vectors.shape[1]
+
+    store = SimpleVectorStore(storage=storage)
+    for i in range(size):
+        j = i % len(base.entries)
+        question, answer = base.entries[j]
+        if i >= len(base.entries):
+            question = f"{question} ({swap.choice(lenders)} {swap.choice(loan_types)} loan, variant {i})"
+        vector = base_vectors[j] + rng.normal(0.0, noise / np.sqrt(dim), dim).astype(np.float32)
+        store.add(question, answer, embed_func=None, facets=parse_facets(question),
+                  embedding=vector / np.linalg.norm(vector))
+    return store
+
+
+def bench_search(store: SimpleVectorStore, queries: List[Tuple[str, np.ndarray, Dict]], rounds: int) -> Dict:
+    store.search(queries[0][0], embed_func=None, query_vector=queries[0][1])  # pack pending rows
+    plain, filtered = [], []
+    for r in range(rounds):
+        text, vector, filters = queries[r % len(queries)]
+        plain.append(_timed(store.search, text, embed_func=None, threshold=0.4, query_vector=vector))
+        filtered.append(_timed(store.search, text, embed_func=None, threshold=0.4, filters=filters,
+                               query_vector=vector))
+    return {"unfiltered": _percentiles(plain), "filtered": _percentiles(filtered)}
+
+
+def bench_scaling(base: SimpleVectorStore, sizes: Sequence[int], storage: str, rounds: int,
+                  paraphrases: pd.DataFrame) -> Dict[str, Dict]:
+    texts = paraphrases["query"].tolist() or [q for q, _ in base.entries]
+    vectors = embed_texts(texts)
+    queries = [(t, v, parse_facets(t)) for t, v in zip(texts, vectors)]
+
+    report = {}
+    for size in sizes:
+        tracemalloc.start()
+        start = time.perf_counter()
+        store = base if size == len(base.entries) else synthetic_store(base, size, storage)
+        store.search(texts[0], embed_func=None, query_vector=vectors[0])  # include packed storage
+        build_seconds = time.perf_counter() - start
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        entry = bench_search(store, queries, rounds)
+        entry.update({
+            "entries": size,
+            "build_s": round(build_seconds, 2),
+            "vector_bytes_per_entry": round(store.vectors.nbytes / size, 1),
+            # whole store: vectors, texts, lexical index, partitions (0 for the CSV store, built earlier)
+            "total_bytes_per_entry": round(current / size, 1) if store is not base else None,
+            "peak_build_bytes": peak if store is not base else None,
+        })
+        report[str(size)] = entry
+        print(f"🔎 {size:>8} entries: search p50 {entry['unfiltered']['p50_ms']:.2f} ms "
+              f"p99 {entry['unfiltered']['p99_ms']:.2f} ms | filtered p50 {entry['filtered']['p50_ms']:.2f} ms | "
+              f"{entry['vector_bytes_per_entry']:.0f} vector B/entry")
+        del store
+    return report
+
+
+# ---------- quality ----------
+
+def evaluate_quality(store: SimpleVectorStore, paraphrases: pd.DataFrame, use_filters: bool = True) -> Dict:
+    ranks: List[Optional[int]] = []
+    top_scores: List[float] = []
+    top_correct: List[bool] = []
+    for query, source in zip(paraphrases["query"], paraphrases["source_question"]):
+        filters = parse_facets(query) if use_filters else None
+        results = store.search(query, embed_func=embed_text, top_k=10, threshold=-1.0, filters=filters)
+        rank = next((i + 1 for i, (q, _, _) in enumerate(results) if q == source), None)
+        ranks.append(rank)
+        top_scores.append(results[0][2] if results else 0.0)
+        top_correct.append(rank == 1)
+
+    off_topic = [
+        (store.search(q, embed_func=embed_text, top_k=1, threshold=-1.0) or [(None, None, 0.0)])[0][2]
+        for q in OFF_TOPIC_QUERIES
+    ]
+
+    n = len(ranks)
+    thresholds = {}
+    for threshold in sorted(set(THRESHOLD_GRID) | set(ROUTER_THRESHOLDS)):
+        answered = [c for s, c in zip(top_scores, top_correct) if s >= threshold]
+        thresholds[f"{threshold:.2f}"] = {
+            "answered_rate": round(len(answered) / n, 4) if n else 0.0,
+            "precision": round(sum(answered) / len(answered), 4) if answered else None,
+            "false_accept_rate": round(sum(s >= threshold for s in off_topic) / len(off_topic), 4),
+        }
+    return {
+        "queries": n,
+        "recall_at_1": round(sum(r == 1 for r in ranks) / n, 4) if n else 0.0,
+        "recall_at_3": round(sum(r is not None and r <= 3 for r in ranks) / n, 4) if n else 0.0,
+        "mrr": round(sum(1.0 / r for r in ranks if r) / n, 4) if n else 0.0,
+        "thresholds": thresholds,
+    }
+
+
+# ---------- baseline comparison ----------
+
+def _flatten(report: Dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in report.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(_flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = float(value)
+    return flat
+
+
+def compare(report: Dict, baseline: Dict, tolerance: float, min_delta_ms: float = 0.1) -> List[str]:
+    """
+    Metrics that got worse than the baseline by more than `tolerance` (relative).
+    Latency changes smaller than `min_delta_ms` are treated as timer noise.
+    """
+    current, previous = _flatten(report), _flatten(baseline)
+    regressions = []
+    for key in sorted(current.keys() & previous.keys()):
+        if key.startswith("config.") or key.endswith(("entries", "rows", "queries", "build_s", "seconds")):
+            continue
+        old, new = previous[key], current[key]
+        if old == 0:
+            continue
+        change = (new - old) / abs(old)
+        worse = change > tolerance if any(tag in key for tag in LOWER_IS_BETTER) else change < -tolerance
+        if key.endswith("_ms") and abs(new - old) < min_delta_ms:
+            worse = False
+        marker = "❌" if worse else "  "
+        print(f"{marker} {key:<60} {old:>12.4g} → {new:>12.4g} ({change:+.1%})")
+        if worse:
+            regressions.append(key)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark app/rag speed and retrieval quality.")
+    parser.add_argument("--csv", default=CSV_PATH)
+    parser.add_argument("--paraphrases", default=PARAPHRASES_PATH)
+    parser.add_argument("--write-paraphrases", action="store_true",
+                        help="(re)generate the paraphrase set from --csv and exit")
+    parser.add_argument("--storage", default=VECTOR_STORE_DTYPE, help="float32 | float16 | int8")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[287, 10_000, 100_000],
+                        help="corpus sizes for the search benchmark (the CSV size uses the real store)")
+    parser.add_argument("--rounds", type=int, default=200, help="timed calls per latency measurement")
+    parser.add_argument("--skip-speed", action="store_true")
+    parser.add_argument("--skip-quality", action="store_true")
+    parser.add_argument("--out", help="write the results as JSON")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative regression")
+    parser.add_argument("--min-delta-ms", type=float, default=0.1, help="ignore latency changes below this")
+    args = parser.parse_args()
+    observability.LOG_SAMPLE_RATE = 0.0  # thousands of searches: keep the per-search log lines out of the report
+
+    if args.write_paraphrases:
+        paraphrases = build_paraphrases(args.csv)
+        paraphrases.to_csv(args.paraphrases, index=False)
+        print(f"💾 Wrote {len(paraphrases)} paraphrases to {args.paraphrases}")
+        return
+
+    paraphrases = pd.read_csv(args.paraphrases) if os.path.exists(args.paraphrases) else build_paraphrases(args.csv)
+    report: Dict[str, Dict] = {"config": {"storage": args.storage, "csv": args.csv}}
+
+    store, report["ingestion"] = bench_ingestion(args.csv, args.storage)
+    print(f"📥 Ingested {report['ingestion']['rows']} rows in {report['ingestion']['seconds']} s "
+          f"({report['ingestion']['rows_per_s']} rows/s)")
+
+    if not args.skip_quality:
+        report["quality"] = evaluate_quality(store, paraphrases)
+        q = report["quality"]
+        print(f"🎯 {q['queries']} paraphrases: recall@1 {q['recall_at_1']:.3f} | recall@3 {q['recall_at_3']:.3f} | "
+              f"MRR {q['mrr']:.3f}")
+        for threshold in ROUTER_THRESHOLDS:
+            t = q["thresholds"][f"{threshold:.2f}"]
+            print(f"   threshold {threshold:.2f}: answers {t['answered_rate']:.1%} of queries, "
+                  f"precision {t['precision'] if t['precision'] is not None else 'n/a'}, "
+                  f"off-topic false accepts {t['false_accept_rate']:.1%}")
+
+    if not args.skip_speed:
+        report["embedding"] = bench_embedding([q for q, _ in store.entries], args.rounds)
+        for name, stats in report["embedding"].items():
+            print(f"⏱️ {name:<22} p50 {stats['p50_ms']:.2f} ms  p99 {stats['p99_ms']:.2f} ms")
+        report["search"] = bench_scaling(store, args.sizes, args.storage, args.rounds, paraphrases)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Results written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance, args.min_delta_ms)
+        if regressions:
+            print(f"❌ {len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}")
+            sys.exit(1)
+        print("✅ No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+Structured lender × loan-type table extracted from the FAQ corpus.
+
+Facts like "The starting interest rate for a personal loan from SBI India is
+10.30% per annum" or "up to Rs. 20 lakh" only exist as free text. During
+ingestion each answer is scanned for the fields below and merged per
+(lender, loan type); the first value seen wins and its FAQ question is kept as
+the source.
+
+The table is columnar (one NumPy array per field, NaN when unknown) with a
+precomputed argsort per sortable field and direction, so rankings and filters
+are a mask over a sorted view instead of a scan plus sort per request.
+"""
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .amounts import format_inr, parse_amounts
+from .facets import detect_lenders, detect_loan_type, parse_facets
+
+NUMERIC_FIELDS = (
+    "rate_min",            # annual %
+    "rate_max",            # annual %, equal to rate_min when only one rate is quoted
+    "max_amount",          # ₹
+    "max_tenure_months",
+    "processing_fee_pct",  # % of the loan amount
+    "min_income",          # ₹ per month
+    "min_credit_score",
+)
+PERCENT_FIELDS = ("rate_min", "rate_max", "processing_fee_pct")
+# field -> sort direction that means "best first"
+SORTABLE = {
+    "rate_min": False, "rate_max": False, "max_amount": True, "max_tenure_months": True,
+    "processing_fee_pct": False, "min_income": False, "min_credit_score": False,
+}
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s+(?=[A-Z])")
+_PERCENT = re.compile(r"(\d+(?:\.\d+)?)\s*%")
+_TENURE = re.compile(r"(\d+(?:\.\d+)?)\s*(years?|months?)\b", re.IGNORECASE)
+_CREDIT_SCORE = re.compile(r"\b([3-9]\d{2})\b")
+# "up to ₹10 Crores for property and up to ₹90 lakhs for business loans": one amount per clause
+_CLAUSE = re.compile(r",\s+|;\s*|\s+(?:and|while|whereas)\s+", re.IGNORECASE)
+# Products outside LOAN_TYPE_ALIASES that answers quote limits for
+_OTHER_PRODUCT = re.compile(r"\b(property|mortgage|gold|loan against)\b", re.IGNORECASE)
+# MSME answers quote their limits as "business loan"
+_SAME_PRODUCT = {"msme": {"msme", "business"}}
+
+# Questions the table answers better than a single FAQ match: comparisons on their own, and
+# superlatives only about a figure the table holds ("lowest rate", not "best time to apply")
+_COMPARISON = re.compile(
+    r"\b(cheapest|compare|comparison|versus|vs\.?|which (bank|lender)s?|rank)\b",
+    re.IGNORECASE,
+)
+_SUPERLATIVE = re.compile(r"\b(lowest|best|highest|top|most|least|maximum|minimum)\b", re.IGNORECASE)
+_FIGURE = re.compile(
+    r"\b(rates?|interest|fees?|charges?|amount|borrow|tenure|repayment period|emi|credit score|cibil|"
+    r"income|salary)\b",
+    re.IGNORECASE,
+)
+_SORT_HINTS = (
+    (re.compile(r"\b(fee|fees|charges?)\b", re.IGNORECASE), "processing_fee_pct"),
+    (re.compile(r"\b(amount|borrow|biggest|largest|highest loan|maximum loan)\b", re.IGNORECASE), "max_amount"),
+    (re.compile(r"\b(tenure|longest|repayment period)\b", re.IGNORECASE), "max_tenure_months"),
+    (re.compile(r"\b(credit score|cibil)\b", re.IGNORECASE), "min_credit_score"),
+    (re.compile(r"\b(income|salary)\b", re.IGNORECASE), "min_income"),
+)
+TABLE_CONTEXT_ROWS = 6
+
+
+def _months(value: str, unit: str) -> float:
+    return float(value) * 12 if unit.lower().startswith("year") else float(value)
+
+
+def _clause_amounts(sentence: str, loan_type: Optional[str]) -> List[float]:
+    """Amounts in clauses about `loan_type` or about no product at all (not another product's limit)."""
+    amounts: List[float] = []
+    for clause in _CLAUSE.split(sentence):
+        product = detect_loan_type(clause)
+        if (product and product not in _SAME_PRODUCT.get(loan_type, {loan_type})) or (not product and _OTHER_PRODUCT.search(clause)):
+            continue
+        amounts.extend(parse_amounts(clause))
+    return amounts
+
+
+def extract_facts(question: str, answer: str, loan_type: Optional[str] = None) -> Dict[str, float]:
+    """
+    Numeric facts stated in one FAQ answer (only the sentence that talks about
+    each field); amounts quoted for a product other than `loan_type` are ignored.
+    """
+    facts: Dict[str, float] = {}
+    topic = f"{question} {answer}".lower()
+    for sentence in _SENTENCE.split(answer or ""):
+        lowered = sentence.lower()
+        if "processing fee" in lowered or "processing charge" in lowered:
+            percents = _PERCENT.findall(sentence)
+            if percents:
+                facts.setdefault("processing_fee_pct", float(percents[0]))
+            continue
+        if "interest" in lowered or ("rate" in lowered and "interest" in topic):
+            percents = [float(p) for p in _PERCENT.findall(sentence)]
+            if percents and "rate_min" not in facts:
+                facts["rate_min"] = min(percents[:2])
+                facts["rate_max"] = max(percents[:2])
+            continue
+        if "credit score" in lowered or "cibil" in lowered:
+            score = _CREDIT_SCORE.search(sentence)
+            if score:
+                facts.setdefault("min_credit_score", float(score.group(1)))
+            continue
+        if ("income" in lowered or "salary" in lowered) and "minimum" in topic:
+            amounts = parse_amounts(sentence)
+            if amounts:
+                facts.setdefault("min_income", amounts[0])
+            continue
+        if "tenure" in lowered or "repay" in lowered:
+            # "ranging from 2 months to 60 months": the longest one is the maximum
+            tenures = [_months(value, unit) for value, unit in _TENURE.findall(sentence)]
+            if tenures:
+                facts.setdefault("max_tenure_months", max(tenures))
+        if re.search(r"\b(up to|upto|maximum|max|borrow|ranging|as much as)\b", lowered) and "%" not in sentence:
+            amounts = [a for a in _clause_amounts(sentence, loan_type) if a >= 10000]
+            if amounts:
+                facts.setdefault("max_amount", max(amounts))
+    return facts
+
+
+def is_ranking_question(message: str) -> bool:
+    message = message or ""
+    return bool(_COMPARISON.search(message) or (_SUPERLATIVE.search(message) and _FIGURE.search(message)))
+
+
+class LenderRateTable:
+    def __init__(self, records: Iterable[Dict[str, object]]):
+        records = list(records)
+        self.size = len(records)
+        self.lender = np.array([r["lender"] for r in records], dtype=object)
+        self.loan_type = np.array([r["loan_type"] for r in records], dtype=object)
+        self.sources: List[Dict[str, str]] = [r["sources"] for r in records]
+        self.columns: Dict[str, np.ndarray] = {
+            field: np.array([r.get(field, np.nan) for r in records], dtype=np.float64) for field in NUMERIC_FIELDS
+        }
+        # (field, descending) -> row indices sorted with unknown values last
+        self._views: Dict[Tuple[str, bool], np.ndarray] = {}
+        for field in SORTABLE:
+            column = self.columns[field]
+            known = np.flatnonzero(~np.isnan(column))
+            for descending in (False, True):
+                order = known[np.argsort(-column[known] if descending else column[known], kind="stable")]
+                self._views[(field, descending)] = order
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[Optional[str], str, str]]) -> "LenderRateTable":
+        """rows: (`loan query` topic, question, answer) as in the FAQ CSV."""
+        merged: Dict[Tuple[str, str], Dict[str, object]] = {}
+        for topic, question, answer in rows:
+            facets = parse_facets(topic, question)
+            if not facets["lender"] or not facets["loan_type"]:
+                continue
+            facts = extract_facts(question, answer, facets["loan_type"])
+            if not facts:
+                continue
+            record = merged.setdefault(
+                (facets["lender"], facets["loan_type"]),
+                {"lender": facets["lender"], "loan_type": facets["loan_type"], "sources": {}},
+            )
+            for field, value in facts.items():
+                if field not in record:
+                    record[field] = value
+                    record["sources"][field] = question
+        return cls(merged.values())
+
+    def row(self, i: int) -> Dict[str, object]:
+        record: Dict[str, object] = {"lender": self.lender[i], "loan_type": self.loan_type[i]}
+        for field, column in self.columns.items():
+            value = column[i]
+            record[field] = None if np.isnan(value) else (float(value) if field in PERCENT_FIELDS else int(value))
+        record["sources"] = self.sources[i]
+        return record
+
+    def _mask(self, loan_type: Optional[str] = None, lenders: Optional[List[str]] = None,
+              max_rate: Optional[float] = None, min_amount: Optional[float] = None) -> np.ndarray:
+        mask = np.ones(self.size, dtype=bool)
+        if loan_type:
+            mask &= self.loan_type == loan_type
+        if lenders:
+            mask &= np.isin(self.lender, lenders)
+        if max_rate is not None:
+            mask &= self.columns["rate_min"] <= max_rate
+        if min_amount is not None:
+            mask &= self.columns["max_amount"] >= min_amount
+        return mask
+
+    def query(self, loan_type: Optional[str] = None, lenders: Optional[List[str]] = None,
+              sort_by: str = "rate_min", descending: Optional[bool] = None, limit: Optional[int] = 10,
+              max_rate: Optional[float] = None, min_amount: Optional[float] = None) -> List[Dict[str, object]]:
+        """Filtered rows, best first for `sort_by` unless `descending` says otherwise; rows without it are dropped."""
+        if sort_by not in SORTABLE:
+            raise ValueError(f"Cannot sort by {sort_by!r}; choose one of {', '.join(SORTABLE)}")
+        order = self._views[(sort_by, SORTABLE[sort_by] if descending is None else descending)]
+        selected = order[self._mask(loan_type, lenders, max_rate, min_amount)[order]]
+        return [self.row(i) for i in selected[:limit]]
+
+    def compare(self, lenders: List[str], loan_type: Optional[str] = None) -> List[Dict[str, object]]:
+        """Every known row for the given lenders, in the order they were asked about."""
+        mask = self._mask(loan_type, lenders)
+        rows = [self.row(i) for i in np.flatnonzero(mask)]
+        return sorted(rows, key=lambda r: (lenders.index(r["lender"]), r["loan_type"]))
+
+    def lender_rates(self, loan_type: str) -> Dict[str, float]:
+        """lender -> starting rate for one loan type (feeds the loan simulation grid)."""
+        return {row["lender"]: row["rate_min"] for row in self.query(loan_type=loan_type, limit=None)}
+
+    def rows_for_question(self, message: str, loan_type: Optional[str] = None) -> List[Dict[str, object]]:
+        """
+        Exact rows for comparison and ranking questions ("cheapest home loan?",
+        "SBI vs HDFC personal loan"); empty for anything else.
+        """
+        lenders = detect_lenders(message)
+        loan_type = detect_loan_type(message) or loan_type
+        if len(lenders) >= 2:
+            return self.compare(lenders, loan_type)[:TABLE_CONTEXT_ROWS]
+        # One lender named ("maximum amount at SBI?") is a plain FAQ question
+        if lenders or not is_ranking_question(message):
+            return []
+        sort_by = next((field for pattern, field in _SORT_HINTS if pattern.search(message)), "rate_min")
+        return self.query(loan_type=loan_type, sort_by=sort_by, limit=TABLE_CONTEXT_ROWS)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "rows": self.size,
+            "lenders": len(set(self.lender)),
+            "loan_types": sorted(set(self.loan_type)),
+            "coverage": {field: int((~np.isnan(col)).sum()) for field, col in self.columns.items()},
+        }
+
+
+def format_rows(rows: List[Dict[str, object]]) -> str:
+    """One line per row for prompts."""
+    lines = []
+    for row in rows:
+        parts = [f"{row['lender']} {row['loan_type']} loan"]
+        if row["rate_min"] is not None:
+            rate = f"{row['rate_min']}%" if row["rate_min"] == row["rate_max"] else f"{row['rate_min']}–{row['rate_max']}%"
+            parts.append(f"interest {rate} p.a.")
+        if row["max_amount"] is not None:
+            parts.append(f"up to {format_inr(row['max_amount'])}")
+        if row["max_tenure_months"] is not None:
+            parts.append(f"tenure up to {row['max_tenure_months']} months")
+        if row["processing_fee_pct"] is not None:
+            parts.append(f"processing fee {row['processing_fee_pct']}%")
+        if row["min_income"] is not None:
+            parts.append(f"min income {format_inr(row['min_income'])}")
+        if row["min_credit_score"] is not None:
+            parts.append(f"min credit score {row['min_credit_score']}")
+        lines.append("- " + ", ".join(parts))
+    return "\n".join(lines)
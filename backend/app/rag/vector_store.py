@@ -1,27 +1,127 @@
-from typing import List, Tuple
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Set, Tuple
 import numpy as np
 
+from app.observability import log_event
+
+from .bm25 import BM25Index
+from .facets import FACET_KEYS, normalize_facet
+from .quantization import make_storage
+
 class SimpleVectorStore:
-    def __init__(self):
-        self.entries: List[Tuple[str, str, List[float]]] = []
+    """
+    FAQ store with hybrid retrieval: a BM25 inverted index over question/answer
+    text picks a shortlist, dense cosine scoring runs only on that shortlist,
+    and both rankings are merged with reciprocal-rank fusion (RRF).
 
-    def add(self, question: str, answer: str, embed_func):
-        embedding = embed_func(question)
-        self.entries.append((question, answer, embedding))
+    Entries are also partitioned by facet (loan_type, lender) so a filtered
+    search only scores the matching partition.
 
-    def search(self, query: str, embed_func, top_k: int = 3, threshold: float = 0.6) -> List[Tuple[str, str, float]]:
-        query_vector = embed_func(query)
-        results = []
+    Embeddings live in a packed matrix (see quantization.py) rather than per-entry
+    lists; `storage` selects float32, float16 or int8 rows.
+    """
+
+    def __init__(self, shortlist_size: int = 50, rrf_k: int = 60, storage: str = "float32"):
+        self.entries: List[Tuple[str, str]] = []
+        self.vectors = make_storage(storage)
+        self.storage = storage
+        self.facets: List[Dict[str, Optional[str]]] = []
+        self.partitions: Dict[str, Dict[str, Set[int]]] = {key: defaultdict(set) for key in FACET_KEYS}
+        self.lexical_index = BM25Index()
+        self.shortlist_size = shortlist_size
+        self.rrf_k = rrf_k
+
+    def add(self, question: str, answer: str, embed_func, facets: Optional[Dict[str, Optional[str]]] = None,
+            embedding: Optional[np.ndarray] = None):
+        if embedding is None:
+            embedding = embed_func(question)
+        doc_id = len(self.entries)
+        self.entries.append((question, answer))
+        self.vectors.append(embedding)
+        self.lexical_index.add(f"{question} {answer}")
+
+        facets = facets or {}
+        self.facets.append({key: facets.get(key) for key in FACET_KEYS})
+        for key in FACET_KEYS:
+            value = normalize_facet(facets.get(key))
+            if value:
+                self.partitions[key][value].add(doc_id)
+
+    def search(self, query: str, embed_func, top_k: int = 3, threshold: float = 0.6,
+               filters: Optional[Dict[str, Optional[str]]] = None,
+               query_vector: Optional[np.ndarray] = None) -> List[Tuple[str, str, float]]:
+        """
+        `query_vector` lets async callers embed the query themselves (see aembed_text);
+        otherwise `embed_func(query)` is called.
+        """
+        if not self.entries:
+            return []
+        if query_vector is None:
+            query_vector = embed_func(query)
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+
+        partition = self._partition(filters)
+        results, scope = [], "global"
+        if partition:
+            results, scope = self._search_within(query, query_vector, partition, threshold), "partition"
+            if not results:
+                log_event("vector_partition_miss", filters=filters)  # falls back to global search
+        if not results:
+            results, scope = self._search_within(query, query_vector, None, threshold), "global"
 
-        for q, a, vec in self.entries:
-            similarity = self._cosine_similarity(query_vector, vec)
-            print(f"🔍 '{query}' vs '{q}' → Similarity: {similarity:.2f}")
+        top = [(q, a, sim) for _, sim, q, a in results[:top_k]]
+        log_event("vector_search", query=query[:200], scope=scope, matches=len(results),
+                  top=[{"question": q, "similarity": round(sim, 3)} for q, _, sim in top])
+        return top
+
+    def _partition(self, filters: Optional[Dict[str, Optional[str]]]) -> Optional[Set[int]]:
+        """
+        Intersect the partitions selected by `filters`; None/empty values are ignored.
+        Returns None when no filter applies.
+        """
+        selected = None
+        for key, value in (filters or {}).items():
+            value = normalize_facet(value)
+            if key not in self.partitions or not value:
+                continue
+            ids = self.partitions[key].get(value, set())
+            selected = ids if selected is None else selected & ids
+        return selected
+
+    def _search_within(self, query: str, query_vector: np.ndarray, allowed: Optional[Set[int]],
+                       threshold: float) -> List[Tuple[float, float, str, str]]:
+        # Lexical stage: shortlist candidates from the inverted index
+        lexical_hits = self.lexical_index.search(query, limit=self.shortlist_size, allowed=allowed)
+        candidate_ids = [doc_id for doc_id, _ in lexical_hits]
+        lexical_ranks = {doc_id: rank for rank, (doc_id, _) in enumerate(lexical_hits)}
+
+        results = self._rank(query, query_vector, candidate_ids, lexical_ranks, threshold)
+
+        # Nothing in the shortlist cleared the threshold — score the remaining entries
+        if not results:
+            shortlisted = set(candidate_ids)
+            universe = sorted(allowed) if allowed is not None else range(len(self.entries))
+            rest = [i for i in universe if i not in shortlisted]
+            results = self._rank(query, query_vector, rest, lexical_ranks, threshold)
+        return results
+
+    def _rank(self, query: str, query_vector: np.ndarray, ids: Sequence[int],
+              lexical_ranks: Dict[int, int], threshold: float) -> List[Tuple[float, float, str, str]]:
+        if not ids:
+            return []
+        similarities = self.vectors.cosine_similarities(query_vector, ids)
+        dense_order = np.argsort(-similarities)
+
+        results = []
+        for dense_rank, pos in enumerate(dense_order):
+            doc_id = ids[pos]
+            q, a = self.entries[doc_id]
+            similarity = float(similarities[pos])
             if similarity >= threshold:
-                results.append((similarity, q, a))
+                fused = 1.0 / (self.rrf_k + dense_rank + 1)
+                if doc_id in lexical_ranks:
+                    fused += 1.0 / (self.rrf_k + lexical_ranks[doc_id] + 1)
+                results.append((fused, similarity, q, a))
 
         results.sort(key=lambda x: x[0], reverse=True)
-        return [(q, a, sim) for sim, q, a in results[:top_k]]
-
-    def _cosine_similarity(self, a: List[float], b: List[float]) -> float:
-        a, b = np.array(a), np.array(b)
-        return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+        return results
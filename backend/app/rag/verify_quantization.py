@@ -0,0 +1,77 @@
+"""
+Compare quantized embedding storage against float32 on the FAQ dataset.
+
+Every FAQ answer is used as a query against the question embeddings; for each
+storage mode we report how often its top-k set matches float32, top-1
+agreement, the largest score error and the bytes needed per entry.
+
+Usage (from backend/):
+    python -m app.rag.verify_quantization --k 3
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from .embeddings import embed_text
+from .quantization import STORAGE_MODES, make_storage
+
+CSV_PATH = os.path.join("Data", "loan_faq_dataset.csv")
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    return np.argsort(-scores)[:k]
+
+
+def verify(questions, queries, k: int = 3):
+    question_vectors = [embed_text(q) for q in questions]
+    query_vectors = [embed_text(q) for q in queries]
+
+    storages = {}
+    for mode in STORAGE_MODES:
+        storage = make_storage(mode)
+        for vec in question_vectors:
+            storage.append(vec)
+        storages[mode] = storage
+
+    reference = [storages["float32"].cosine_similarities(q) for q in query_vectors]
+    report = {}
+    for mode, storage in storages.items():
+        overlap, top1, max_error = 0.0, 0, 0.0
+        for ref_scores, query in zip(reference, query_vectors):
+            scores = storage.cosine_similarities(query)
+            ref_top, mode_top = top_k(ref_scores, k), top_k(scores, k)
+            overlap += len(set(ref_top) & set(mode_top)) / k
+            top1 += int(ref_top[0] == mode_top[0])
+            max_error = max(max_error, float(np.abs(scores - ref_scores).max()))
+        report[mode] = {
+            f"top{k}_agreement": overlap / len(query_vectors),
+            "top1_agreement": top1 / len(query_vectors),
+            "max_score_error": max_error,
+            "bytes_per_entry": storage.nbytes / len(storage),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify recall of quantized vector storage against float32.")
+    parser.add_argument("--csv", default=CSV_PATH)
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv).dropna(subset=["question", "answer"])
+    report = verify(df["question"].astype(str).tolist(), df["answer"].astype(str).tolist(), k=args.k)
+
+    print(f"📊 {len(df)} queries, k={args.k}")
+    for mode, stats in report.items():
+        print(
+            f"{mode:>8}: top{args.k} agreement {stats[f'top{args.k}_agreement']:.3f} | "
+            f"top1 agreement {stats['top1_agreement']:.3f} | "
+            f"max score error {stats['max_score_error']:.4f} | "
+            f"{stats['bytes_per_entry']:.0f} bytes/entry"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.database import engine, get_db
+from app.models.analytics import AnalyticsDaily, AnalyticsDailyLoanType
+from app.services.analytics import FUNNEL, STAGES, status
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+# Every endpoint reads the rollup tables only (one row per day, or per day and loan type),
+# never `intents`; they trail live traffic by up to ANALYTICS_LAG_SECONDS + ANALYTICS_REFRESH_SECONDS.
+
+
+def _since(days: int):
+    return datetime.utcnow().date() - timedelta(days=days - 1)
+
+
+def _rate(part: int, whole: int):
+    return round(part / whole, 4) if whole else None
+
+
+@router.get("/daily")
+async def daily(days: int = 30, db: AsyncSession = Depends(get_db)):
+    """Sessions started, turns and funnel stages reached per day over the last `days`."""
+    rows = (await db.execute(
+        select(AnalyticsDaily).where(AnalyticsDaily.day >= _since(days)).order_by(AnalyticsDaily.day.asc())
+    )).scalars().all()
+    return {"since": _since(days), "days": [
+        {"day": r.day, "sessions": r.sessions, "turns": r.turns,
+         **{stage: getattr(r, stage) for stage in STAGES},
+         "high_income_check_rate": _rate(r.high_income_check, r.sessions)}
+        for r in rows
+    ]}
+
+
+@router.get("/funnel")
+async def funnel(days: int = 30, db: AsyncSession = Depends(get_db)):
+    """greeting → loan_inquiry → loan_rag → farewell for the sessions started in the last `days`."""
+    rows = (await db.execute(
+        select(AnalyticsDaily).where(AnalyticsDaily.day >= _since(days))
+    )).scalars().all()
+    started = sum(r.sessions for r in rows)
+    reached = {stage: sum(getattr(r, stage) for r in rows) for stage in STAGES}
+    steps, previous = [], started
+    for stage in FUNNEL:
+        steps.append({"stage": stage, "sessions": reached[stage],
+                      "of_started": _rate(reached[stage], started), "of_previous": _rate(reached[stage], previous)})
+        previous = reached[stage]
+    return {
+        "since": _since(days),
+        "sessions": started,
+        "funnel": steps,
+        "high_income_check": {"sessions": reached["high_income_check"],
+                              "rate": _rate(reached["high_income_check"], started)},
+        "irrelevant": {"sessions": reached["irrelevant"], "rate": _rate(reached["irrelevant"], started)},
+    }
+
+
+@router.get("/loan-types")
+async def loan_type_mix(days: int = 30, db: AsyncSession = Depends(get_db)):
+    """Loan type mix over the last `days`, by sessions (first loan type named) and by turns."""
+    rows = (await db.execute(
+        select(AnalyticsDailyLoanType).where(AnalyticsDailyLoanType.day >= _since(days))
+    )).scalars().all()
+    totals = defaultdict(lambda: {"sessions": 0, "turns": 0})
+    for r in rows:
+        totals[r.loan_type]["sessions"] += r.sessions
+        totals[r.loan_type]["turns"] += r.turns
+    sessions, turns = sum(t["sessions"] for t in totals.values()), sum(t["turns"] for t in totals.values())
+    return {"since": _since(days), "loan_types": [
+        {"loan_type": loan_type, **t, "session_share": _rate(t["sessions"], sessions),
+         "turn_share": _rate(t["turns"], turns)}
+        for loan_type, t in sorted(totals.items(), key=lambda item: -item[1]["sessions"])
+    ]}
+
+
+@router.get("/status")
+async def rollup_status():
+    """Watermark of the rollup job and how many saved turns it hasn't folded in yet."""
+    async with engine.connect() as conn:
+        return await conn.run_sync(status)
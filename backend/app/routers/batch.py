@@ -0,0 +1,144 @@
+"""
+Batch replay of scripted conversations against /api/chat or /api/rag-chat.
+
+Each script is one session: its messages run in order, one turn after the
+other, while up to `concurrency` scripts run side by side. Turns call the
+route handlers in-process, so they share this worker's LLM/Serper clients,
+embedding cache and FAQ index, and still go through the admission controller
+(rate limits are skipped — the batch is one trusted caller). Results stream
+back as NDJSON, one line per turn as soon as it finishes, then a summary line:
+
+    {"script": 0, "session_id": "...", "turn": 1, "message": "...", "status": 200,
+     "response": "...", "tier": "faq_llm", "latency_ms": 812.4, "stages": {"rag_search": 14.2, ...}}
+    {"summary": {"scripts": 50, "turns": 200, "errors": 1, "tiers": {...}, "latency_ms": {"p50": ..., "p95": ...}}}
+"""
+import asyncio
+import json
+import os
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+from uuid import uuid4
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.database import async_session_maker
+from app.observability import current_trace
+from app.routers.chat import chat_endpoint
+from app.routers.rag_chat import rag_chat
+from app.schemas import BatchRequest, BatchScript
+from app.services.admission import Admission, AdmissionRejected, admission_controller
+from app.services.deadline import DeadlineExceeded
+
+router = APIRouter(tags=["Batch"])
+
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+ROUTES = {"chat": chat_endpoint, "rag-chat": rag_chat}
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100.0))], 1)
+
+
+async def run_turn(route: str, script: BatchScript, session_id: str, user_uuid, message: str,
+                   request_budget_ms: Optional[int]) -> Dict[str, Any]:
+    """One turn through the route handler; runs in its own task so per-request context starts clean."""
+    started = time.perf_counter()
+    admission = Admission(admission_controller)
+    try:
+        async with async_session_maker() as db:
+            result = await ROUTES[route](
+                query={"message": message, "model": script.model},
+                session_id=session_id,
+                user_uuid=user_uuid,
+                request_budget_ms=request_budget_ms,
+                db=db,
+                admission=admission,
+            )
+        status = 200
+    except HTTPException as e:
+        status, result = e.status_code, {"error": e.detail}
+    except AdmissionRejected as e:
+        status, result = 429, {"error": str(e), "reason": e.reason}
+    except DeadlineExceeded as e:
+        status, result = 504, {"error": str(e)}
+    except Exception as e:
+        status, result = 500, {"error": str(e)}
+    finally:
+        admission.release()
+
+    trace = current_trace()
+    return {
+        "status": status,
+        **result,
+        "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+        "stages": {stage: round(seconds * 1000, 1) for stage, seconds in trace.stages.items()} if trace else {},
+    }
+
+
+@router.post("/chat/batch")
+async def chat_batch(request: BatchRequest):
+    """Replay many conversations concurrently (turn order kept per session); streams NDJSON."""
+    routes = {script.route or request.route for script in request.scripts}
+    unknown = routes - ROUTES.keys()
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown route(s) {sorted(unknown)}; use one of {sorted(ROUTES)}")
+    if any(not script.messages for script in request.scripts):
+        raise HTTPException(status_code=400, detail="Every script needs at least one message")
+
+    queue: asyncio.Queue = asyncio.Queue()
+    limit = asyncio.Semaphore(min(request.concurrency, BATCH_MAX_CONCURRENCY))
+
+    async def run_script(index: int, script: BatchScript) -> None:
+        session_id = script.session_id or f"batch-{uuid4().hex}"
+        user_uuid = script.user_uuid or uuid4()
+        route = script.route or request.route
+        async with limit:
+            for turn, message in enumerate(script.messages, start=1):
+                outcome = await asyncio.create_task(
+                    run_turn(route, script, session_id, user_uuid, message, request.request_budget_ms)
+                )
+                await queue.put({"script": index, "session_id": session_id, "route": route,
+                                 "turn": turn, "message": message, **outcome})
+
+    async def run_all() -> None:
+        try:
+            await asyncio.gather(*(run_script(i, s) for i, s in enumerate(request.scripts)))
+        finally:
+            await queue.put(None)
+
+    async def stream():
+        started = time.perf_counter()
+        runner = asyncio.create_task(run_all())
+        latencies: List[float] = []
+        statuses: Counter = Counter()
+        tiers: Counter = Counter()
+        try:
+            while True:
+                line = await queue.get()
+                if line is None:
+                    break
+                latencies.append(line["latency_ms"])
+                statuses[line["status"]] += 1
+                if line.get("tier"):
+                    tiers[line["tier"]] += 1
+                yield json.dumps(line, default=str) + "\n"
+            await runner  # surfaces anything that escaped run_turn
+            yield json.dumps({"summary": {
+                "scripts": len(request.scripts),
+                "turns": len(latencies),
+                "errors": sum(n for status, n in statuses.items() if status != 200),
+                "statuses": {str(status): n for status, n in sorted(statuses.items())},
+                "tiers": dict(tiers),
+                "elapsed_seconds": round(time.perf_counter() - started, 2),
+                "latency_ms": {"p50": percentile(latencies, 50), "p95": percentile(latencies, 95)},
+            }}) + "\n"
+        finally:
+            # Client went away mid-stream: stop the remaining turns
+            runner.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
@@ -0,0 +1,55 @@
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query
+
+from app.rag.facets import LOAN_TYPE_ALIASES, detect_lender, detect_loan_type
+from app.rag.load_knowledge import aget_rate_table
+from app.rag.rate_table import SORTABLE
+
+router = APIRouter(prefix="/rates", tags=["Rates"])
+
+
+def _loan_type(loan_type: Optional[str]) -> Optional[str]:
+    """Canonical loan type; an unrecognised one is a 400, never a silently dropped filter."""
+    if not loan_type:
+        return None
+    resolved = detect_loan_type(loan_type)
+    if resolved is None:
+        raise HTTPException(status_code=400, detail=f"loan_type must be one of: {', '.join(LOAN_TYPE_ALIASES)}")
+    return resolved
+
+
+@router.get("")
+async def list_rates(
+    loan_type: Optional[str] = None,
+    lender: Optional[List[str]] = Query(None),
+    sort_by: str = "rate_min",
+    descending: Optional[bool] = None,
+    max_rate: Optional[float] = None,
+    min_amount: Optional[float] = None,
+    limit: int = Query(10, ge=1, le=200),
+):
+    """Lender × loan-type rows from the FAQ corpus, filtered and ranked best-first by `sort_by`."""
+    if sort_by not in SORTABLE:
+        raise HTTPException(status_code=400, detail=f"sort_by must be one of: {', '.join(SORTABLE)}")
+    loan_type = _loan_type(loan_type)
+    table = await aget_rate_table()
+    rows = table.query(
+        loan_type=loan_type,
+        lenders=[detect_lender(name) or name for name in lender] if lender else None,
+        sort_by=sort_by, descending=descending, limit=limit, max_rate=max_rate, min_amount=min_amount,
+    )
+    return {"sort_by": sort_by, "count": len(rows), "rows": rows}
+
+
+@router.get("/compare")
+async def compare_rates(lender: List[str] = Query(...), loan_type: Optional[str] = None):
+    """Side-by-side rows for the named lenders ("SBI", "hdfc", ...)."""
+    loan_type = _loan_type(loan_type)
+    table = await aget_rate_table()
+    lenders = [detect_lender(name) or name for name in lender]
+    return {"lenders": lenders, "rows": table.compare(lenders, loan_type)}
+
+
+@router.get("/stats")
+async def rate_table_stats():
+    return (await aget_rate_table()).stats()
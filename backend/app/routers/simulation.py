@@ -0,0 +1,67 @@
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.rag.load_knowledge import aget_rate_table
+from app.models.base import LoanSimulation
+from app.schemas import SimulationRequest
+from app.services.loan_simulation import MAX_COMBINATIONS, grid_size, simulate
+
+router = APIRouter(tags=["Simulations"])
+
+
+@router.post("/simulations")
+async def create_simulation(
+    request: SimulationRequest,
+    session_id: Optional[str] = Header(None, convert_underscores=False),
+    user_uuid: Optional[str] = Header(None, convert_underscores=False),
+    db: AsyncSession = Depends(get_db)
+):
+    """EMI, total interest and FOIR eligibility across lenders/rates × tenures × amounts; stored in loan_simulations."""
+    lenders = request.lenders
+    if not lenders and not request.rates and request.loan_type:
+        # Real starting rates from the lender table; falls back to indicative ranges when it has none
+        lenders = (await aget_rate_table()).lender_rates(request.loan_type) or None
+    combinations = grid_size(request.loan_type, request.amounts, request.tenures_months, request.rates, lenders)
+    if combinations > MAX_COMBINATIONS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"{combinations} rate × tenure × amount combinations requested; at most {MAX_COMBINATIONS} are simulated.",
+        )
+    result = simulate(
+        request.monthly_income,
+        loan_type=request.loan_type,
+        existing_emi=request.existing_emi,
+        amounts=request.amounts,
+        tenures=request.tenures_months,
+        rates=request.rates,
+        lenders=lenders,
+        foir=request.foir,
+        schedule=request.schedule,
+    )
+    # Chat users are identified by user_uuid, not a users row, so it is kept with the input
+    simulation = LoanSimulation(
+        eligibility_score=result["eligibility_score"],
+        simulation_input={**request.model_dump(), "session_id": session_id, "user_uuid": user_uuid},
+        simulation_result=result,
+        created_at=datetime.utcnow(),
+    )
+    db.add(simulation)
+    await db.commit()
+    await db.refresh(simulation)
+    return {"id": simulation.id, **result}
+
+
+@router.get("/simulations/{simulation_id}")
+async def get_simulation(simulation_id: int, db: AsyncSession = Depends(get_db)):
+    simulation = await db.get(LoanSimulation, simulation_id)
+    if not simulation:
+        raise HTTPException(status_code=404, detail="Simulation not found")
+    return {
+        "id": simulation.id,
+        "created_at": simulation.created_at,
+        "input": simulation.simulation_input,
+        **simulation.simulation_result,
+    }
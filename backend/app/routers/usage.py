@@ -0,0 +1,68 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.database import get_db
+from app.models.intent import Intent
+from app.services.usage import merge_totals
+
+router = APIRouter(prefix="/usage", tags=["Usage"])
+
+
+def _call_totals(call: dict) -> dict:
+    return {
+        "calls": 1,
+        "prompt_tokens": call.get("prompt_tokens", 0),
+        "completion_tokens": call.get("completion_tokens", 0),
+        "total_tokens": call.get("prompt_tokens", 0) + call.get("completion_tokens", 0),
+        "cached_tokens": call.get("cached_tokens", 0),
+        "latency_ms": call.get("latency_ms", 0.0),
+        "cost_usd": call.get("cost_usd", 0.0),
+    }
+
+
+@router.get("/sessions/{session_id}")
+async def session_usage(session_id: str, db: AsyncSession = Depends(get_db)):
+    """Per-turn LLM usage for one session plus the running session totals."""
+    rows = (await db.execute(
+        select(Intent.id, Intent.intent, Intent.created_at, Intent.llm_usage)
+        .where(Intent.session_id == session_id)
+        .order_by(Intent.created_at.asc())
+    )).all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="Session not found")
+    turns = [
+        {"id": r.id, "intent": r.intent, "created_at": r.created_at, "route": (r.llm_usage or {}).get("route"),
+         "totals": (r.llm_usage or {}).get("totals"), "by_stage": (r.llm_usage or {}).get("by_stage")}
+        for r in rows
+    ]
+    last_usage = next((r.llm_usage for r in reversed(rows) if r.llm_usage), None) or {}
+    return {"session_id": session_id, "turns": turns, "session_totals": last_usage.get("session_totals")}
+
+
+@router.get("/rollup")
+async def usage_rollup(hours: int = 24, db: AsyncSession = Depends(get_db)):
+    """Token, latency and cost totals over the last `hours`, by route and model and by route and stage."""
+    since = datetime.utcnow() - timedelta(hours=hours)
+    usages = (await db.execute(
+        select(Intent.llm_usage).where(Intent.created_at >= since, Intent.llm_usage.isnot(None))
+    )).scalars().all()
+
+    by_model, by_stage = defaultdict(dict), defaultdict(dict)
+    for usage in usages:
+        route = usage.get("route") or "unknown"
+        for call in usage.get("calls", []):
+            totals = _call_totals(call)
+            model, stage = call.get("model", "unknown"), call.get("stage", "unattributed")
+            by_model[route][model] = merge_totals(by_model[route].get(model), totals)
+            by_stage[route][stage] = merge_totals(by_stage[route].get(stage), totals)
+
+    return {
+        "since": since,
+        "turns": len(usages),
+        "totals": merge_totals(*(usage.get("totals") for usage in usages)),
+        "by_route_model": by_model,
+        "by_route_stage": by_stage,
+    }
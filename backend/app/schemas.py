@@ -1,5 +1,6 @@
-from pydantic import BaseModel, ConfigDict
-from typing import Optional, Dict, Any
+from pydantic import BaseModel, ConfigDict, Field, confloat, conint
+from typing import Optional, Dict, Any, List
+from uuid import UUID
 
 class IntentBase(BaseModel):
     name: str
@@ -17,3 +18,30 @@ class IntentOut(IntentBase):
     id: int
 
     model_config = ConfigDict(from_attributes=True)  
+
+SIMULATION_MAX_OPTIONS = 50  # per list; the whole grid is capped by loan_simulation.MAX_COMBINATIONS
+Rate = confloat(ge=0, le=100, allow_inf_nan=False)  # annual %
+
+class SimulationRequest(BaseModel):
+    monthly_income: float = Field(..., gt=0, allow_inf_nan=False)
+    loan_type: Optional[str] = None
+    existing_emi: float = Field(0.0, ge=0, allow_inf_nan=False)
+    amounts: Optional[List[confloat(gt=0, allow_inf_nan=False)]] = Field(None, max_length=SIMULATION_MAX_OPTIONS)
+    tenures_months: Optional[List[conint(gt=0, le=600)]] = Field(None, max_length=SIMULATION_MAX_OPTIONS)
+    rates: Optional[List[Rate]] = Field(None, max_length=SIMULATION_MAX_OPTIONS)
+    lenders: Optional[Dict[str, Rate]] = Field(None, max_length=SIMULATION_MAX_OPTIONS)  # lender -> annual rate %, overrides `rates`
+    foir: Optional[float] = Field(None, gt=0, le=1)
+    schedule: bool = False
+
+class BatchScript(BaseModel):
+    messages: List[str]
+    session_id: Optional[str] = None  # defaults to a fresh batch-<uuid> session
+    user_uuid: Optional[UUID] = None
+    model: str = "GPT-4"
+    route: Optional[str] = None  # overrides BatchRequest.route for this script
+
+class BatchRequest(BaseModel):
+    scripts: List[BatchScript]
+    route: str = "chat"  # chat | rag-chat
+    concurrency: int = Field(8, ge=1)
+    request_budget_ms: Optional[int] = None
@@ -1,8 +1,15 @@
 import os
-import re
-import json
-from typing import Optional, Dict
-from openai import OpenAI, OpenAIError
+from concurrent.futures import TimeoutError as FuturesTimeout
+from typing import Optional
+from openai import (
+    OpenAI, OpenAIError, RateLimitError, APITimeoutError, APIConnectionError, InternalServerError
+)
+
+from app.services.singleflight import SingleFlight
+from app.services.usage import note_coalesced, note_tokens
+from app.services.llm import (
+    EXIT_PHRASES, LLMProvider, ProviderError, ProviderQuotaError, ProviderTimeoutError, ProviderUnavailableError
+)
 
 MODEL_CHOICES = {
     "GPT-3.5 Turbo": "gpt-3.5-turbo",
@@ -10,137 +17,63 @@ MODEL_CHOICES = {
     "GPT-4o": "gpt-4o"
 }
 
-EXIT_PHRASES = {
-    "ok", "okay", "thanks", "thank you", "got it", "bye", "cool",
-    "okay thanks", "i got it", "no more questions", "alright", "fine", "that's all"
-}
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+
+_inflight = SingleFlight("openai", retry_on=(ProviderTimeoutError,))
+
+class OpenAIClient(LLMProvider):
+    name = "openai"
+    MODEL_CHOICES = MODEL_CHOICES
+    default_model = MODEL_CHOICES["GPT-4"]
 
-class OpenAIClient:
     def __init__(self, api_key: Optional[str] = None):
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise ValueError("❌ OPENAI_API_KEY not set.")
-        self.client = OpenAI(api_key=self.api_key)
-        self.model = MODEL_CHOICES["GPT-4"]
+        self.client = OpenAI(api_key=self.api_key, max_retries=OPENAI_MAX_RETRIES)
+        self.model = self.default_model
 
     def set_model(self, model_display_name: str):
-        normalized_name = model_display_name.strip().lower()
-        for name, internal_model in MODEL_CHOICES.items():
-            if name.lower() == normalized_name or internal_model == normalized_name:
-                self.model = internal_model
-                return
-        raise ValueError(f"⚠️ Invalid model name: {model_display_name}")
+        internal_model = self.resolve_model(model_display_name)
+        if not internal_model:
+            raise ValueError(f"⚠️ Invalid model name: {model_display_name}")
+        self.model = internal_model
 
-    def generate_response(self, message: str) -> str:
+    def generate_response(self, message: str, model: Optional[str] = None, timeout: Optional[float] = None) -> str:
+        internal_model = (model and self.resolve_model(model)) or self.model
+        try:
+            return _inflight.do(
+                (internal_model, message),
+                lambda call_timeout: self._complete(message, internal_model, call_timeout),
+                timeout=timeout or LLM_TIMEOUT_SECONDS,
+                on_coalesced=note_coalesced,
+            )
+        except FuturesTimeout:
+            raise ProviderTimeoutError("⏳ OpenAI request timed out.", self.name)
+
+    def _complete(self, message: str, internal_model: str, timeout: float) -> str:
         try:
             completion = self.client.chat.completions.create(
-                model=self.model,
+                model=internal_model,
                 messages=[{"role": "user", "content": message}],
-                temperature=0.7
+                temperature=0.7,
+                timeout=timeout
             )
+            if completion.usage:
+                details = getattr(completion.usage, "prompt_tokens_details", None)
+                note_tokens(completion.usage.prompt_tokens, completion.usage.completion_tokens,
+                            getattr(details, "cached_tokens", 0) if details else 0)
             return completion.choices[0].message.content.strip()
+        except RateLimitError as e:
+            print(f"⚠️ OpenAI API Error: {e}")
+            raise ProviderQuotaError("🚫 OpenAI API quota exceeded.", self.name)
+        except APITimeoutError as e:
+            print(f"⚠️ OpenAI API Error: {e}")
+            raise ProviderTimeoutError("⏳ OpenAI request timed out.", self.name)
+        except (APIConnectionError, InternalServerError) as e:
+            print(f"⚠️ OpenAI API Error: {e}")
+            raise ProviderUnavailableError("⚠️ Failed to get response from OpenAI.", self.name)
         except OpenAIError as e:
             print(f"⚠️ OpenAI API Error: {e}")
-            raise RuntimeError("⚠️ Failed to get response from OpenAI.")
-
-    def is_loan_related(self, message: str) -> bool:
-        prompt = (
-            "You are a strict classifier. Only respond with 'yes' or 'no'.\n"
-            "Determine if the query is strictly about one of the following loan types:\n"
-            "- personal loan\n- home loan\n- education loan\n- vehicle loan\n- business loan\n- MSME loan\n\n"
-            "If it's any other type (e.g., car wash, cosmetic, travel, wedding), respond 'no'.\n"
-            f"User query: {message}"
-        )
-        try:
-            answer = self.generate_response(prompt).lower().strip().strip(".?!")
-            return answer == "yes"
-        except Exception as e:
-            print(f"⚠️ Loan intent classification failed: {e}")
-            return False
-
-    def is_greeting(self, message: str) -> bool:
-        prompt = (
-            "You're a classifier. Respond only with 'yes' or 'no'.\n"
-            "Does this message look like a general greeting (e.g., hi, hello, hey, good morning, etc)?\n"
-            f"Message: {message}"
-        )
-        try:
-            answer = self.generate_response(prompt).lower().strip().strip(".?!")
-            return answer == "yes"
-        except Exception as e:
-            print(f"⚠️ Greeting classification failed: {e}")
-            return False
-
-    def is_exit(self, message: str, full_context: str = "") -> bool:
-        if message.strip().lower() in EXIT_PHRASES:
-            print("🧠 Exact exit phrase match.")
-            return True
-
-        prompt = (
-            f"The user sent this message: '{message}'\n\n"
-            f"The chat so far:\n{full_context}\n\n"
-            "Does this message politely indicate the user is ending the conversation?\n"
-            "Reply with only 'yes' or 'no'."
-        )
-        try:
-            answer = self.generate_response(prompt).lower().strip().strip(".?!")
-            return answer == "yes"
-        except Exception as e:
-            print(f"⚠️ Exit classification failed: {e}")
-            return False
-
-    def extract_parameters(self, message: str) -> Dict[str, Optional[str]]:
-        prompt = (
-            "Extract loan-related details from the user's message.\n"
-            "Respond with ONLY a valid JSON object with these fields:\n"
-            "- location: city or state\n"
-            "- income: monthly income (like 1 lakh, 50000, etc.)\n"
-            "- timeline: when they plan to take the loan\n"
-            "If any value is not found, return it as null.\n\n"
-            f"User message: \"{message}\"\n\n"
-            "Output:\n{\"location\": ..., \"income\": ..., \"timeline\": ...}"
-        )
-        try:
-            response = self.generate_response(prompt)
-            print("🔍 OpenAI raw response:", response)
-
-            response = response.strip()
-            if response.startswith("```"):
-                response = re.sub(r"^```(?:json)?\n?", "", response)
-                response = re.sub(r"\n?```$", "", response)
-
-            json_like = re.search(r'\{.*?\}', response, re.DOTALL)
-            if not json_like:
-                raise ValueError("OpenAI did not return valid JSON format.")
-
-            fixed_json = json_like.group().replace("'", '"').replace("\\", "")
-            parsed = json.loads(fixed_json)
-
-            for key in ["location", "income", "timeline"]:
-                if key not in parsed:
-                    parsed[key] = None
-
-            if parsed.get("income"):
-                parsed["income"] = self._normalize_income(parsed["income"])
-            elif parsed.get("income") is None:
-                parsed["income"] = self._normalize_income(message)
-
-            return parsed
-        except Exception as e:
-            print(f"⚠️ Failed to extract JSON from OpenAI: {e}")
-            return {}
-
-    def _normalize_income(self, income_str: str) -> Optional[int]:
-        try:
-            income_str = income_str.lower().replace(",", "").replace("₹", "").replace("rs", "").strip()
-            if "lakh" in income_str:
-                num = float(re.search(r"[\d.]+", income_str).group())
-                return int(num * 100000)
-            elif "k" in income_str:
-                num = float(re.search(r"[\d.]+", income_str).group())
-                return int(num * 1000)
-            elif income_str.replace(".", "", 1).isdigit():
-                return int(float(income_str))
-        except Exception as e:
-            print(f"⚠️ Failed to normalize income: {e}")
-        return None
+            raise ProviderError("⚠️ Failed to get response from OpenAI.", self.name)
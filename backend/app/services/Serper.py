@@ -1,9 +1,17 @@
 import os
+from concurrent.futures import TimeoutError as FuturesTimeout
+
 import requests
 
+from app.services.deadline import stage_timeout
+from app.services.singleflight import SingleFlight
+
 # Environment or fallback URL
 SERPER_API_KEY = os.getenv("SERPER_API_KEY")
-SERPER_API_URL = "https://google.serper.dev/search"
+SERPER_API_URL = os.getenv("SERPER_API_URL", "https://google.serper.dev/search")
+SERPER_TIMEOUT_SECONDS = 10
+
+_inflight = SingleFlight("serper", retry_on=(requests.Timeout,))
 
 class SerperClient:
     def __init__(self, api_key: str = None):
@@ -11,16 +19,27 @@ class SerperClient:
         if not self.api_key:
             raise ValueError("Serper API key not set. Please set SERPER_API_KEY in your environment.")
 
-    def search(self, query: str, gl: str = "in", hl: str = "en") -> dict:
-        headers = {
-            "X-API-KEY": self.api_key,
-            "Content-Type": "application/json"
-        }
+    def search(self, query: str, gl: str = "in", hl: str = "en", timeout: float = None) -> dict:
         payload = {
             "q": query.strip(),
             "gl": gl,
             "hl": hl
         }
-        response = requests.post(SERPER_API_URL, headers=headers, json=payload, timeout=10)
+        # Concurrent identical searches share one request; callers only read the returned dict
+        try:
+            return _inflight.do(
+                (payload["q"], gl, hl),
+                lambda call_timeout: self._post(payload, call_timeout),
+                timeout=stage_timeout(cap=timeout or SERPER_TIMEOUT_SECONDS, stage="web search"),
+            )
+        except FuturesTimeout:
+            raise requests.Timeout(f"Serper search timed out: {payload['q']!r}")
+
+    def _post(self, payload: dict, timeout: float) -> dict:
+        headers = {
+            "X-API-KEY": self.api_key,
+            "Content-Type": "application/json"
+        }
+        response = requests.post(SERPER_API_URL, headers=headers, json=payload, timeout=timeout)
         response.raise_for_status()
         return response.json()
@@ -0,0 +1,245 @@
+"""
+Admission control for the chat endpoints.
+
+Two layers, both per worker process:
+
+1. Rate limits: a token bucket per `user_uuid` and per session, checked before
+   any work is done. An empty bucket is a fast 429 with Retry-After.
+2. A global cap on concurrent LLM-bound turns. Turns over the cap wait in a
+   bounded priority queue; cheap turns (greeting, slot filling) are served before
+   full RAG + web turns and may displace a queued full turn when the queue is
+   full. When there is no room, or the wait would outlive the request budget,
+   the turn is shed with a 429 instead of piling up behind a saturated provider.
+
+Routes take an `Admission` via `Depends(admit)` (rate limits are checked there),
+call `await admission.wait(priority)` once they know what kind of turn it is, and
+the slot is released when the request finishes.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+from fastapi import Header
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.services.deadline import remaining_budget
+
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "16"))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "64"))
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "10"))
+USER_RATE_PER_MINUTE = float(os.getenv("USER_RATE_PER_MINUTE", "30"))
+USER_BURST = int(os.getenv("USER_BURST", "10"))
+SESSION_RATE_PER_MINUTE = float(os.getenv("SESSION_RATE_PER_MINUTE", "12"))
+SESSION_BURST = int(os.getenv("SESSION_BURST", "4"))
+MAX_TRACKED_KEYS = 10000  # idle buckets beyond this are dropped, oldest first
+
+PRIORITY_CHEAP = 0  # greeting, classification, slot filling
+PRIORITY_FULL = 1   # RAG + web augmentation + final answer
+PRIORITY_NAMES = {PRIORITY_CHEAP: "cheap", PRIORITY_FULL: "full"}
+
+ADMISSION_REJECTED = Counter(
+    "loanbot_admission_rejected_total", "Requests shed with a 429", ["reason", "priority"],
+)
+ADMISSION_WAIT = Histogram(
+    "loanbot_admission_wait_seconds", "Time spent queued for an LLM slot", ["priority"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10),
+)
+ADMISSION_ACTIVE = Gauge("loanbot_admission_active", "Turns holding an LLM slot")
+ADMISSION_QUEUED = Gauge("loanbot_admission_queued", "Turns waiting for an LLM slot")
+
+
+class AdmissionRejected(Exception):
+    """Shed before doing any work; surfaced as HTTP 429."""
+
+    def __init__(self, reason: str, retry_after: float = 1.0):
+        super().__init__(f"Too many requests ({reason}), please retry shortly.")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, rate_per_second: float, capacity: int):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take one token; returns 0 on success, else seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else 60.0
+
+
+class RateLimiter:
+    """One TokenBucket per key, least recently used keys evicted past MAX_TRACKED_KEYS."""
+
+    def __init__(self, per_minute: float, burst: int, max_keys: int = MAX_TRACKED_KEYS):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def take(self, key: str) -> float:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.take()
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_concurrent: int = ADMISSION_MAX_CONCURRENT,
+        queue_size: int = ADMISSION_QUEUE_SIZE,
+        max_wait: float = ADMISSION_MAX_WAIT_SECONDS,
+    ):
+        self.max_concurrent = max_concurrent
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.users = RateLimiter(USER_RATE_PER_MINUTE, USER_BURST)
+        self.sessions = RateLimiter(SESSION_RATE_PER_MINUTE, SESSION_BURST)
+        self.active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []  # heap: (priority, arrival, future)
+        self._arrivals = itertools.count()
+        self.admitted = 0
+        self.rejected = 0
+
+    def check_rate(self, user_id: str, session_id: str) -> None:
+        for reason, limiter, key in (("user_rate", self.users, user_id), ("session_rate", self.sessions, session_id)):
+            wait = limiter.take(key)
+            if wait:
+                self._reject(reason, None)
+                raise AdmissionRejected(reason, retry_after=wait)
+
+    async def acquire(self, priority: int = PRIORITY_FULL) -> None:
+        """Take an LLM slot, queueing by priority; raises AdmissionRejected instead of waiting too long."""
+        if self.active < self.max_concurrent and not self._queued():
+            self._grant()
+            return
+
+        if self._queued() >= self.queue_size and not self._displace(priority):
+            self._reject("queue_full", priority)
+            raise AdmissionRejected("queue_full", retry_after=self.max_wait / 2)
+
+        remaining = remaining_budget()
+        timeout = self.max_wait if remaining is None else min(self.max_wait, remaining)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._arrivals), future))
+        ADMISSION_QUEUED.set(self._queued())
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            if not self._abandon(future):
+                return  # the slot was handed over just as the wait timed out: keep it
+            self._reject("queue_timeout", priority)
+            raise AdmissionRejected("queue_timeout", retry_after=self.max_wait / 2)
+        except asyncio.CancelledError:
+            if not self._abandon(future):
+                self.release()  # cancelled after the hand-over: give the slot back
+            raise
+        except AdmissionRejected:
+            raise  # displaced by a cheaper turn (already counted)
+        finally:
+            ADMISSION_WAIT.labels(PRIORITY_NAMES.get(priority, str(priority))).observe(time.perf_counter() - start)
+            ADMISSION_QUEUED.set(self._queued())
+
+    def release(self) -> None:
+        self.active -= 1
+        # Hand the slot straight to the best waiter so it can't be taken by a newcomer first
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(True)
+                self.active += 1
+                self.admitted += 1
+                break
+        ADMISSION_ACTIVE.set(self.active)
+        ADMISSION_QUEUED.set(self._queued())
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "queued": self._queued(),
+            "max_concurrent": self.max_concurrent,
+            "queue_size": self.queue_size,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+    def _grant(self) -> None:
+        self.active += 1
+        self.admitted += 1
+        ADMISSION_ACTIVE.set(self.active)
+
+    def _queued(self) -> int:
+        return sum(1 for _, _, f in self._waiters if not f.done())
+
+    def _abandon(self, future: asyncio.Future) -> bool:
+        """Withdraw from the queue; False if the slot had already been handed to us."""
+        if future.done() and not future.cancelled() and future.exception() is None:
+            return False
+        future.cancel()
+        return True
+
+    def _displace(self, priority: int) -> bool:
+        """Queue full: shed the newest waiter of a lower priority to make room, if there is one."""
+        candidates = [w for w in self._waiters if not w[2].done() and w[0] > priority]
+        if not candidates:
+            return False
+        victim = max(candidates, key=lambda w: (w[0], w[1]))
+        self._reject("displaced", victim[0])
+        victim[2].set_exception(AdmissionRejected("displaced", retry_after=self.max_wait / 2))
+        return True
+
+    def _reject(self, reason: str, priority: Optional[int]) -> None:
+        self.rejected += 1
+        ADMISSION_REJECTED.labels(reason, PRIORITY_NAMES.get(priority, "none")).inc()
+
+
+admission_controller = AdmissionController()
+
+
+class Admission:
+    """Per-request handle: holds at most one LLM slot, released when the request finishes."""
+
+    def __init__(self, controller: AdmissionController):
+        self.controller = controller
+        self.held = False
+
+    async def wait(self, priority: int = PRIORITY_FULL) -> None:
+        if not self.held:
+            await self.controller.acquire(priority)
+            self.held = True
+
+    def release(self) -> None:
+        if self.held:
+            self.held = False
+            self.controller.release()
+
+
+async def admit(
+    session_id: str = Header(..., convert_underscores=False),
+    user_uuid: UUID = Header(..., convert_underscores=False),
+):
+    """FastAPI dependency: rate-limit the caller, then hand the route an Admission to wait on."""
+    admission_controller.check_rate(str(user_uuid), session_id)
+    admission = Admission(admission_controller)
+    try:
+        yield admission
+    finally:
+        admission.release()
@@ -0,0 +1,243 @@
+"""
+Conversation analytics rollups, maintained incrementally from `intents`.
+
+A watermark job reads only the turns saved since its last run (by id, in
+batches of ANALYTICS_BATCH_SIZE) and folds them into small per-day tables:
+
+    analytics_daily             sessions started, turns, and how many of those
+                                sessions reached greeting / loan_inquiry /
+                                loan_rag / farewell / high_income_check
+    analytics_daily_loan_types  sessions and turns per loan type
+    analytics_sessions          per-session state (start day, stages reached,
+                                loan type) so each is counted once
+
+Turns younger than ANALYTICS_LAG_SECONDS are left for the next run, so a
+turn whose transaction is still open is not skipped by the id watermark,
+provided every transaction that inserts into `intents` commits within
+ANALYTICS_LAG_SECONDS of the row's created_at. A turn committed later than
+that, with an id below one already folded, is never counted: the watermark has
+moved past it. The per-turn save is one short commit bounded by the request
+deadline (plus SAVE_INTENT_MIN_SECONDS); raise the lag if writes can take longer.
+
+Each batch and its watermark move commit together, and the watermark is
+advanced with a compare-and-set, so two workers running the job at once can't
+count a batch twice. Nothing is added to the chat write path: the job runs
+every ANALYTICS_REFRESH_SECONDS in the app (0 disables it), or from cron:
+
+    python -m app.services.analytics refresh
+    python -m app.services.analytics status
+
+The rollups outlive retention compaction (app.services.intent_storage), which
+brings them up to date before it deletes anything.
+"""
+import argparse
+import asyncio
+import json
+import os
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+
+from app.models.analytics import AnalyticsDaily, AnalyticsDailyLoanType, AnalyticsSession, AnalyticsWatermark
+from app.models.intent import Intent
+from app.observability import log_event
+
+ANALYTICS_REFRESH_SECONDS = float(os.getenv("ANALYTICS_REFRESH_SECONDS", "60"))
+ANALYTICS_LAG_SECONDS = float(os.getenv("ANALYTICS_LAG_SECONDS", "120"))
+ANALYTICS_BATCH_SIZE = int(os.getenv("ANALYTICS_BATCH_SIZE", "2000"))
+
+WATERMARK = "intents"
+FUNNEL = ("greeting", "loan_inquiry", "loan_rag", "farewell")
+STAGES = (*FUNNEL, "high_income_check", "irrelevant")
+STAGE_BITS = {name: 1 << i for i, name in enumerate(STAGES)}
+UNKNOWN_LOAN_TYPE = "unknown"
+
+intents = Intent.__table__
+daily = AnalyticsDaily.__table__
+loan_types = AnalyticsDailyLoanType.__table__
+sessions = AnalyticsSession.__table__
+watermarks = AnalyticsWatermark.__table__
+
+
+# --- rollup -------------------------------------------------------------------
+
+def _watermark(connection: Connection) -> Tuple[int, Optional[datetime]]:
+    row = connection.execute(select(watermarks).where(watermarks.c.name == WATERMARK)).first()
+    if row is None:
+        try:
+            connection.execute(watermarks.insert(), {"name": WATERMARK, "last_intent_id": 0,
+                                                     "updated_at": datetime.utcnow()})
+            connection.commit()
+        except IntegrityError:  # another worker created it first
+            connection.rollback()
+        return 0, None
+    return row.last_intent_id, row.last_created_at
+
+
+def _pending(connection: Connection, last_id: int, last_at: Optional[datetime], upper: datetime, limit: int):
+    """
+    The next `limit` turns after the watermark, stopping at the first one still
+    inside the lag window; rows that commit after the lag with a lower id are missed.
+    """
+    query = select(
+        intents.c.id, intents.c.session_id, intents.c.intent, intents.c.loan_type, intents.c.created_at
+    ).where(intents.c.id > last_id)
+    if last_at is not None:
+        # Later ids are at most one open transaction older than the watermark row; lets PG skip old partitions
+        query = query.where(intents.c.created_at >= last_at - timedelta(seconds=ANALYTICS_LAG_SECONDS))
+    rows = connection.execute(query.order_by(intents.c.id).limit(limit)).all()
+    for i, row in enumerate(rows):
+        if row.created_at >= upper:
+            return rows[:i]
+    return rows
+
+
+def _fold(connection: Connection, rows) -> Tuple[Dict, Dict, Dict]:
+    """Counter deltas for `rows` plus the new state of every session they touch."""
+    session_ids = list({row.session_id for row in rows})
+    state = {row.session_id: dict(row._mapping) for row in connection.execute(
+        select(sessions).where(sessions.c.session_id.in_(session_ids))
+    )}
+    known = set(state)
+    day_deltas: Dict[date, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    type_deltas: Dict[Tuple[date, str], Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    for row in rows:
+        day = row.created_at.date()
+        session = state.get(row.session_id)
+        if session is None:
+            session = state[row.session_id] = {"session_id": row.session_id, "first_day": day,
+                                               "last_at": row.created_at, "turns": 0, "stages": 0,
+                                               "loan_type": None}
+            day_deltas[day]["sessions"] += 1
+        session["turns"] += 1
+        session["last_at"] = max(session["last_at"], row.created_at)
+        day_deltas[day]["turns"] += 1
+        type_deltas[(day, row.loan_type or UNKNOWN_LOAN_TYPE)]["turns"] += 1
+
+        bit = STAGE_BITS.get(row.intent)
+        if bit and not session["stages"] & bit:
+            session["stages"] |= bit
+            day_deltas[session["first_day"]][row.intent] += 1
+        if row.loan_type and not session["loan_type"]:
+            session["loan_type"] = row.loan_type
+            type_deltas[(session["first_day"], row.loan_type)]["sessions"] += 1
+
+    return day_deltas, type_deltas, {"new": [s for k, s in state.items() if k not in known],
+                                     "updated": [s for k, s in state.items() if k in known]}
+
+
+def _add(connection: Connection, target, keys: List[str], deltas: Dict) -> None:
+    """counter += delta per key, inserting the rows that don't exist yet."""
+    key_columns = [target.c[k] for k in keys]
+    for key, counts in deltas.items():
+        key = key if isinstance(key, tuple) else (key,)
+        match = [column == value for column, value in zip(key_columns, key)]
+        updated = connection.execute(
+            target.update().where(*match).values({name: target.c[name] + n for name, n in counts.items()})
+        ).rowcount
+        if not updated:
+            connection.execute(target.insert(), {**dict(zip(keys, key)), **counts})
+
+
+def refresh_batch(connection: Connection, limit: int = ANALYTICS_BATCH_SIZE,
+                  lag_seconds: float = ANALYTICS_LAG_SECONDS) -> int:
+    """Fold the next batch of settled turns into the rollups; returns how many were folded."""
+    last_id, last_at = _watermark(connection)
+    rows = _pending(connection, last_id, last_at, datetime.utcnow() - timedelta(seconds=lag_seconds), limit)
+    if not rows:
+        connection.rollback()
+        return 0
+
+    # Claim the batch first: the row lock makes a concurrent run wait here, then find the watermark moved
+    claimed = connection.execute(
+        watermarks.update()
+        .where(watermarks.c.name == WATERMARK, watermarks.c.last_intent_id == last_id)
+        .values(last_intent_id=rows[-1].id, last_created_at=rows[-1].created_at, updated_at=datetime.utcnow())
+    ).rowcount
+    if not claimed:
+        connection.rollback()
+        return 0
+
+    day_deltas, type_deltas, state = _fold(connection, rows)
+    _add(connection, daily, ["day"], day_deltas)
+    _add(connection, loan_types, ["day", "loan_type"], type_deltas)
+    if state["new"]:
+        connection.execute(sessions.insert(), state["new"])
+    for session in state["updated"]:
+        connection.execute(sessions.update().where(sessions.c.session_id == session["session_id"]), session)
+    connection.commit()
+    return len(rows)
+
+
+def refresh(connection: Connection, limit: int = ANALYTICS_BATCH_SIZE,
+            lag_seconds: float = ANALYTICS_LAG_SECONDS) -> Dict[str, object]:
+    """Catch the rollups up with every settled turn, one committed batch at a time."""
+    started, folded, batches = datetime.utcnow(), 0, 0
+    while True:
+        count = refresh_batch(connection, limit, lag_seconds)
+        folded, batches = folded + count, batches + (1 if count else 0)
+        if count < limit:
+            break
+    outcome = {"turns": folded, "batches": batches,
+               "elapsed_ms": round((datetime.utcnow() - started).total_seconds() * 1000, 1)}
+    if folded:
+        log_event("analytics_refresh", **outcome)
+    return outcome
+
+
+def status(connection: Connection) -> Dict[str, object]:
+    row = connection.execute(select(watermarks).where(watermarks.c.name == WATERMARK)).first()
+    last_id = row.last_intent_id if row else 0
+    return {
+        "last_intent_id": last_id,
+        "last_created_at": row.last_created_at if row else None,
+        "updated_at": row.updated_at if row else None,
+        "pending_turns": connection.execute(
+            select(func.count()).select_from(intents).where(intents.c.id > last_id)
+        ).scalar(),
+        "lag_seconds": ANALYTICS_LAG_SECONDS,
+        "refresh_seconds": ANALYTICS_REFRESH_SECONDS,
+    }
+
+
+async def refresh_periodically(interval: float = ANALYTICS_REFRESH_SECONDS) -> None:
+    """In-app refresh loop, started on startup; a failed run is logged and retried next interval."""
+    from app.database import engine
+
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with engine.connect() as conn:
+                await conn.run_sync(refresh)
+        except Exception as e:
+            log_event("analytics_refresh_failed", sample_rate=1.0, error=str(e))
+
+
+# --- CLI --------------------------------------------------------------------
+
+async def _run(args) -> Dict[str, object]:
+    from app.database import engine
+
+    async with engine.connect() as conn:
+        if args.command == "refresh":
+            return await conn.run_sync(refresh, args.batch_size, args.lag)
+        return await conn.run_sync(status)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the conversation analytics rollups.")
+    parser.add_argument("command", choices=["refresh", "status"])
+    parser.add_argument("--batch-size", type=int, default=ANALYTICS_BATCH_SIZE)
+    parser.add_argument("--lag", type=float, default=ANALYTICS_LAG_SECONDS,
+                        help="leave turns younger than this many seconds for the next run")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(_run(args)), indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
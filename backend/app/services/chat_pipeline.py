@@ -0,0 +1,525 @@
+"""
+Turn context, route profiles and the stages shared by /api/chat and /api/rag-chat.
+
+Both routes are `Pipeline` configurations over the same `TurnContext`:
+
+    load_context → admission → [route-specific intake] → income → context
+        → [exit_check ∥ retrieval] → simulation → table → no_match → tier → web → answer
+        → save_turn (finish)
+
+What differs per route — prompt wording, farewell, the no-match score, whether
+the high-income check asks a question — lives in its `RouteProfile`. Shared
+clients (LLM router, Serper) are created once here. Retrieval and web search
+look up the turn's `Lookup`, which /api/chat also starts ahead of time while it
+is still filling slots (`speculate`, app.services.prefetch).
+"""
+import asyncio
+import contextvars
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from uuid import UUID
+
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.models.intent import Intent, SessionSummary
+from app.observability import log_event, record_outcome, span, start_request
+from app.rag.embeddings import aembed_text, embed_text
+from app.rag.facets import detect_lender
+from app.rag.faq_tiers import (TIER_DIRECT, TIER_SIMULATION, TIER_TABLE, TIER_WEB, choose_tier, faq_confidence,
+                               personalize, record_tier)
+from app.rag.load_knowledge import aget_rate_table, aget_vector_store
+from app.rag.rate_table import format_rows
+from app.services.admission import PRIORITY_FULL, Admission
+from app.services.deadline import DeadlineExceeded, has_budget, start_deadline, within_deadline
+from app.services.llm_router import get_llm_router
+from app.services.loan_simulation import answer_borrowing_question
+from app.services.memory import RollingMemory, schedule_fold
+from app.services.pipeline import Parallel, Pipeline, Stage
+from app.services.prefetch import Speculation, speculations
+from app.services.Serper import SerperClient
+from app.services.usage import adopt_calls, carry_session_totals, start_turn, turn_summary
+
+llm_client = get_llm_router()
+serper_client = SerperClient()
+
+EXIT_PHRASES = [
+    "ok", "okay", "thanks", "thank you", "got it", "bye", "cool",
+    "okay thanks", "i got it", "no more questions", "alright", "fine", "that's all"
+]
+EXIT_SIMILARITY_THRESHOLD = 0.75
+HIGH_INCOME_THRESHOLD = 500000
+RETRIEVAL_THRESHOLD = 0.4
+
+# Web augmentation costs two LLM calls plus a search; skip it when the budget can't cover that
+WEB_SEARCH_MIN_BUDGET_SECONDS = float(os.getenv("WEB_SEARCH_MIN_BUDGET_SECONDS", "8"))
+# Per-stage caps on top of the request deadline
+EXIT_CHECK_TIMEOUT_SECONDS = float(os.getenv("EXIT_CHECK_TIMEOUT_SECONDS", "6"))
+RETRIEVAL_TIMEOUT_SECONDS = float(os.getenv("RETRIEVAL_TIMEOUT_SECONDS", "10"))
+WEB_STAGE_TIMEOUT_SECONDS = float(os.getenv("WEB_STAGE_TIMEOUT_SECONDS", "15"))
+SAVE_INTENT_MIN_SECONDS = 2.0  # the turn is still persisted this long after the budget runs out
+
+FOOTER = "\n\n🤖 Let me know what more I can do to help you."
+NO_FOOTER_PREFIXES = ("❌", "📍", "💰", "🗓️", "🙋‍♂️", "👋", "Sorry", "✅")
+NO_MATCH_MESSAGE = "❌ Couldn't find relevant knowledge — try rephrasing."
+
+
+@dataclass(frozen=True)
+class RouteProfile:
+    route: str
+    message_label: str            # how the user's message is introduced in prompts
+    kb_label: str
+    answer_instruction: str
+    web_query_prompt: str
+    web_summary_prompt: str
+    farewell: str                 # formatted with name=
+    no_match_min_score: float     # best retrieval score below this is answered with NO_MATCH_MESSAGE
+    confirm_high_income: bool     # ask before continuing when the income looks too high for a loan
+    footer: bool                  # append FOOTER to answers
+    include_mode: bool            # "mode" in the response body (the chat UI switches on it)
+    history_as_description: bool  # store the conversation history (else the known parameters) in Intent.description
+    llm_error_reply: Optional[str] = None  # formatted with error=; None lets the error fail the turn
+
+
+@dataclass
+class Reply:
+    response: str
+    intent: str = "loan_rag"
+    tier: Optional[str] = None
+    mode: str = "chat"
+
+    def body(self, include_mode: bool = True) -> Dict[str, Any]:
+        body: Dict[str, Any] = {"response": self.response}
+        if include_mode:
+            body["mode"] = self.mode
+        if self.tier:
+            body["tier"] = self.tier
+        return body
+
+
+@dataclass(frozen=True)
+class Lookup:
+    """What retrieval and web search look up for a turn: by default its message in the full user context."""
+    question: str
+    context: str
+    loan_type: Optional[str]
+
+    @property
+    def query(self) -> str:
+        return f"{self.question}\n\nUser context: {self.context}"
+
+
+@dataclass
+class TurnContext:
+    profile: RouteProfile
+    message: str
+    session_id: str
+    user_uuid: UUID
+    db: AsyncSession
+    admission: Admission
+    # load_context
+    last_intent: Optional[Intent] = None
+    params: Dict[str, Any] = field(default_factory=dict)
+    memory: RollingMemory = field(default_factory=RollingMemory)
+    in_loan_flow: bool = False
+    # context
+    summary_context: str = ""
+    history: str = ""
+    lookup: Optional[Lookup] = None              # set earlier by the route to look up something else
+    speculation: Optional[Speculation] = None    # the lookup, done ahead of time (app.services.prefetch)
+    # exit_check / retrieval
+    exit_score: float = 0.0
+    matches: List[Tuple[str, str, float]] = field(default_factory=list)
+    # tier / web
+    confidence: float = 0.0
+    tier: Optional[str] = None
+    web_summary: str = ""
+
+    @property
+    def best_score(self) -> float:
+        return self.matches[0][2] if self.matches else 0.0
+
+    def reply(self, response: str, intent: str = "loan_rag", tier: Optional[str] = None, mode: str = "rag") -> Reply:
+        return Reply(response, intent, tier, mode)
+
+    def answer(self, response: str, tier: str, mode: str = "rag") -> Reply:
+        if self.profile.footer and not response.strip().startswith(NO_FOOTER_PREFIXES):
+            response += FOOTER
+        return Reply(response, "loan_rag", tier, mode)
+
+
+def parse_income(value: Union[str, int, None]) -> Optional[int]:
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        cleaned = value.replace("₹", "").replace(",", "").strip()
+        if cleaned.isdigit():
+            return int(cleaned)
+    return None
+
+
+# --- stages -----------------------------------------------------------------
+
+async def load_context(ctx: TurnContext) -> None:
+    """The latest turn carries the merged parameters and the rolling memory."""
+    with span("db_load"):
+        last_intent = (await within_deadline(ctx.db.execute(
+            select(Intent).where(Intent.session_id == ctx.session_id).order_by(Intent.created_at.desc()).limit(1)
+        ), stage="context load")).scalar_one_or_none()
+        # New session, or one whose turns the retention job compacted (app.services.intent_storage)
+        summary = None if last_intent else await within_deadline(
+            ctx.db.get(SessionSummary, ctx.session_id), stage="context load"
+        )
+    ctx.last_intent = last_intent
+    if last_intent is None:
+        if summary is not None:
+            carry_session_totals(summary.llm_usage)
+            ctx.params = dict(summary.parameters or {})
+            ctx.memory = RollingMemory(summary.memory)
+        return
+    carry_session_totals(last_intent.llm_usage)
+    ctx.params = dict(last_intent.parameters or {})
+    ctx.memory = RollingMemory.from_intent(last_intent)
+    ctx.in_loan_flow = last_intent.intent == "loan_inquiry"
+
+
+def admit_turn(priority: Callable[[TurnContext], int] = lambda ctx: PRIORITY_FULL) -> Stage:
+    async def run(ctx: TurnContext) -> None:
+        # Hand the pooled connection back before queueing: load_context's read transaction would otherwise hold
+        # it until save_intent commits. close() keeps the loaded rows usable and the session reusable.
+        await ctx.db.close()
+        await ctx.admission.wait(priority(ctx))
+    return Stage("admission", run)
+
+
+async def normalize_income(ctx: TurnContext) -> Optional[Reply]:
+    income = parse_income(ctx.params.get("income"))
+    if not income:
+        return None
+    ctx.params["income"] = f"₹{income:,}"
+    if income > HIGH_INCOME_THRESHOLD and not ctx.params.get("high_income_flag"):
+        ctx.params["high_income_flag"] = True
+        ctx.params["assumed_loan_size"] = "very high"
+        if ctx.profile.confirm_high_income:
+            ctx.params["awaiting_loan_amount"] = True
+            return ctx.reply(
+                f"🤔 With a monthly income of ₹{income:,}, are you sure you need a loan? "
+                "Please share the purpose or amount you’re considering.",
+                intent="high_income_check", mode="chat",
+            )
+    return None
+
+
+async def build_context(ctx: TurnContext) -> None:
+    params = ctx.params
+    summary = (
+        f"You are looking for a {params.get('loan_type') or 'loan'} in {params.get('location')} with a monthly income "
+        f"of {params.get('income')}, planning to apply in {params.get('timeline')}."
+    )
+    if params.get("assumed_loan_size"):
+        summary += f" Based on your income, it appears you may be seeking a {params['assumed_loan_size']} loan."
+    if params.get("loan_amount"):
+        summary += f" The user is considering a loan amount of {params['loan_amount']}."
+    if params.get("name"):
+        summary = f"User Name: {params['name']}\n" + summary
+    ctx.summary_context = summary
+    ctx.history = ctx.memory.prompt_context()
+    if ctx.lookup is None:
+        ctx.lookup = Lookup(ctx.message, summary, params.get("loan_type"))
+
+
+async def exit_similarity(message: str) -> float:
+    try:
+        # aembed_text is memoized, so the exit phrases are only encoded once per worker
+        user_embedding, *exit_embeddings = await asyncio.gather(
+            aembed_text(message), *(aembed_text(p) for p in EXIT_PHRASES)
+        )
+        exit_embeddings = np.vstack(exit_embeddings)
+        similarities = (exit_embeddings @ user_embedding) / (
+            np.linalg.norm(exit_embeddings, axis=1) * np.linalg.norm(user_embedding)
+        )
+        max_score = float(similarities.max())
+        log_event("exit_similarity", score=round(max_score, 3))
+        return max_score
+    except Exception as e:
+        log_event("exit_similarity_failed", sample_rate=1.0, error=str(e))
+        return 0.0
+
+
+async def exit_check(ctx: TurnContext) -> Optional[Reply]:
+    ctx.exit_score = await exit_similarity(ctx.message)
+    if ctx.exit_score < EXIT_SIMILARITY_THRESHOLD:
+        return None
+    with span("classifier"):
+        confirmed = await asyncio.to_thread(llm_client.is_exit, ctx.message, ctx.summary_context)
+    if not confirmed:
+        return None
+    return ctx.reply(ctx.profile.farewell.format(name=ctx.params.get("name") or "there"), intent="farewell", mode="chat")
+
+
+async def search_faq(lookup: Lookup) -> List[Tuple[str, str, float]]:
+    search_filters = {"loan_type": lookup.loan_type, "lender": detect_lender(lookup.question)}
+    with span("embedding"):
+        query_vector = await aembed_text(lookup.query)
+    vector_store = await aget_vector_store()
+    with span("vector_search"):
+        return vector_store.search(
+            lookup.query, embed_func=embed_text, threshold=RETRIEVAL_THRESHOLD,
+            filters=search_filters, query_vector=query_vector,
+        )
+
+
+async def retrieve(ctx: TurnContext) -> None:
+    ctx.speculation = speculations.take(ctx.session_id, (ctx.profile.route, ctx.lookup, llm_client.model))
+    if ctx.speculation is not None:
+        with span("prefetch_wait"):
+            matches = await ctx.speculation.result(ctx.speculation.faq)
+        if matches is not None:
+            ctx.matches = matches
+            return
+    ctx.matches = await search_faq(ctx.lookup)
+
+
+async def simulation(ctx: TurnContext) -> Optional[Reply]:
+    """"How much can I borrow?" is arithmetic: answer it from the simulation engine, not the LLM."""
+    borrowing = answer_borrowing_question(ctx.message, ctx.params.get("loan_type"), ctx.params.get("income"))
+    if not borrowing:
+        return None
+    record_tier(TIER_SIMULATION, 1.0)
+    return ctx.answer(borrowing[0], TIER_SIMULATION, mode="simulation")
+
+
+async def generate_answer(ctx: TurnContext, prompt: str, fallback: str) -> str:
+    try:
+        with span("final_llm"):
+            return await asyncio.to_thread(llm_client.generate_response, prompt)
+    except DeadlineExceeded:
+        return f"⏳ Sorry, this is taking longer than expected. Here is what I found:\n\n{fallback}"
+    except Exception as e:
+        if ctx.profile.llm_error_reply is None:
+            raise
+        return ctx.profile.llm_error_reply.format(error=e)
+
+
+def prompt_head(ctx: TurnContext) -> str:
+    return (
+        f"{ctx.profile.message_label}: {ctx.message}\n\n"
+        f"User Context: {ctx.summary_context}\n\n"
+        + (f"Conversation so far:\n{ctx.history}\n\n" if ctx.history else "")
+    )
+
+
+async def table(ctx: TurnContext) -> Optional[Reply]:
+    """Comparisons and rankings: exact lender table rows instead of one fuzzy FAQ match."""
+    rows = (await aget_rate_table()).rows_for_question(ctx.message, ctx.params.get("loan_type"))
+    if not rows:
+        return None
+    record_tier(TIER_TABLE, 1.0)
+    table_context = format_rows(rows)
+    prompt = (
+        prompt_head(ctx)
+        + f"📊 Lender data (exact figures from our knowledge base):\n{table_context}\n\n"
+        f"🎯 Answer using these figures, naming the lenders and numbers you rely on."
+    )
+    return ctx.answer(await generate_answer(ctx, prompt, table_context), TIER_TABLE)
+
+
+async def no_match(ctx: TurnContext) -> Optional[Reply]:
+    if ctx.matches and ctx.best_score >= ctx.profile.no_match_min_score:
+        return None
+    log_event("no_faq_match", best_score=round(ctx.best_score, 3))
+    return ctx.reply(NO_MATCH_MESSAGE)
+
+
+async def pick_tier(ctx: TurnContext) -> Optional[Reply]:
+    """How closely the message matches the FAQ question decides direct / one LLM call / web."""
+    top_q, top_a, _ = ctx.matches[0]
+    with span("faq_confidence"):
+        ctx.confidence = await faq_confidence(ctx.lookup.question, top_q)
+    ctx.tier = choose_tier(ctx.confidence, ctx.lookup.question, top_q)
+    record_tier(ctx.tier, ctx.confidence)
+    if ctx.tier != TIER_DIRECT:
+        return None
+    params = ctx.params
+    return ctx.answer(personalize(top_a, params.get("name"), params.get("loan_type"), params.get("income")), ctx.tier)
+
+
+async def web_lookup(profile: RouteProfile, question: str, model: Optional[str] = None) -> str:
+    """`model` defaults to the request's selection (pass it where that context isn't available)."""
+    with span("web_query_llm"):
+        web_query = await asyncio.to_thread(
+            llm_client.generate_response, profile.web_query_prompt.format(message=question), model
+        )
+    log_event("web_search_query", query=web_query)
+    with span("serper"):
+        results = await asyncio.to_thread(serper_client.search, web_query)
+    links = [item["link"] for item in results.get("organic", [])[:3]]
+    if not links:
+        return ""
+    with span("web_summary_llm"):
+        return await asyncio.to_thread(llm_client.generate_response, profile.web_summary_prompt + "\n".join(links), model)
+
+
+async def web_search(ctx: TurnContext) -> None:
+    """Serper + LLM summary, only for low-confidence matches."""
+    if ctx.speculation is not None:
+        with span("prefetch_wait"):
+            summary = await ctx.speculation.result(ctx.speculation.web)
+        if summary is not None:
+            ctx.web_summary = summary
+            return
+    if not has_budget(WEB_SEARCH_MIN_BUDGET_SECONDS):
+        log_event("web_search_skipped", reason="budget")
+        return
+    ctx.web_summary = await web_lookup(ctx.profile, ctx.lookup.question)
+
+
+async def answer(ctx: TurnContext) -> Reply:
+    top_q, top_a, _ = ctx.matches[0]
+    prompt = (
+        prompt_head(ctx)
+        + f"{ctx.profile.kb_label}:\nQ: {top_q}\nA: {top_a}\n\n"
+        + (f"🔗 Web Info:\n{ctx.web_summary}\n\n" if ctx.web_summary else "")
+        + ctx.profile.answer_instruction
+    )
+    return ctx.answer(await generate_answer(ctx, prompt, top_a), ctx.tier)
+
+
+# --- speculation --------------------------------------------------------------
+
+def speculate(ctx: TurnContext, lookup: Lookup) -> None:
+    """Start the retrieval (and web search) for `lookup` now, for a later turn of this session to take."""
+    model = llm_client.model
+    key = (ctx.profile.route, lookup, model)
+    if not speculations.wanted(ctx.session_id, key):
+        return
+    speculation = Speculation(key)
+    # Fresh context: no request deadline or trace (nor model selection, hence `model`);
+    # LLM usage goes to the speculation until a turn adopts it
+    speculation.task = asyncio.create_task(
+        _speculate(speculation, ctx.profile, lookup, model), context=contextvars.Context()
+    )
+    speculations.put(ctx.session_id, speculation)
+
+
+async def _speculate(speculation: Speculation, profile: RouteProfile, lookup: Lookup, model: str) -> None:
+    """The same steps as retrieval → no_match → tier → web, for one lookup."""
+    speculation.usage = start_turn()
+    try:
+        with span("prefetch"):
+            matches = await search_faq(lookup)
+            speculation.faq.set_result(matches)
+            tier = None
+            if matches and matches[0][2] >= profile.no_match_min_score:
+                top_q = matches[0][0]
+                tier = choose_tier(await faq_confidence(lookup.question, top_q), lookup.question, top_q)
+            speculation.web.set_result(await web_lookup(profile, lookup.question, model) if tier == TIER_WEB else None)
+    except Exception as e:
+        log_event("prefetch_failed", sample_rate=1.0, error=str(e))
+        for future in (speculation.faq, speculation.web):
+            if not future.done():
+                future.set_result(None)
+
+
+def answer_stages() -> List[Union[Stage, Parallel]]:
+    """Everything after the route's intake: from the context summary to the final answer."""
+    return [
+        Stage("context", build_context),
+        Parallel([
+            # A message that only answers a slot question (the route swapped the lookup) is no farewell
+            Stage("exit_check", exit_check, when=lambda ctx: ctx.lookup.question == ctx.message,
+                  timeout=EXIT_CHECK_TIMEOUT_SECONDS, optional=True),
+            Stage("retrieval", retrieve, timeout=RETRIEVAL_TIMEOUT_SECONDS),
+        ]),
+        Stage("simulation", simulation),
+        Stage("table", table),
+        Stage("no_match", no_match),
+        Stage("tier", pick_tier),
+        Stage("web", web_search, when=lambda ctx: ctx.tier == TIER_WEB, timeout=WEB_STAGE_TIMEOUT_SECONDS, optional=True),
+        Stage("answer", answer),
+    ]
+
+
+# --- persistence --------------------------------------------------------------
+
+def describe_parameters(parameters: Dict[str, Any]) -> str:
+    return ", ".join(
+        f"{k}: {parameters[k]}" for k in ["loan_type", "location", "income", "timeline", "loan_amount"] if k in parameters
+    )
+
+
+async def save_turn(ctx: TurnContext, reply: Reply) -> None:
+    if ctx.speculation is not None:
+        adopt_calls(ctx.speculation.usage)
+    await save_intent(
+        ctx.user_uuid, ctx.session_id, ctx.message, reply.response, ctx.params, ctx.db,
+        memory=ctx.memory, intent=reply.intent, answer_tier=reply.tier,
+        description=ctx.history if ctx.profile.history_as_description else None,
+    )
+
+
+async def save_intent(
+    user_uuid: UUID,
+    session_id: str,
+    user_message: str,
+    bot_response: str,
+    parameters: dict,
+    db: AsyncSession,
+    memory: RollingMemory = None,
+    intent: str = "loan_inquiry",
+    answer_tier: str = None,
+    description: str = None
+):
+    memory = memory or RollingMemory()
+    memory.add_turn(user_message, bot_response)
+    new_intent = Intent(
+        user_uuid=user_uuid,
+        session_id=session_id,
+        user_message=user_message,
+        bot_response=bot_response,
+        intent=intent,
+        parameters=parameters,
+        context={"memory": memory.state(), "answer_tier": answer_tier},  # parameters are stored once, above
+        llm_usage=turn_summary(),
+        created_at=datetime.utcnow(),
+        name=parameters.get("name"),
+        description=description if description is not None else describe_parameters(parameters),
+        loan_type=parameters.get("loan_type"),
+        last_user_query=parameters.get("last_user_query")
+    )
+    with span("persistence"):
+        db.add(new_intent)
+        await within_deadline(db.commit(), stage="save intent", floor=SAVE_INTENT_MIN_SECONDS)
+        await db.refresh(new_intent)
+    record_outcome(intent)
+    schedule_fold(session_id, memory, llm_client)
+
+
+async def run_turn(
+    pipeline: Pipeline,
+    profile: RouteProfile,
+    query: dict,
+    session_id: str,
+    user_uuid: UUID,
+    request_budget_ms: Optional[int],
+    db: AsyncSession,
+    admission: Admission,
+) -> Dict[str, Any]:
+    start_deadline(request_budget_ms)
+    start_turn()
+    message = query.get("message")
+    if not message:
+        raise HTTPException(status_code=400, detail="No message provided")
+    try:
+        llm_client.set_model(query.get("model", "GPT-4"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    start_request(profile.route, llm_client.model)
+
+    ctx = TurnContext(profile, message, session_id, user_uuid, db, admission)
+    reply = await pipeline.run(ctx)
+    return reply.body(profile.include_mode)
@@ -0,0 +1,77 @@
+import asyncio
+import os
+import time
+from contextvars import ContextVar
+from typing import Awaitable, Optional, TypeVar
+
+from app.services.llm import DeadlineExceeded  # defined next to the classifiers that must let it through
+
+REQUEST_BUDGET_MS = int(os.getenv("REQUEST_BUDGET_MS", "25000"))
+
+T = TypeVar("T")
+
+
+class Deadline:
+    def __init__(self, budget_seconds: float):
+        self.budget = budget_seconds
+        self.expires_at = time.monotonic() + budget_seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+# Set once per request; every LLM / Serper / DB stage reads the remaining budget from here
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar("request_deadline", default=None)
+
+
+def start_deadline(budget_ms: Optional[int] = None) -> Deadline:
+    deadline = Deadline((budget_ms or REQUEST_BUDGET_MS) / 1000.0)
+    _current_deadline.set(deadline)
+    return deadline
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+
+def remaining_budget() -> Optional[float]:
+    """Seconds left for this request, or None outside a request deadline."""
+    deadline = _current_deadline.get()
+    return deadline.remaining() if deadline else None
+
+
+def has_budget(seconds: float) -> bool:
+    remaining = remaining_budget()
+    return remaining is None or remaining >= seconds
+
+
+def stage_timeout(cap: Optional[float] = None, floor: float = 0.0, stage: str = "stage") -> Optional[float]:
+    """
+    Timeout for the next stage: the remaining budget, capped by the stage's own
+    limit and raised to `floor` (for work that must finish, like persistence).
+    Raises DeadlineExceeded when nothing is left and no floor applies.
+    """
+    remaining = remaining_budget()
+    if remaining is None:
+        return cap
+    if remaining <= 0 and floor <= 0:
+        raise DeadlineExceeded(f"⏳ Request budget exhausted before {stage}.")
+    timeout = remaining if cap is None else min(cap, remaining)
+    return max(timeout, floor)
+
+
+async def within_deadline(awaitable: Awaitable[T], stage: str = "stage", floor: float = 0.0) -> T:
+    try:
+        timeout = stage_timeout(floor=floor, stage=stage)
+    except DeadlineExceeded:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise
+    try:
+        return await asyncio.wait_for(awaitable, timeout=timeout)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(f"⏳ Request budget exhausted during {stage}.")
@@ -0,0 +1,341 @@
+"""
+Time-partitioned `intents` storage, retention compaction and a storage report.
+
+On PostgreSQL `intents` is range-partitioned by month on created_at (migration
+5e9b07c2d4a8): intents_p2025_07, intents_p2025_08, ... plus intents_default
+for anything outside them. Partitions are created INTENT_PARTITION_MONTHS_AHEAD
+months ahead on startup and by every retention run. The per-turn lookup
+(latest row of a session) uses the (session_id, created_at) index of the
+recent partitions only.
+
+Retention folds every turn older than INTENT_RETENTION_DAYS into one
+`session_summaries` row per session (turn count, time span, intent and tier
+counts, last parameters, rolling memory and LLM session totals), then drops the
+monthly partitions that lie entirely before the cutoff, or detaches them as
+standalone tables for archiving with INTENT_ARCHIVE_MODE=detach. Rows left in
+the default partition, and every row on databases without partitioning, are
+deleted. A session that comes back after compaction resumes from its summary.
+
+Run from backend/ (for example nightly from cron):
+
+    python -m app.services.intent_storage report
+    python -m app.services.intent_storage compact --days 90 [--archive detach] [--dry-run]
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Text, cast, column, delete, func, select, table, text
+from sqlalchemy.engine import Connection
+
+from app.models.intent import Intent, SessionSummary
+
+INTENT_RETENTION_DAYS = int(os.getenv("INTENT_RETENTION_DAYS", "90"))
+INTENT_PARTITION_MONTHS_AHEAD = int(os.getenv("INTENT_PARTITION_MONTHS_AHEAD", "3"))
+INTENT_ARCHIVE_MODE = os.getenv("INTENT_ARCHIVE_MODE", "drop")  # drop | detach
+SUMMARY_BATCH_SIZE = 500
+
+DEFAULT_PARTITION = "intents_default"
+_PARTITION_NAME = re.compile(r"^intents_p(\d{4})_(\d{2})$")
+
+intents = Intent.__table__
+summaries = SessionSummary.__table__
+# The default partition on its own (rows not covered by a monthly partition)
+default_partition = table(DEFAULT_PARTITION, *(column(c.name, c.type) for c in intents.columns))
+
+
+# --- partitions -------------------------------------------------------------
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"intents_p{month.year:04d}_{month.month:02d}"
+
+
+def is_partitioned(connection: Connection) -> bool:
+    if connection.dialect.name != "postgresql":
+        return False
+    return connection.execute(text(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = 'intents' AND pg_table_is_visible(c.oid)"
+    )).first() is not None
+
+
+def list_partitions(connection: Connection) -> List[Tuple[str, Optional[date], Optional[date]]]:
+    """(name, first day, first day of the next month) per monthly partition, oldest first; the default has no bounds."""
+    names = connection.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = 'intents' AND pg_table_is_visible(p.oid) ORDER BY c.relname"
+    )).scalars().all()
+    partitions = []
+    for name in names:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            lo = date(int(match.group(1)), int(match.group(2)), 1)
+            partitions.append((name, lo, add_months(lo, 1)))
+        else:
+            partitions.append((name, None, None))
+    return partitions
+
+
+def create_partition(connection: Connection, month: date) -> bool:
+    """
+    Monthly partition for `month`. Rows that already landed in the default
+    partition for that month are moved into it (PostgreSQL refuses to create the
+    partition while the default holds matching rows).
+    """
+    name, lo, hi = partition_name(month), month, add_months(month, 1)
+    if any(existing == name for existing, _, _ in list_partitions(connection)):
+        return False
+    in_range = "created_at >= :lo AND created_at < :hi"
+    bounds = {"lo": datetime.combine(lo, datetime.min.time()), "hi": datetime.combine(hi, datetime.min.time())}
+    has_default = connection.execute(text("SELECT to_regclass(:name)"), {"name": DEFAULT_PARTITION}).scalar()
+    stray = has_default and connection.execute(
+        text(f"SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_range} LIMIT 1"), bounds
+    ).first()
+    if stray:
+        connection.execute(text(f"ALTER TABLE intents DETACH PARTITION {DEFAULT_PARTITION}"))
+    connection.execute(text(
+        f"CREATE TABLE {name} PARTITION OF intents FOR VALUES FROM ('{lo.isoformat()}') TO ('{hi.isoformat()}')"
+    ))
+    if stray:
+        connection.execute(text(f"INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} WHERE {in_range}"), bounds)
+        connection.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_range}"), bounds)
+        connection.execute(text(f"ALTER TABLE intents ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+    return True
+
+
+def ensure_partitions(connection: Connection, months_ahead: int = INTENT_PARTITION_MONTHS_AHEAD,
+                      since: Optional[date] = None) -> List[str]:
+    """Create the monthly partitions from `since` (default: this month) through `months_ahead` months from now."""
+    if not is_partitioned(connection):
+        return []
+    today = datetime.utcnow().date()
+    month, last = month_start(since or today), add_months(month_start(today), months_ahead)
+    created = []
+    while month <= last:
+        if create_partition(connection, month):
+            created.append(partition_name(month))
+        month = add_months(month, 1)
+    return created
+
+
+# --- compaction ---------------------------------------------------------------
+
+def _new_summary(row) -> Dict[str, object]:
+    return {
+        "session_id": row.session_id, "user_uuid": row.user_uuid, "turns": 0,
+        "first_at": row.created_at, "last_at": row.created_at,
+        "intents": Counter(), "answer_tiers": Counter(),
+        "parameters": None, "memory": None, "llm_usage": None,
+    }
+
+
+def summarize(connection: Connection, before: datetime, since: Optional[datetime] = None,
+              source=intents) -> Dict[str, Dict[str, object]]:
+    """One summary per session over its turns in [since, before), streamed in session/time order."""
+    c = source.c
+    query = select(
+        c.session_id, c.user_uuid, c.intent, c.parameters, c.context, c.llm_usage, c.created_at,
+    ).where(c.created_at < before)
+    if since is not None:
+        query = query.where(c.created_at >= since)
+    query = query.order_by(c.session_id, c.created_at)
+
+    result: Dict[str, Dict[str, object]] = {}
+    for row in connection.execution_options(yield_per=1000).execute(query):
+        summary = result.get(row.session_id) or result.setdefault(row.session_id, _new_summary(row))
+        summary["turns"] += 1
+        summary["last_at"] = row.created_at
+        summary["intents"][row.intent or "unknown"] += 1
+        context = row.context or {}
+        if context.get("answer_tier"):
+            summary["answer_tiers"][context["answer_tier"]] += 1
+        summary["parameters"] = row.parameters
+        summary["memory"] = context.get("memory") or summary["memory"]
+        if row.llm_usage and row.llm_usage.get("session_totals"):
+            summary["llm_usage"] = {"session_totals": row.llm_usage["session_totals"]}
+    return result
+
+
+def _merge(existing, new: Dict[str, object]) -> Dict[str, object]:
+    """Fold a summary of newer turns into the stored one; the latest turn's state wins."""
+    newer = new["last_at"] >= existing.last_at
+    return {
+        "turns": existing.turns + new["turns"],
+        "first_at": min(existing.first_at, new["first_at"]),
+        "last_at": max(existing.last_at, new["last_at"]),
+        "intents": dict(Counter(existing.intents or {}) + new["intents"]),
+        "answer_tiers": dict(Counter(existing.answer_tiers or {}) + new["answer_tiers"]),
+        "parameters": new["parameters"] if newer else existing.parameters,
+        "memory": (new["memory"] or existing.memory) if newer else existing.memory,
+        "llm_usage": (new["llm_usage"] or existing.llm_usage) if newer else existing.llm_usage,
+        "compacted_at": datetime.utcnow(),
+    }
+
+
+def store_summaries(connection: Connection, batch: Dict[str, Dict[str, object]]) -> None:
+    items = list(batch.items())
+    for i in range(0, len(items), SUMMARY_BATCH_SIZE):
+        chunk = dict(items[i:i + SUMMARY_BATCH_SIZE])
+        stored = {row.session_id: row for row in connection.execute(
+            select(summaries).where(summaries.c.session_id.in_(list(chunk)))
+        )}
+        for session_id, summary in chunk.items():
+            if session_id in stored:
+                connection.execute(
+                    summaries.update().where(summaries.c.session_id == session_id),
+                    _merge(stored[session_id], summary),
+                )
+            else:
+                connection.execute(summaries.insert(), {
+                    **summary,
+                    "intents": dict(summary["intents"]),
+                    "answer_tiers": dict(summary["answer_tiers"]),
+                    "compacted_at": datetime.utcnow(),
+                })
+
+
+def compact(connection: Connection, cutoff: datetime, archive: str = INTENT_ARCHIVE_MODE,
+            dry_run: bool = False) -> Dict[str, object]:
+    """
+    Summarize and remove every turn older than `cutoff`. With partitioning only
+    whole months go (the cutoff is rounded down to a month boundary) and each
+    partition is summarized and dropped/detached in its own transaction.
+    """
+    if archive not in ("drop", "detach"):
+        raise ValueError(f"Unknown archive mode {archive!r}; use drop or detach")
+    partitioned = is_partitioned(connection)
+    limit = datetime.combine(month_start(cutoff.date()), datetime.min.time()) if partitioned else cutoff
+    windows: List[Tuple[Optional[str], Optional[datetime], datetime]] = []
+    if partitioned:
+        windows += [
+            (name, datetime.combine(lo, datetime.min.time()), datetime.combine(hi, datetime.min.time()))
+            for name, lo, hi in list_partitions(connection) if hi is not None and hi <= limit.date()
+        ]
+    # Then whatever is left: the default partition, or the whole table when it isn't partitioned
+    rest = default_partition if partitioned else intents
+    if partitioned and not connection.execute(text("SELECT to_regclass(:name)"), {"name": DEFAULT_PARTITION}).scalar():
+        rest = None
+
+    outcome = {"cutoff": limit, "partitioned": partitioned, "archive": archive, "dry_run": dry_run,
+               "sessions": set(), "rows": 0, "partitions": []}
+    steps = [(name, since, before, intents) for name, since, before in windows]
+    if rest is not None:
+        steps.append((None, None, limit, rest))
+    for name, since, before, source in steps:
+        batch = summarize(connection, before, since, source)
+        outcome["sessions"].update(batch)
+        outcome["rows"] += sum(s["turns"] for s in batch.values())
+        if dry_run:
+            if name:
+                outcome["partitions"].append(name)
+            continue
+        store_summaries(connection, batch)
+        if name and archive == "detach":
+            connection.execute(text(f"ALTER TABLE intents DETACH PARTITION {name}"))
+            outcome["partitions"].append(name)
+        elif name:
+            connection.execute(text(f"DROP TABLE {name}"))
+            outcome["partitions"].append(name)
+        elif batch:
+            connection.execute(delete(source).where(source.c.created_at < before))
+        connection.commit()
+    outcome["sessions"] = len(outcome["sessions"])
+    return outcome
+
+
+# --- report -------------------------------------------------------------------
+
+def _table_sizes(connection: Connection, names: Iterable[str]) -> List[Dict[str, object]]:
+    rows = []
+    for name in names:
+        size = connection.execute(text(
+            "SELECT c.reltuples::bigint AS estimated_rows, pg_total_relation_size(c.oid) AS total_bytes, "
+            "pg_relation_size(c.oid) AS table_bytes, pg_indexes_size(c.oid) AS index_bytes "
+            "FROM pg_class c WHERE c.oid = to_regclass(:name)"
+        ), {"name": name}).first()
+        if size:
+            rows.append({"table": name, **size._asdict()})
+    return rows
+
+
+def storage_report(connection: Connection, cutoff: Optional[datetime] = None) -> Dict[str, object]:
+    """Row counts and payload bytes for intents and summaries; per-partition sizes on PostgreSQL."""
+    cutoff = cutoff or datetime.utcnow() - timedelta(days=INTENT_RETENTION_DAYS)
+
+    def payload(column):
+        return func.coalesce(func.sum(func.length(cast(column, Text))), 0)
+
+    row = connection.execute(select(
+        func.count(),
+        func.count(func.distinct(intents.c.session_id)),
+        func.min(intents.c.created_at),
+        payload(intents.c.parameters),
+        payload(intents.c.context),
+        payload(intents.c.llm_usage),
+    ).select_from(intents)).one()
+    older = connection.execute(select(func.count()).where(intents.c.created_at < cutoff)).scalar()
+    report: Dict[str, object] = {
+        "intents": {
+            "rows": row[0], "sessions": row[1], "oldest": row[2],
+            "rows_older_than_retention": older,
+            "payload_bytes": {"parameters": row[3], "context": row[4], "llm_usage": row[5]},
+        },
+        "session_summaries": {"rows": connection.execute(select(func.count()).select_from(summaries)).scalar()},
+        "retention_cutoff": cutoff,
+        "partitioned": is_partitioned(connection),
+    }
+    if connection.dialect.name == "postgresql":
+        names = [name for name, _, _ in list_partitions(connection)] if report["partitioned"] else ["intents"]
+        report["tables"] = _table_sizes(connection, [*names, "session_summaries"])
+        report["total_bytes"] = sum(t["total_bytes"] for t in report["tables"])
+    return report
+
+
+# --- CLI --------------------------------------------------------------------
+
+async def _run(args) -> Dict[str, object]:
+    from app.database import engine
+    from app.services.analytics import refresh
+
+    cutoff = datetime.utcnow() - timedelta(days=args.days)
+    async with engine.connect() as conn:
+        before = await conn.run_sync(storage_report, cutoff)
+        if args.command == "report":
+            return before
+        await conn.run_sync(ensure_partitions)
+        await conn.commit()
+        if not args.dry_run:
+            await conn.run_sync(refresh)  # count every turn in the analytics rollups before it goes
+        outcome = await conn.run_sync(compact, cutoff, args.archive, args.dry_run)
+        after = await conn.run_sync(storage_report, cutoff)
+        return {"compaction": outcome, "before": before, "after": after}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report on and compact the intents table.")
+    parser.add_argument("command", choices=["report", "compact"])
+    parser.add_argument("--days", type=int, default=INTENT_RETENTION_DAYS, help="keep turns newer than this")
+    parser.add_argument("--archive", choices=["drop", "detach"], default=INTENT_ARCHIVE_MODE,
+                        help="drop old partitions, or detach them as standalone tables to archive")
+    parser.add_argument("--dry-run", action="store_true", help="count what would be compacted, change nothing")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(_run(args)), indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import ContextVar
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+from app.observability import log_event, record_llm_call
+from app.services.deadline import DeadlineExceeded, remaining_budget, stage_timeout
+from app.services.singleflight import uncoalesced
+from app.services.usage import call_record
+from app.services.llm import CircuitBreaker, LLMTasks, LLMProvider, ProviderError, ProviderTimeoutError
+
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RECOVERY_SECONDS = float(os.getenv("LLM_BREAKER_RECOVERY_SECONDS", "30"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+
+# Hedging: if a call is still running after the model's observed p95, send a duplicate
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "").lower() in ("1", "true", "yes")
+LLM_HEDGE_DEFAULT_DELAY_MS = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY_MS", "3000"))  # until enough samples exist
+LLM_HEDGE_MIN_SAMPLES = 20
+LLM_HEDGE_WORKERS = int(os.getenv("LLM_HEDGE_WORKERS", "16"))
+
+# Per-request model selection: set_model() must not leak between concurrent requests
+_current_model: ContextVar[Optional[str]] = ContextVar("llm_model", default=None)
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies per model, for p95-based hedge delays."""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, model: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(model, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, model: str, pct: float = 95.0) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(model, ()))
+        if len(samples) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * pct / 100.0))]
+
+
+class LLMRouter(LLMTasks):
+    """
+    Routes each call to the provider that owns the requested model and fails
+    over to the other providers (on their fallback model) when it hits a quota,
+    timeout or outage. Each provider sits behind its own circuit breaker, so a
+    throttled provider is skipped outright until it recovers.
+
+    Every call is bounded by the request deadline (see deadline.py) and can
+    optionally be hedged (LLM_HEDGE_ENABLED) to cut tail latency.
+
+    Exposes the same task methods as the clients (is_greeting, extract_parameters, ...).
+    """
+
+    def __init__(self, providers: List[LLMProvider], fallback_models: Optional[Dict[str, str]] = None,
+                 hedging: bool = LLM_HEDGE_ENABLED, hedge_models: Optional[Dict[str, str]] = None,
+                 known_models: Iterable[str] = ()):
+        if not providers:
+            raise ValueError("❌ No LLM provider configured. Set OPENAI_API_KEY and/or GEMINI_API_KEY.")
+        self.providers = providers
+        # Models of every provider, configured or not: asking for one without its API key gets the default
+        self.known_models = {name.lower() for name in known_models}
+        self.fallback_models = fallback_models or {}
+        self.breakers = {
+            p.name: CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_RECOVERY_SECONDS) for p in providers
+        }
+        self.default_model = providers[0].default_model
+        self.hedging = hedging
+        self.hedge_models = hedge_models or {}  # model -> (cheaper) model used for the duplicate request
+        self.latency = LatencyTracker()
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._hedge_lock = threading.Lock()  # hedged calls run on many request threads at once
+
+    def set_model(self, model_display_name: str):
+        if any(p.supports(model_display_name) for p in self.providers):
+            _current_model.set(model_display_name)
+        elif model_display_name.strip().lower() in self.known_models:
+            log_event("llm_model_fallback", requested=model_display_name, model=self.default_model)
+            _current_model.set(None)
+        else:
+            raise ValueError(f"⚠️ Invalid model name: {model_display_name}")
+
+    @property
+    def model(self) -> str:
+        return _current_model.get() or self.default_model
+
+    def plan(self, model: Optional[str] = None) -> List[Tuple[LLMProvider, str]]:
+        """
+        Ordered (provider, model) attempts: the owner of `model` first, then every
+        other provider on its fallback model.
+        """
+        model = model or self.model
+        owner = next((p for p in self.providers if p.supports(model)), self.providers[0])
+        attempts = [(owner, owner.resolve_model(model) or owner.default_model)]
+        for provider in self.providers:
+            if provider is not owner:
+                attempts.append((provider, self.fallback_models.get(provider.name, provider.default_model)))
+        return attempts
+
+    def generate_response(self, message: str, model: Optional[str] = None, timeout: Optional[float] = None) -> str:
+        model = model or self.model
+        if self.hedging:
+            return self._generate_hedged(message, model, timeout)
+        return self._generate(message, model, timeout)
+
+    def _generate(self, message: str, model: str, timeout: Optional[float] = None) -> str:
+        last_error: Optional[ProviderError] = None
+        for provider, provider_model in self.plan(model):
+            breaker = self.breakers[provider.name]
+            # Never wait past the request's end-to-end deadline; raises before a half-open trial slot is taken
+            call_timeout = stage_timeout(cap=timeout or LLM_TIMEOUT_SECONDS, stage=f"{provider.name} call")
+            if not breaker.allow():
+                log_event("llm_provider_skipped", provider=provider.name, circuit=breaker.state)
+                continue
+            started = time.perf_counter()
+            try:
+                with call_record(provider.name, provider_model):
+                    response = provider.generate_response(message, model=provider_model, timeout=call_timeout)
+            except ProviderError as e:
+                record_llm_call(provider.name, provider_model, time.perf_counter() - started, type(e).__name__)
+                if isinstance(e, ProviderTimeoutError) and call_timeout is not None \
+                        and call_timeout < (timeout or LLM_TIMEOUT_SECONDS):
+                    # Cut short by the request budget, not the provider's fault — nothing left to fail over with
+                    breaker.release()
+                    raise DeadlineExceeded(f"⏳ Request budget exhausted during {provider.name} call.", provider.name)
+                if not e.retryable:
+                    # A bad request says nothing about the provider's health, but must not keep a half-open trial
+                    breaker.release()
+                    raise
+                breaker.record_failure()
+                last_error = e
+                # Sampled: during a quota storm this fires on every attempt
+                log_event("llm_failover", provider=provider.name, error=str(e))
+                continue
+            except BaseException:
+                breaker.release()
+                raise
+            elapsed = time.perf_counter() - started
+            self.latency.record(provider_model, elapsed)
+            record_llm_call(provider.name, provider_model, elapsed)
+            breaker.record_success()
+            return response
+        raise last_error or ProviderError("⚠️ No LLM provider available (all circuits open).")
+
+    def _generate_hedged(self, message: str, model: str, timeout: Optional[float] = None) -> str:
+        """
+        Start the call; if it is still running after the model's p95 latency, send a
+        duplicate (to `hedge_models[model]` or the same model) and return whichever
+        succeeds first.
+
+        The loser is only cancelled if it has not started yet. The providers'
+        clients are synchronous, so a call already in flight cannot be
+        interrupted: it runs to completion in its worker (bounded by the same
+        deadline-derived timeout), is billed by the provider, and its result is
+        discarded. Every hedge sent can therefore cost one extra call.
+        """
+        with self._hedge_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=LLM_HEDGE_WORKERS, thread_name_prefix="llm-hedge")
+        _, provider_model = self.plan(model)[0]
+
+        # Each attempt needs its own context copy (a Context cannot be entered by two threads)
+        primary = self._executor.submit(contextvars.copy_context().run, self._generate, message, model, timeout)
+        delay = self.latency.percentile(provider_model) or LLM_HEDGE_DEFAULT_DELAY_MS / 1000.0
+        remaining = remaining_budget()
+        if remaining is not None:
+            delay = min(delay, remaining)
+
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        hedge_model = self.hedge_models.get(provider_model, model)
+        with self._hedge_lock:
+            self.hedges_sent += 1
+        log_event("llm_hedge", model=provider_model, hedge_model=hedge_model, delay_ms=round(delay * 1000))
+        hedge = self._executor.submit(contextvars.copy_context().run, self._generate_uncoalesced, message, hedge_model, timeout)
+
+        pending, last_error = {primary, hedge}, None
+        while pending:
+            done, pending = wait(pending, timeout=remaining_budget(), return_when=FIRST_COMPLETED)
+            if not done:
+                raise DeadlineExceeded("⏳ Request budget exhausted waiting for LLM response.")
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    if future is hedge:
+                        with self._hedge_lock:
+                            self.hedges_won += 1
+                    return future.result()
+                last_error = future.exception()
+        raise last_error
+
+    def _generate_uncoalesced(self, message: str, model: str, timeout: Optional[float] = None) -> str:
+        # A hedge joining the primary's in-flight call would just wait on the same slow request
+        with uncoalesced():
+            return self._generate(message, model, timeout)
+
+    def health(self) -> Dict[str, object]:
+        return {
+            **{
+                name: {"state": breaker.state, "consecutive_failures": breaker.failures}
+                for name, breaker in self.breakers.items()
+            },
+            "hedging": {"enabled": self.hedging, "sent": self.hedges_sent, "won": self.hedges_won},
+        }
+
+
+_router: Optional[LLMRouter] = None
+
+
+def get_llm_router() -> LLMRouter:
+    """
+    Shared router over every provider with an API key, OpenAI first.
+    Fallback models are configurable via OPENAI_FALLBACK_MODEL / GEMINI_FALLBACK_MODEL.
+    """
+    global _router
+    if _router is None:
+        providers: List[LLMProvider] = []
+        if os.getenv("OPENAI_API_KEY"):
+            from app.services.OpenAIClient import OpenAIClient
+            providers.append(OpenAIClient())
+        if os.getenv("GEMINI_API_KEY"):
+            from app.services.Gemini import GeminiClient
+            providers.append(GeminiClient())
+        from app.services.Gemini import MODEL_CHOICES as GEMINI_MODELS
+        from app.services.OpenAIClient import MODEL_CHOICES as OPENAI_MODELS
+        hedge_model = os.getenv("LLM_HEDGE_MODEL")
+        _router = LLMRouter(providers, fallback_models={
+            "openai": os.getenv("OPENAI_FALLBACK_MODEL", "gpt-4o"),
+            "gemini": os.getenv("GEMINI_FALLBACK_MODEL", "gemini-1.5-flash"),
+        }, hedge_models={"gpt-4": hedge_model, "gpt-4o": hedge_model} if hedge_model else None,
+            known_models=[*OPENAI_MODELS, *OPENAI_MODELS.values(), *GEMINI_MODELS, *GEMINI_MODELS.values()])
+    return _router
@@ -0,0 +1,254 @@
+"""
+EMI and eligibility simulation.
+
+Everything is computed in one NumPy broadcast over a grid of
+rate options (lender, annual rate) × tenures (months) × amounts:
+
+    EMI            P·r·(1+r)^n / ((1+r)^n − 1), r = annual rate / 12 / 100
+    total interest EMI·n − P
+    eligibility    EMI ≤ FOIR · monthly income − existing EMIs
+    max loan       the same formula solved for P at the affordable EMI
+
+FOIR (fixed obligations to income ratio) follows the usual Indian lending bands
+unless the caller gives one. Results are deterministic and take milliseconds;
+`answer_borrowing_question` lets the chat routes answer "how much can I borrow"
+without an LLM call.
+"""
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.rag.amounts import format_inr, parse_amount
+from app.rag.facets import detect_lenders
+
+# Indicative annual rates (%) and typical tenures (months) per loan type, used when the caller gives none
+DEFAULT_RATES: Dict[str, Tuple[float, float]] = {
+    "home": (8.4, 9.8),
+    "personal": (10.5, 16.0),
+    "education": (8.5, 12.5),
+    "vehicle": (8.7, 11.5),
+    "business": (12.0, 18.0),
+    "msme": (10.0, 16.0),
+}
+DEFAULT_TENURES: Dict[str, Tuple[int, ...]] = {
+    "home": (120, 180, 240, 300, 360),
+    "personal": (12, 24, 36, 48, 60),
+    "education": (60, 84, 120, 180),
+    "vehicle": (36, 48, 60, 84),
+    "business": (12, 24, 36, 60),
+    "msme": (12, 36, 60, 84),
+}
+DEFAULT_LOAN_TYPE = "personal"
+DEFAULT_RATE_STEPS = 5
+DEFAULT_AMOUNT_FRACTIONS = (0.25, 0.5, 0.75, 1.0)  # of the best-case max loan, when no amounts are given
+MAX_COMBINATIONS = 5000  # rate options × tenures × amounts; each one is a dict in the result and the stored row
+
+# (monthly income up to, FOIR)
+FOIR_BANDS = ((30000, 0.40), (75000, 0.50), (150000, 0.55), (float("inf"), 0.60))
+
+RateOption = Tuple[str, float]  # (lender or "indicative", annual rate %)
+
+
+def foir_for_income(monthly_income: float) -> float:
+    return next(foir for limit, foir in FOIR_BANDS if monthly_income <= limit)
+
+
+def emi(principal: np.ndarray, annual_rate: np.ndarray, months: np.ndarray) -> np.ndarray:
+    """Vectorized EMI; inputs broadcast against each other."""
+    r = np.asarray(annual_rate, dtype=np.float64) / 1200.0
+    n = np.asarray(months, dtype=np.float64)
+    p = np.asarray(principal, dtype=np.float64)
+    growth = np.power(1.0 + r, n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        payment = p * r * growth / (growth - 1.0)
+    return np.where(r > 0, payment, p / n)
+
+
+def max_principal(affordable_emi: float, annual_rate: np.ndarray, months: np.ndarray) -> np.ndarray:
+    """Largest principal whose EMI fits `affordable_emi` (inverse of `emi`)."""
+    r = np.asarray(annual_rate, dtype=np.float64) / 1200.0
+    n = np.asarray(months, dtype=np.float64)
+    growth = np.power(1.0 + r, n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        principal = affordable_emi * (growth - 1.0) / (r * growth)
+    return np.maximum(np.where(r > 0, principal, affordable_emi * n), 0.0)
+
+
+def amortization(principal: float, annual_rate: float, months: int) -> List[Dict[str, float]]:
+    """Year-by-year principal/interest split and closing balance, computed in closed form."""
+    r = annual_rate / 1200.0
+    payment = float(emi(principal, annual_rate, months))
+    k = np.arange(0, months + 1, dtype=np.float64)
+    if r > 0:
+        growth_n = (1.0 + r) ** months
+        balance = principal * (growth_n - (1.0 + r) ** k) / (growth_n - 1.0)
+    else:
+        balance = principal - payment * k
+    interest = balance[:-1] * r
+    principal_paid = payment - interest
+
+    years = []
+    for start in range(0, months, 12):
+        end = min(start + 12, months)
+        years.append({
+            "year": start // 12 + 1,
+            "principal": round(float(principal_paid[start:end].sum()), 2),
+            "interest": round(float(interest[start:end].sum()), 2),
+            "closing_balance": round(max(float(balance[end]), 0.0), 2),
+        })
+    return years
+
+
+def rate_options(loan_type: Optional[str], lenders: Optional[Dict[str, float]] = None,
+                 rates: Optional[Sequence[float]] = None) -> List[RateOption]:
+    if lenders:
+        return [(name, float(rate)) for name, rate in lenders.items()]
+    if rates:
+        return [("indicative", float(rate)) for rate in rates]
+    low, high = DEFAULT_RATES.get(loan_type or DEFAULT_LOAN_TYPE, DEFAULT_RATES[DEFAULT_LOAN_TYPE])
+    return [("indicative", round(float(rate), 2)) for rate in np.linspace(low, high, DEFAULT_RATE_STEPS)]
+
+
+def grid_size(loan_type: Optional[str] = None, amounts: Optional[Sequence[float]] = None,
+              tenures: Optional[Sequence[int]] = None, rates: Optional[Sequence[float]] = None,
+              lenders: Optional[Dict[str, float]] = None) -> int:
+    """How many combinations `simulate` would evaluate for these inputs."""
+    loan_type = loan_type if loan_type in DEFAULT_RATES else None
+    return (
+        len(rate_options(loan_type, lenders, rates))
+        * len(tenures or DEFAULT_TENURES[loan_type or DEFAULT_LOAN_TYPE])
+        * len(amounts or DEFAULT_AMOUNT_FRACTIONS)
+    )
+
+
+def simulate(
+    monthly_income: float,
+    loan_type: Optional[str] = None,
+    existing_emi: float = 0.0,
+    amounts: Optional[Sequence[float]] = None,
+    tenures: Optional[Sequence[int]] = None,
+    rates: Optional[Sequence[float]] = None,
+    lenders: Optional[Dict[str, float]] = None,
+    foir: Optional[float] = None,
+    schedule: bool = False,
+) -> Dict[str, object]:
+    """
+    Evaluate every (rate option, tenure, amount) combination at once.
+
+    `eligibility_score` (0–100) is the share of combinations whose EMI fits the
+    FOIR limit, or, when exactly one amount is asked about, how much of it the
+    best option covers.
+    """
+    loan_type = loan_type if loan_type in DEFAULT_RATES else None
+    options = rate_options(loan_type, lenders, rates)
+    tenure_grid = np.asarray(tenures or DEFAULT_TENURES[loan_type or DEFAULT_LOAN_TYPE], dtype=np.float64)
+    rate_grid = np.asarray([rate for _, rate in options], dtype=np.float64)
+
+    foir = foir or foir_for_income(monthly_income)
+    affordable_emi = max(foir * monthly_income - existing_emi, 0.0)
+
+    # (R, T): what each rate option × tenure can fund at the affordable EMI
+    max_loans = max_principal(affordable_emi, rate_grid[:, None], tenure_grid[None, :])
+    best_r, best_t = np.unravel_index(np.argmax(max_loans), max_loans.shape)
+    best_max = float(max_loans[best_r, best_t])
+
+    amount_grid = np.asarray(
+        amounts or [round(best_max * f, -3) for f in DEFAULT_AMOUNT_FRACTIONS], dtype=np.float64
+    )
+    amount_grid = amount_grid[amount_grid > 0]
+
+    # (R, T, A)
+    emis = emi(amount_grid[None, None, :], rate_grid[:, None, None], tenure_grid[None, :, None])
+    total_interest = emis * tenure_grid[None, :, None] - amount_grid[None, None, :]
+    eligible = emis <= affordable_emi + 1e-6
+
+    if amounts and len(amount_grid) == 1:
+        score = min(best_max / amount_grid[0], 1.0) * 100 if amount_grid[0] else 0.0
+    else:
+        score = float(eligible.mean()) * 100 if eligible.size else 0.0
+
+    combinations = [
+        {
+            "lender": options[i][0],
+            "annual_rate": options[i][1],
+            "tenure_months": int(tenure_grid[j]),
+            "amount": round(float(amount_grid[k]), 2),
+            "emi": round(float(emis[i, j, k]), 2),
+            "total_interest": round(float(total_interest[i, j, k]), 2),
+            "eligible": bool(eligible[i, j, k]),
+        }
+        for i, j, k in np.ndindex(emis.shape)
+    ]
+
+    result: Dict[str, object] = {
+        "loan_type": loan_type,
+        "monthly_income": monthly_income,
+        "existing_emi": existing_emi,
+        "foir": foir,
+        "affordable_emi": round(affordable_emi, 2),
+        "eligibility_score": round(score, 1),
+        "max_eligible_amount": round(best_max, 2),
+        "best_option": {
+            "lender": options[best_r][0],
+            "annual_rate": options[best_r][1],
+            "tenure_months": int(tenure_grid[best_t]),
+        },
+        "max_loan_by_option": [
+            {"lender": options[i][0], "annual_rate": options[i][1], "tenure_months": int(tenure_grid[j]),
+             "max_amount": round(float(max_loans[i, j]), 2)}
+            for i, j in np.ndindex(max_loans.shape)
+        ],
+        "combinations": combinations,
+    }
+    if schedule and amount_grid.size:
+        # Schedule for the largest eligible amount at the best option (or the smallest amount asked about)
+        fits = amount_grid[eligible[best_r, best_t]]
+        principal = float(fits.max()) if fits.size else float(amount_grid.min())
+        result["schedule"] = {
+            "amount": round(principal, 2),
+            **result["best_option"],
+            "years": amortization(principal, options[best_r][1], int(tenure_grid[best_t])),
+        }
+    return result
+
+
+# Borrowing capacity only: "how much can I borrow", "maximum loan amount", "can I afford";
+# not "how much is the processing fee" or "how much interest will I pay on a 5 lakh loan"
+_BORROW_QUESTION = re.compile(
+    r"\bhow much\s+(?:(?:money|loan|amount)\s+)?(?:can|could|would|will)\s+(?:i|we)\s+"
+    r"(?:borrow|get|afford|be\s+(?:eligible|sanctioned|approved))\b"
+    r"|\bhow much\s+(?:loan\s+)?(?:am\s+i|are\s+we)\s+eligible\b"
+    r"|\b(?:max(?:imum)?|eligible)\s+loan\s+amount\b"
+    r"|\bcan\s+(?:i|we)\s+afford\b",
+    re.IGNORECASE,
+)
+_INCOME_HINT = re.compile(r"\b(income|salary|earn\w*|per month|a month|monthly)\b|/\s*(month|mo|pm)\b", re.IGNORECASE)
+MIN_MONTHLY_INCOME = 5000  # smaller numbers in a message are tenures, ages or counts, not income
+
+
+def answer_borrowing_question(message: str, loan_type: Optional[str] = None,
+                              income: Optional[str] = None) -> Optional[Tuple[str, Dict[str, object]]]:
+    """
+    Deterministic answer to "how much can I borrow (on ₹80k/month)?" from the
+    message or the known income; None when the message isn't that question,
+    asks about a named lender (its FAQ answer knows that lender's limit) or
+    there is no income to work from.
+    """
+    if not _BORROW_QUESTION.search(message or "") or detect_lenders(message):
+        return None
+    stated = parse_amount(message) if _INCOME_HINT.search(message) else None
+    monthly_income = stated if stated and stated >= MIN_MONTHLY_INCOME else parse_amount(income)
+    if not monthly_income:
+        return None
+    result = simulate(monthly_income, loan_type=loan_type)
+    best = result["best_option"]
+    text = (
+        f"🧮 With a monthly income of {format_inr(monthly_income)}, lenders typically allow EMIs up to "
+        f"{result['foir']:.0%} of income ({format_inr(result['affordable_emi'])}/month). "
+        f"That supports a {result['loan_type'] or 'loan'} of up to about {format_inr(result['max_eligible_amount'])} "
+        f"over {best['tenure_months'] // 12} years at {best['annual_rate']}% p.a.\n\n"
+        "Existing EMIs, your credit score and the lender's own rate will change this — "
+        "share them and I can refine the estimate."
+    )
+    return text, result
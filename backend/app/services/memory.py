@@ -0,0 +1,168 @@
+"""
+Rolling conversation memory with a bounded prompt footprint.
+
+The state lives in the latest turn's `Intent.context["memory"]`, so a new turn
+only needs that one row:
+
+    summary             compact LLM-written summary of everything folded so far
+    summarized_through  turn number the summary covers
+    recent              the last MEMORY_RECENT_TURNS turns, verbatim
+    pending             older turns waiting to be folded into the summary
+
+Folding runs in the background after the turn is saved (`schedule_fold`), off
+the request path. If folding falls behind, the oldest pending turns are folded
+extractively so the state never grows past a fixed size. `prompt_context()`
+renders summary + recent turns within a token budget, so prompts built from it
+cost the same on turn 5 and turn 500.
+"""
+import asyncio
+import contextvars
+import os
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy.future import select
+
+from app.observability import span
+
+MEMORY_RECENT_TURNS = int(os.getenv("MEMORY_RECENT_TURNS", "4"))
+MEMORY_PROMPT_TOKENS = int(os.getenv("MEMORY_PROMPT_TOKENS", "600"))
+# e.g. gpt-3.5-turbo; unset, each fold runs on the model the session's turn selected (set_model)
+MEMORY_SUMMARY_MODEL = os.getenv("MEMORY_SUMMARY_MODEL") or None
+MEMORY_SUMMARY_TOKENS = 250
+MEMORY_MAX_PENDING_TURNS = 12
+TURN_TEXT_LIMIT = 600  # characters kept per message in `recent`
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough count (~4 characters per token); good enough for budgeting."""
+    return len(text) // 4 + 1 if text else 0
+
+
+def clip_tokens(text: str, max_tokens: int) -> str:
+    limit = max_tokens * 4
+    return text if len(text) <= limit else text[:limit].rsplit(" ", 1)[0] + " …"
+
+
+def _render_turn(turn: Dict) -> str:
+    return f"User: {turn['user']}\nBot: {turn['bot']}"
+
+
+class RollingMemory:
+    def __init__(self, state: Optional[Dict] = None):
+        state = state or {}
+        self.summary: str = state.get("summary", "")
+        self.summarized_through: int = state.get("summarized_through", 0)
+        self.turns: int = state.get("turns", 0)
+        self.recent: List[Dict] = list(state.get("recent", []))
+        self.pending: List[Dict] = list(state.get("pending", []))
+
+    @classmethod
+    def from_intent(cls, intent) -> "RollingMemory":
+        return cls((intent.context or {}).get("memory") if intent is not None else None)
+
+    def state(self) -> Dict:
+        return {
+            "summary": self.summary,
+            "summarized_through": self.summarized_through,
+            "turns": self.turns,
+            "recent": self.recent,
+            "pending": self.pending,
+        }
+
+    def add_turn(self, user_message: str, bot_response: str) -> None:
+        self.turns += 1
+        self.recent.append({
+            "n": self.turns,
+            "user": clip_tokens(user_message or "", TURN_TEXT_LIMIT // 4),
+            "bot": clip_tokens(bot_response or "", TURN_TEXT_LIMIT // 4),
+        })
+        while len(self.recent) > MEMORY_RECENT_TURNS:
+            self.pending.append(self.recent.pop(0))
+        # Background folding fell behind: fold the overflow extractively to stay bounded
+        while len(self.pending) > MEMORY_MAX_PENDING_TURNS:
+            oldest = self.pending.pop(0)
+            self.summary = clip_tokens(f"{self.summary} User asked: {oldest['user']}".strip(), MEMORY_SUMMARY_TOKENS)
+            self.summarized_through = oldest["n"]
+
+    def apply_fold(self, summary: str, through: int) -> bool:
+        """Install a background-generated summary covering turns up to `through`; False if stale."""
+        if through <= self.summarized_through:
+            return False
+        self.summary = clip_tokens(summary.strip(), MEMORY_SUMMARY_TOKENS)
+        self.summarized_through = through
+        self.pending = [t for t in self.pending if t["n"] > through]
+        return True
+
+    def prompt_context(self, budget_tokens: int = MEMORY_PROMPT_TOKENS) -> str:
+        """Summary plus as many of the newest turns as fit in `budget_tokens`."""
+        parts: List[str] = []
+        remaining = budget_tokens
+        if self.summary:
+            summary = clip_tokens(self.summary, min(MEMORY_SUMMARY_TOKENS, budget_tokens // 2))
+            parts.append(f"Earlier in this conversation: {summary}")
+            remaining -= estimate_tokens(parts[0])
+
+        turns: List[str] = []
+        for turn in reversed(self.pending + self.recent):
+            rendered = _render_turn(turn)
+            cost = estimate_tokens(rendered)
+            if cost > remaining:
+                break
+            turns.append(rendered)
+            remaining -= cost
+        if turns:
+            parts.append("Recent turns:\n" + "\n".join(reversed(turns)))
+        return "\n\n".join(parts)
+
+
+def fold_prompt(summary: str, turns: List[Dict]) -> str:
+    transcript = "\n".join(_render_turn(t) for t in turns)
+    return (
+        "You maintain a compact memory of a loan-advisory chat.\n"
+        f"Current summary:\n{summary or '(empty)'}\n\n"
+        f"New turns to fold in:\n{transcript}\n\n"
+        f"Write an updated summary in at most {MEMORY_SUMMARY_TOKENS * 3 // 4} words. Keep facts the user shared "
+        "(name, loan type, amount, income, location, timeline, lenders discussed) and open questions; drop pleasantries."
+    )
+
+
+_folding: Set[str] = set()
+_fold_tasks: Set[asyncio.Task] = set()
+
+
+def schedule_fold(session_id: str, memory: RollingMemory, llm_client) -> None:
+    """Fold `memory.pending` into the summary in the background (at most one fold per session at a time)."""
+    if not memory.pending or session_id in _folding:
+        return
+    _folding.add(session_id)
+    # Read here: the fresh context below drops the request's model selection along with its
+    # deadline, trace and usage recorder, none of which the fold may inherit
+    model = MEMORY_SUMMARY_MODEL or llm_client.model
+    task = asyncio.create_task(
+        _fold(session_id, memory.summary, list(memory.pending), llm_client, model), context=contextvars.Context()
+    )
+    _fold_tasks.add(task)
+    task.add_done_callback(_fold_tasks.discard)
+
+
+async def _fold(session_id: str, summary: str, turns: List[Dict], llm_client, model: str) -> None:
+    from app.database import async_session_maker
+    from app.models.intent import Intent
+
+    try:
+        with span("memory_fold"):
+            new_summary = await asyncio.to_thread(
+                llm_client.generate_response, fold_prompt(summary, turns), model
+            )
+        async with async_session_maker() as db:
+            latest = (await db.execute(
+                select(Intent).where(Intent.session_id == session_id).order_by(Intent.created_at.desc()).limit(1)
+            )).scalar_one_or_none()
+            memory = RollingMemory.from_intent(latest)
+            if latest is not None and memory.apply_fold(new_summary, turns[-1]["n"]):
+                latest.context = {**(latest.context or {}), "memory": memory.state()}
+                await db.commit()
+    except Exception as e:
+        print(f"⚠️ Memory fold failed for session {session_id}: {e}")
+    finally:
+        _folding.discard(session_id)
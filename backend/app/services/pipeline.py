@@ -0,0 +1,90 @@
+"""
+Declarative staged pipeline for chat turns.
+
+A pipeline is an ordered list of named stages over one mutable turn context.
+Each stage reads what earlier stages left on the context, writes its own
+outputs there, and either returns None (carry on) or a reply, which
+short-circuits the rest of the pipeline. `Parallel` runs independent stages
+concurrently (e.g. exit scoring next to retrieval); the first reply in declared
+order wins.
+
+Every stage is timed as its own span (per-stage latency at GET /metrics) and
+bounded by the request deadline, capped by the stage's own `timeout`. Optional
+stages (web augmentation) that fail or time out are logged and skipped instead
+of failing the turn. `finish` runs once with the final reply (persistence).
+"""
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Generic, List, Optional, Sequence, TypeVar, Union
+
+from app.observability import log_event, span
+from app.services.deadline import DeadlineExceeded, stage_timeout
+
+C = TypeVar("C")  # turn context
+R = TypeVar("R")  # reply
+
+
+@dataclass(frozen=True)
+class Stage(Generic[C, R]):
+    name: str
+    run: Callable[[C], Awaitable[Optional[R]]]
+    when: Optional[Callable[[C], bool]] = None  # skipped when this returns False
+    timeout: Optional[float] = None             # seconds, on top of the request deadline
+    optional: bool = False                      # failures are logged and the turn continues
+
+
+@dataclass(frozen=True)
+class Parallel(Generic[C, R]):
+    stages: Sequence[Stage]
+
+
+Step = Union[Stage, Parallel]
+
+
+class Pipeline(Generic[C, R]):
+    def __init__(self, name: str, steps: List[Step], finish: Optional[Callable[[C, R], Awaitable[None]]] = None):
+        self.name = name
+        self.steps = steps
+        self.finish = finish
+
+    async def run(self, ctx: C) -> R:
+        reply: Optional[R] = None
+        for step in self.steps:
+            if isinstance(step, Parallel):
+                reply = await self._run_parallel(step, ctx)
+            else:
+                reply = await self._run_stage(step, ctx)
+            if reply is not None:
+                break
+        if reply is None:
+            raise RuntimeError(f"Pipeline {self.name!r} finished without a reply")
+        if self.finish:
+            await self.finish(ctx, reply)
+        return reply
+
+    async def _run_parallel(self, step: Parallel, ctx: C) -> Optional[R]:
+        tasks = [asyncio.create_task(self._run_stage(stage, ctx)) for stage in step.stages]
+        try:
+            replies = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        return next((reply for reply in replies if reply is not None), None)
+
+    async def _run_stage(self, stage: Stage, ctx: C) -> Optional[R]:
+        if stage.when is not None and not stage.when(ctx):
+            return None
+        try:
+            with span(stage.name):
+                timeout = stage_timeout(cap=stage.timeout, stage=stage.name)
+                try:
+                    return await asyncio.wait_for(stage.run(ctx), timeout=timeout)
+                except asyncio.TimeoutError:
+                    raise DeadlineExceeded(f"⏳ Stage {stage.name} ran out of time ({timeout:.1f}s).")
+        except Exception as e:
+            if not stage.optional:
+                raise
+            print(f"⚠️ Skipping {stage.name}: {e}")
+            log_event("stage_skipped", stage=stage.name, error=type(e).__name__)
+            return None
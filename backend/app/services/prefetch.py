@@ -0,0 +1,126 @@
+"""
+Speculative retrieval while /api/chat is still filling slots.
+
+Once a session's loan type and location are known, the lookup its last
+slot-filling turn will make (the user's loan question, FAQ retrieval, and the
+web search when the match is weak) is already determined, so it is started in
+the background while the bot asks for name, income and timeline. The turn that
+fills the last slot takes the speculation if it was made for the same lookup
+and model, and awaits whatever is still in flight instead of starting over.
+
+Speculations are per worker, at most one per session, dropped after
+PREFETCH_TTL_SECONDS and bounded to PREFETCH_MAX_SESSIONS (oldest evicted and
+cancelled first). None are started while admission has turns queued. LLM calls
+made ahead of time are added to the usage of the turn that takes them; those of
+speculations nobody takes only show up in the provider metrics.
+Outcomes are counted in loanbot_prefetch_total.
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from prometheus_client import Counter
+
+from app.services.admission import admission_controller
+from app.services.usage import TurnUsage
+
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "1").lower() not in ("0", "false", "no")
+PREFETCH_TTL_SECONDS = float(os.getenv("PREFETCH_TTL_SECONDS", "600"))
+PREFETCH_MAX_SESSIONS = int(os.getenv("PREFETCH_MAX_SESSIONS", "1000"))
+
+PREFETCHES = Counter(
+    "loanbot_prefetch_total", "Speculative slot-filling lookups by outcome",
+    ["outcome"],  # started | hit | stale | expired | evicted | skipped_busy
+)
+
+
+class Speculation:
+    """One session's lookup done ahead of time: the FAQ result and, if it needs one, the web summary."""
+
+    def __init__(self, key: Hashable):
+        loop = asyncio.get_running_loop()
+        self.key = key
+        self.created = time.monotonic()
+        self.usage: Optional[TurnUsage] = None  # set by the speculation itself
+        self.faq: asyncio.Future = loop.create_future()
+        self.web: asyncio.Future = loop.create_future()  # None when the match needs no web search
+        self.task: Optional[asyncio.Task] = None
+
+    def expired(self, ttl: float = PREFETCH_TTL_SECONDS) -> bool:
+        return time.monotonic() - self.created > ttl
+
+    def cancel(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+        for future in (self.faq, self.web):
+            if not future.done():
+                future.cancel()
+
+    async def result(self, future: asyncio.Future) -> Optional[Any]:
+        """The speculative value, None if it was given up; a stage timeout doesn't cancel the speculation."""
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if future.cancelled():
+                return None
+            raise
+
+
+class SpeculationCache:
+    """Size- and TTL-bounded speculations by session id (event-loop only, no locking)."""
+
+    def __init__(self, max_size: int = PREFETCH_MAX_SESSIONS, ttl: float = PREFETCH_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Speculation]" = OrderedDict()
+
+    def wanted(self, session_id: str, key: Hashable) -> bool:
+        """Whether a speculation for `key` should be started (none running for it already)."""
+        if not PREFETCH_ENABLED or self.max_size <= 0:
+            return False
+        current = self._data.get(session_id)
+        if current is not None and current.key == key and not current.expired(self.ttl):
+            return False
+        if admission_controller.stats()["queued"]:
+            PREFETCHES.labels("skipped_busy").inc()
+            return False
+        return True
+
+    def put(self, session_id: str, speculation: Speculation) -> None:
+        previous = self._data.pop(session_id, None)
+        if previous is not None:
+            previous.cancel()
+        self._data[session_id] = speculation
+        PREFETCHES.labels("started").inc()
+        while self._data and next(iter(self._data.values())).expired(self.ttl):
+            _, expired = self._data.popitem(last=False)
+            expired.cancel()
+            PREFETCHES.labels("expired").inc()
+        while len(self._data) > self.max_size:
+            _, evicted = self._data.popitem(last=False)
+            evicted.cancel()
+            PREFETCHES.labels("evicted").inc()
+
+    def take(self, session_id: str, key: Hashable) -> Optional[Speculation]:
+        """The session's speculation if it was made for `key` and is still fresh; it can be taken once."""
+        speculation = self._data.pop(session_id, None)
+        if speculation is None:
+            return None
+        if speculation.expired(self.ttl):
+            speculation.cancel()
+            PREFETCHES.labels("expired").inc()
+            return None
+        if speculation.key != key:
+            speculation.cancel()
+            PREFETCHES.labels("stale").inc()
+            return None
+        PREFETCHES.labels("hit").inc()
+        return speculation
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+speculations = SpeculationCache()
@@ -0,0 +1,104 @@
+"""
+Single-flight coalescing for identical in-flight upstream calls.
+
+When a question trends, many sessions send the same web-query prompt, the same
+Serper query and near-identical final prompts at the same moment. The first
+caller for a key (the leader) makes the call; callers arriving while it is in
+flight wait on the leader's future and get the same result. Nothing is cached:
+the key is forgotten as soon as the call finishes.
+
+Calls are blocking and run on request threads, so there is no cancellation to
+propagate. Instead every follower waits no longer than its own timeout, and a
+leader failing on *its* timeout (retry_on) does not fail followers that still
+have time: they retry once, coalescing among themselves again.
+"""
+import os
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FuturesTimeout
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+from prometheus_client import Counter
+
+SINGLEFLIGHT_ENABLED = os.getenv("SINGLEFLIGHT_ENABLED", "1") == "1"
+
+SINGLEFLIGHT_CALLS = Counter(
+    "loanbot_singleflight_calls_total", "Upstream calls by coalescing role (leader/coalesced/retried)",
+    ["upstream", "role"],
+)
+
+T = TypeVar("T")
+
+# Set for calls that must reach the upstream themselves (e.g. a hedged duplicate LLM request)
+_bypass: ContextVar[bool] = ContextVar("singleflight_bypass", default=False)
+
+
+@contextmanager
+def uncoalesced():
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+class SingleFlight:
+    def __init__(self, upstream: str, retry_on: Tuple[type, ...] = ()):
+        self.upstream = upstream
+        self.retry_on = retry_on
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(
+        self,
+        key: Hashable,
+        fn: Callable[[float], T],
+        timeout: float,
+        on_coalesced: Optional[Callable[[], None]] = None,
+        _retry: bool = True,
+    ) -> T:
+        """
+        Run `fn(timeout)` unless an identical call (same key) is already in flight,
+        in which case wait up to `timeout` for its result. Raises
+        concurrent.futures.TimeoutError if a shared result doesn't arrive in time.
+        """
+        if not SINGLEFLIGHT_ENABLED or _bypass.get():
+            return fn(timeout)
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+
+        if leader:
+            SINGLEFLIGHT_CALLS.labels(self.upstream, "leader").inc()
+            try:
+                result = fn(timeout)
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            else:
+                future.set_result(result)
+                return result
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+
+        SINGLEFLIGHT_CALLS.labels(self.upstream, "coalesced").inc()
+        started = time.monotonic()
+        try:
+            result = future.result(timeout=timeout)
+        except FuturesTimeout:
+            raise
+        except self.retry_on:
+            remaining = timeout - (time.monotonic() - started)
+            if not _retry or remaining <= 0:
+                raise
+            SINGLEFLIGHT_CALLS.labels(self.upstream, "retried").inc()
+            return self.do(key, fn, remaining, on_coalesced, _retry=False)
+        if on_coalesced:
+            on_coalesced()
+        return result
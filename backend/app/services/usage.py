@@ -0,0 +1,225 @@
+"""
+Token, latency and cost accounting for LLM calls.
+
+The router opens a `call_record(...)` around every provider call; providers
+report what the API returned with `note_tokens(...)`. Each finished call is
+appended to the current turn (`start_turn()` at the top of a chat request) and
+counted in Prometheus by route, model and pipeline stage — the stage is the
+innermost `observability.span` the call happened in.
+
+`TurnUsage.summary()` is what gets persisted with the turn (Intent.llm_usage),
+together with running totals for the whole session.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from prometheus_client import Counter
+
+from app.observability import current_stage, current_trace
+
+# USD per 1K tokens (prompt, completion); unknown models are counted at 0
+MODEL_PRICES: Dict[str, tuple] = {
+    "gpt-4": (0.03, 0.06),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+    "gemini-1.5-flash": (0.000075, 0.0003),
+    "gemini-1.5-flash-latest": (0.000075, 0.0003),
+    "gemini-1.5-pro": (0.00125, 0.005),
+    "gemini-2.0-flash": (0.0001, 0.0004),
+    "gemini-2.5-flash-preview-05-20": (0.00015, 0.0006),
+    "gemini-2.5-pro-preview-06-05": (0.00125, 0.01),
+}
+
+LLM_TOKENS = Counter(
+    "loanbot_llm_tokens_total", "LLM tokens by route, model, stage and kind (prompt/completion)",
+    ["route", "model", "stage", "kind"],
+)
+LLM_COST = Counter(
+    "loanbot_llm_cost_usd_total", "Estimated LLM spend in USD", ["route", "model", "stage"],
+)
+
+TOTAL_FIELDS = ("calls", "prompt_tokens", "completion_tokens", "total_tokens", "cached_tokens", "latency_ms", "cost_usd")
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000.0
+
+
+class LLMCall:
+    def __init__(self, provider: str, model: str, stage: str):
+        self.provider = provider
+        self.model = model
+        self.stage = stage
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0  # prompt tokens served from the provider's prompt cache
+        self.cache = "miss"     # "hit"/"coalesced" when the answer did not come from a fresh provider call
+        self.outcome = "ok"
+        self.latency_ms = 0.0
+
+    @property
+    def cost_usd(self) -> float:
+        return estimate_cost(self.model, self.prompt_tokens, self.completion_tokens)
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "stage": self.stage,
+            "provider": self.provider,
+            "model": self.model,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+            "cache": self.cache,
+            "outcome": self.outcome,
+            "latency_ms": round(self.latency_ms, 1),
+            "cost_usd": round(self.cost_usd, 6),
+        }
+
+
+def _empty_totals() -> Dict[str, float]:
+    return {field: 0 for field in TOTAL_FIELDS}
+
+
+def _add(totals: Dict[str, float], call: LLMCall) -> None:
+    totals["calls"] += 1
+    totals["prompt_tokens"] += call.prompt_tokens
+    totals["completion_tokens"] += call.completion_tokens
+    totals["total_tokens"] += call.prompt_tokens + call.completion_tokens
+    totals["cached_tokens"] += call.cached_tokens
+    totals["latency_ms"] = round(totals["latency_ms"] + call.latency_ms, 1)
+    totals["cost_usd"] = round(totals["cost_usd"] + call.cost_usd, 6)
+
+
+def merge_totals(*totals: Optional[Dict[str, float]]) -> Dict[str, float]:
+    merged = _empty_totals()
+    for part in totals:
+        for field in TOTAL_FIELDS:
+            merged[field] += (part or {}).get(field, 0)
+    merged["latency_ms"] = round(merged["latency_ms"], 1)
+    merged["cost_usd"] = round(merged["cost_usd"], 6)
+    return merged
+
+
+class TurnUsage:
+    """Every LLM call made while answering one chat turn (hedged calls may append from other threads)."""
+
+    def __init__(self):
+        self.calls: List[LLMCall] = []
+        self.previous_session_totals: Optional[Dict[str, float]] = None
+        self._lock = threading.Lock()
+
+    def add(self, call: LLMCall) -> None:
+        with self._lock:
+            self.calls.append(call)
+
+    def summary(self, route: Optional[str] = None) -> Dict[str, object]:
+        totals, by_stage = _empty_totals(), {}
+        with self._lock:
+            calls = list(self.calls)
+        for call in calls:
+            _add(totals, call)
+            _add(by_stage.setdefault(call.stage, _empty_totals()), call)
+        return {
+            "route": route,
+            "models": sorted({c.model for c in calls}),
+            "totals": totals,
+            "by_stage": by_stage,
+            "calls": [c.as_dict() for c in calls],
+            "session_totals": merge_totals(self.previous_session_totals, totals),
+        }
+
+
+_current_turn: ContextVar[Optional[TurnUsage]] = ContextVar("turn_usage", default=None)
+_current_call: ContextVar[Optional[LLMCall]] = ContextVar("llm_call", default=None)
+
+
+def start_turn() -> TurnUsage:
+    turn = TurnUsage()
+    _current_turn.set(turn)
+    return turn
+
+
+def current_turn() -> Optional[TurnUsage]:
+    return _current_turn.get()
+
+
+def adopt_calls(usage: Optional[TurnUsage]) -> None:
+    """Charge the current turn with calls made ahead of time on its behalf (speculative prefetch)."""
+    turn = _current_turn.get()
+    if turn is None or usage is None:
+        return
+    with usage._lock:
+        calls = list(usage.calls)
+    for call in calls:
+        turn.add(call)
+
+
+def carry_session_totals(previous_usage: Optional[Dict]) -> None:
+    """Seed the session totals from the previous turn's persisted usage (O(1) per turn)."""
+    turn = _current_turn.get()
+    if turn is not None and previous_usage:
+        turn.previous_session_totals = previous_usage.get("session_totals")
+
+
+def turn_summary() -> Optional[Dict[str, object]]:
+    """What gets persisted with the turn: this turn's calls and totals plus running session totals."""
+    turn = _current_turn.get()
+    if turn is None:
+        return None
+    trace = current_trace()
+    return turn.summary(route=trace.route if trace else None)
+
+
+def note_tokens(prompt_tokens: Optional[int], completion_tokens: Optional[int], cached_tokens: Optional[int] = 0) -> None:
+    """Called by providers with the usage block of the API response."""
+    call = _current_call.get()
+    if call is not None:
+        call.prompt_tokens = int(prompt_tokens or 0)
+        call.completion_tokens = int(completion_tokens or 0)
+        call.cached_tokens = int(cached_tokens or 0)
+
+
+def note_coalesced() -> None:
+    """The provider call was answered by an identical call already in flight (no tokens spent)."""
+    call = _current_call.get()
+    if call is not None:
+        call.cache = "coalesced"
+
+
+@contextmanager
+def call_record(provider: str, model: str):
+    """Account for one provider call: latency, outcome and whatever the provider reports via note_tokens."""
+    call = LLMCall(provider, model, current_stage() or "unattributed")
+    token = _current_call.set(call)
+    start = time.perf_counter()
+    try:
+        yield call
+    except Exception as e:
+        call.outcome = type(e).__name__
+        raise
+    finally:
+        call.latency_ms = (time.perf_counter() - start) * 1000
+        _current_call.reset(token)
+        _finish(call)
+
+
+def record_cached_call(provider: str, model: str, cache: str = "hit") -> None:
+    """A response reused without calling the provider (no tokens spent)."""
+    call = LLMCall(provider, model, current_stage() or "unattributed")
+    call.cache = cache
+    _finish(call)
+
+
+def _finish(call: LLMCall) -> None:
+    trace = current_trace()
+    route = trace.route if trace else "none"
+    LLM_TOKENS.labels(route, call.model, call.stage, "prompt").inc(call.prompt_tokens)
+    LLM_TOKENS.labels(route, call.model, call.stage, "completion").inc(call.completion_tokens)
+    LLM_COST.labels(route, call.model, call.stage).inc(call.cost_usd)
+    turn = _current_turn.get()
+    if turn is not None:
+        turn.add(call)
@@ -0,0 +1,106 @@
+"""
+Startup-phase timing and import profiling.
+
+The FastAPI startup hook wraps each init step in `profiler.phase(...)`.
+`python -m app.startup --profile-startup` (from backend/) prints where import
+and init time goes: per top-level package (from `python -X importtime`),
+per app module, and per startup phase.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+PROFILE_STARTUP = os.getenv("PROFILE_STARTUP", "").lower() in ("1", "true", "yes")
+
+
+class StartupProfiler:
+    def __init__(self):
+        self.phases: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.phases.append((name, elapsed))
+            print(f"⏱️ Startup phase '{name}' took {elapsed * 1000:.0f} ms")
+
+    def report(self) -> str:
+        lines = ["🚀 Startup phases:"]
+        for name, elapsed in self.phases:
+            lines.append(f"  {name:<24} {elapsed * 1000:9.1f} ms")
+        lines.append(f"  {'total':<24} {sum(e for _, e in self.phases) * 1000:9.1f} ms")
+        return "\n".join(lines)
+
+
+profiler = StartupProfiler()
+
+
+def import_times(module: str = "app.main") -> Tuple[Dict[str, float], Dict[str, float]]:
+    """
+    Run `python -X importtime -c "import <module>"` in a subprocess and return
+    (self time per top-level package, cumulative time per app.* module), in seconds.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=os.getcwd(),
+    )
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        print(f"⚠️ import {module} failed in the profiling subprocess: {errors[-1] if errors else result.returncode}")
+    by_package: Dict[str, float] = defaultdict(float)
+    app_modules: Dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        except ValueError:
+            continue
+        name = name.strip()
+        by_package[name.split(".")[0]] += int(self_us) / 1e6
+        if name == "app" or name.startswith("app."):
+            app_modules[name] = int(cumulative_us) / 1e6
+    return dict(by_package), app_modules
+
+
+def profile_startup(top: int = 15) -> None:
+    by_package, app_modules = import_times()
+    print(f"📦 Import self time by package (top {top}):")
+    for name, seconds in sorted(by_package.items(), key=lambda x: x[1], reverse=True)[:top]:
+        print(f"  {name:<32} {seconds * 1000:9.1f} ms")
+    print("📦 Cumulative import time of app modules:")
+    for name, seconds in sorted(app_modules.items(), key=lambda x: x[1], reverse=True):
+        print(f"  {name:<32} {seconds * 1000:9.1f} ms")
+
+    # Re-run the startup hook in-process with warm-up awaited so every phase is measured.
+    # Under `python -m` this file is __main__, so use the profiler instance app.main records into.
+    from app.startup import profiler as shared_profiler
+    os.environ["STARTUP_WARMUP"] = "blocking"
+    with shared_profiler.phase("import app.main"):
+        import app.main
+    asyncio.run(app.main.startup())
+    print(shared_profiler.report())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile import and startup time of the API.")
+    parser.add_argument("--profile-startup", action="store_true", help="print the import and startup-phase report")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+    if args.profile_startup:
+        profile_startup(args.top)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Scripted multi-turn loan conversations for the load test.
+
+Each script is a list of (turn kind, message) pairs replayed in order within
+one session. The kinds (greeting, slot, rag, farewell) are only used to group
+client-side latencies in the report.
+"""
+import random
+from typing import List, Tuple
+
+Turn = Tuple[str, str]
+
+NAMES = ("Rahul", "Priya", "Amit", "Sneha", "Arjun", "Kavya", "Vikram", "Ananya")
+CITIES = ("Pune", "Mumbai", "Delhi", "Bangalore", "Chennai", "Hyderabad", "Jaipur", "Lucknow")
+LOAN_TYPES = ("home", "personal", "education", "vehicle", "business", "msme")
+TIMELINES = ("this month", "next month", "in 2 months", "in 3 months", "next year")
+QUESTIONS = (
+    "What documents do I need for a {loan_type} loan?",
+    "What is the current interest rate for a {loan_type} loan at SBI?",
+    "How is the EMI calculated for a {loan_type} loan?",
+    "Can I prepay my {loan_type} loan without penalty?",
+    "What credit score is required for a {loan_type} loan from HDFC Bank?",
+    "What is the maximum tenure for a {loan_type} loan?",
+)
+FAREWELLS = ("thanks, bye", "thank you", "okay thanks", "that's all, thanks")
+
+
+def chat_script(rng: random.Random, rag_questions: int = 2) -> List[Turn]:
+    """/api/chat: greeting → slot filling (name, location, income, timeline) → RAG answers → farewell."""
+    loan_type = rng.choice(LOAN_TYPES)
+    turns: List[Turn] = [
+        ("greeting", "Hi"),
+        ("slot", f"I am looking for a {loan_type} loan"),
+        ("slot", rng.choice(NAMES)),
+        ("slot", f"I live in {rng.choice(CITIES)}"),
+        ("slot", f"My monthly income is {rng.randrange(30, 250) * 1000}"),
+        ("rag", f"I plan to apply {rng.choice(TIMELINES)}"),
+    ]
+    for question in rng.sample(QUESTIONS, rag_questions):
+        turns.append(("rag", question.format(loan_type=loan_type)))
+    turns.append(("farewell", rng.choice(FAREWELLS)))
+    return turns
+
+
+def rag_chat_script(rng: random.Random, rag_questions: int = 3) -> List[Turn]:
+    """/api/rag-chat: straight FAQ questions, then a farewell."""
+    loan_type = rng.choice(LOAN_TYPES)
+    turns: List[Turn] = [("rag", q.format(loan_type=loan_type)) for q in rng.sample(QUESTIONS, rag_questions)]
+    turns.append(("farewell", rng.choice(FAREWELLS)))
+    return turns
@@ -0,0 +1,146 @@
+"""
+Fake OpenAI and Serper HTTP servers for load tests.
+
+Both APIs are served from one process: POST /v1/chat/completions answers the
+bot's prompts (classifiers, parameter extraction, web query, summaries, final
+answer) with canned responses, and POST /search returns canned organic links.
+Each call sleeps for a sample from a configurable latency distribution:
+
+    fixed:200            always 200 ms
+    uniform:100:900      uniform between 100 and 900 ms
+    lognormal:800:0.5    lognormal with median 800 ms and sigma 0.5 (long tail)
+
+Run standalone with `python -m loadtest.fakes --port 9100` (from backend/) and
+point the app at it with OPENAI_BASE_URL=http://127.0.0.1:9100/v1 and
+SERPER_API_URL=http://127.0.0.1:9100/search.
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from typing import Callable
+
+from fastapi import FastAPI, Request
+
+GREETINGS = ("hi", "hello", "hey", "good morning", "good evening", "namaste")
+FAREWELLS = ("thanks", "thank you", "bye", "goodbye", "that's all", "ok thanks", "okay thanks")
+CITIES = ("mumbai", "delhi", "pune", "bangalore", "bengaluru", "chennai", "hyderabad", "kolkata", "jaipur", "lucknow")
+
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """Turn a latency spec (see module docstring) into a sampler returning seconds."""
+    kind, *args = spec.split(":")
+    if kind == "fixed":
+        delay = float(args[0]) / 1000.0
+        return lambda: delay
+    if kind == "uniform":
+        low, high = float(args[0]) / 1000.0, float(args[1]) / 1000.0
+        return lambda: random.uniform(low, high)
+    if kind == "lognormal":
+        median, sigma = float(args[0]) / 1000.0, float(args[1])
+        return lambda: median * random.lognormvariate(0.0, sigma)
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def _quoted(prompt: str, label: str) -> str:
+    match = re.search(rf"{label}:?\s*['\"]?(.+?)['\"]?\s*(?:\n|$)", prompt)
+    return match.group(1).strip().lower() if match else ""
+
+
+def _extract(message: str) -> dict:
+    lowered = message.lower()
+    location = next((c.title() for c in CITIES if c in lowered), None)
+    income = re.search(r"(\d[\d,]*)\s*(?:per month|monthly|/month|a month)?", lowered)
+    timeline = re.search(r"(this month|next month|in \d+ months?|next year|immediately|soon)", lowered)
+    return {
+        "location": location,
+        "income": income.group(1).replace(",", "") if income and "income" in lowered else None,
+        "timeline": timeline.group(1) if timeline else None,
+    }
+
+
+def canned_completion(prompt: str) -> str:
+    """Answer the app's prompts the way a well-behaved model would."""
+    if "strict classifier" in prompt:
+        return "yes"
+    if "general greeting" in prompt:
+        return "yes" if _quoted(prompt, "Message").strip(".!? ") in GREETINGS else "no"
+    if "ending the conversation" in prompt or "end the conversation" in prompt:
+        message = _quoted(prompt, "The user sent this message") or _quoted(prompt, "User Query")
+        return "yes" if any(f in message for f in FAREWELLS) else "no"
+    if "Extract loan-related details" in prompt:
+        return json.dumps(_extract(_quoted(prompt, "User message")))
+    if "web search query" in prompt:
+        return "best home loan interest rates India 2024"
+    if prompt.startswith("Summarize"):
+        return "Banks currently offer home loans from 8.4% p.a.; processing fees range from 0.25% to 1%."
+    return (
+        "Based on your profile you are eligible for a loan from most public sector banks. "
+        "SBI and HDFC Bank currently offer competitive rates starting around 8.5% p.a."
+    )
+
+
+def create_app(openai_latency: Callable[[], float], serper_latency: Callable[[], float]) -> FastAPI:
+    app = FastAPI()
+    app.state.calls = {"openai": 0, "serper": 0}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        await asyncio.sleep(openai_latency())
+        app.state.calls["openai"] += 1
+        prompt = body["messages"][-1]["content"]
+        content = canned_completion(prompt)
+        prompt_tokens, completion_tokens = len(prompt) // 4 + 1, len(content) // 4 + 1
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    @app.post("/search")
+    async def search(request: Request):
+        body = await request.json()
+        await asyncio.sleep(serper_latency())
+        app.state.calls["serper"] += 1
+        return {
+            "searchParameters": {"q": body.get("q")},
+            "organic": [
+                {"title": f"Result {i}", "link": f"https://example.com/loans/{i}", "snippet": "Home loan rates..."}
+                for i in range(1, 6)
+            ],
+        }
+
+    @app.get("/calls")
+    async def calls():
+        return app.state.calls
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake OpenAI + Serper servers for load tests.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--openai-latency", default="lognormal:800:0.5")
+    parser.add_argument("--serper-latency", default="lognormal:300:0.4")
+    args = parser.parse_args()
+
+    app = create_app(parse_latency(args.openai_latency), parse_latency(args.serper_latency))
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""
+Load test for /api/chat and /api/rag-chat.
+
+Starts the fake OpenAI/Serper servers (loadtest.fakes) and the FastAPI app
+against them with a local database (SQLite by default), replays scripted
+multi-turn conversations (loadtest.conversations) with N concurrent users, and
+reports throughput, client-side latency per route and turn kind, server-side
+p50/p95/p99 per stage (from /metrics) and DB connection pool usage.
+
+Run from backend/:
+
+    python -m loadtest.run --users 20 --sessions 200
+    python -m loadtest.run --openai-latency lognormal:1200:0.8 --json results.json
+    python -m loadtest.run --target http://127.0.0.1:8029   # an app you started yourself
+
+The app is started with the same environment as this command, so the usual
+tuning variables (EMBEDDING_BACKEND, VECTOR_STORE_DTYPE, LLM_HEDGE_ENABLED, ...)
+apply; compare runs with and without a change before rolling it out.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from prometheus_client.parser import text_string_to_metric_families
+
+from loadtest.conversations import chat_script, rag_chat_script
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50) * 1000, 1),
+        "p95_ms": round(percentile(values, 95) * 1000, 1),
+        "p99_ms": round(percentile(values, 99) * 1000, 1),
+        "max_ms": round(max(values) * 1000, 1) if values else 0.0,
+    }
+
+
+# ---------- server-side metrics ----------
+
+def scrape(text: str) -> Tuple[Dict[Tuple[str, str], Dict[float, float]], Dict[str, float]]:
+    """Cumulative stage-histogram buckets keyed by (route, stage), plus DB pool gauges."""
+    buckets: Dict[Tuple[str, str], Dict[float, float]] = defaultdict(lambda: defaultdict(float))
+    gauges: Dict[str, float] = {}
+    for family in text_string_to_metric_families(text):
+        for sample in family.samples:
+            if sample.name == "loanbot_stage_duration_seconds_bucket":
+                key = (sample.labels["route"], sample.labels["stage"])
+                buckets[key][float(sample.labels["le"])] += sample.value  # summed across models
+            elif sample.name.startswith("loanbot_db_pool"):
+                gauges[sample.name] = sample.value
+    return buckets, gauges
+
+
+def histogram_quantile(q: float, buckets: Dict[float, float]) -> float:
+    """Prometheus-style quantile estimate from cumulative buckets (linear within a bucket)."""
+    bounds = sorted(buckets)
+    total = buckets[bounds[-1]] if bounds else 0
+    if total <= 0:
+        return 0.0
+    rank, prev_bound, prev_count = q * total, 0.0, 0.0
+    for bound in bounds:
+        count = buckets[bound]
+        if count >= rank:
+            if bound == float("inf"):
+                return prev_bound
+            width = count - prev_count
+            return prev_bound + (bound - prev_bound) * ((rank - prev_count) / width if width else 1.0)
+        prev_bound, prev_count = bound, count
+    return prev_bound
+
+
+def stage_report(before: Dict, after: Dict) -> Dict[str, Dict[str, Dict[str, float]]]:
+    report: Dict[str, Dict[str, Dict[str, float]]] = defaultdict(dict)
+    for (route, stage), cumulative in sorted(after.items()):
+        delta = {le: count - before.get((route, stage), {}).get(le, 0.0) for le, count in cumulative.items()}
+        count = delta.get(float("inf"), 0.0)
+        if count <= 0:
+            continue
+        report[route][stage] = {
+            "count": int(count),
+            **{f"p{int(q * 100)}_ms": round(histogram_quantile(q, delta) * 1000, 1) for q in (0.5, 0.95, 0.99)},
+        }
+    return report
+
+
+# ---------- load generation ----------
+
+class Results:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)  # "route/kind" -> seconds
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.turns = 0
+        self.sessions = 0
+        self.pool_samples: List[float] = []
+
+
+async def run_session(client: httpx.AsyncClient, route: str, script, model: str, results: Results):
+    headers = {"session_id": f"loadtest-{uuid.uuid4().hex}", "user_uuid": str(uuid.uuid4())}
+    for kind, message in script:
+        started = time.perf_counter()
+        try:
+            response = await client.post(f"/api/{route}", json={"message": message, "model": model}, headers=headers)
+            elapsed = time.perf_counter() - started
+            if response.status_code != 200:
+                results.errors[f"{route}:{response.status_code}"] += 1
+                return
+            results.latencies[f"{route}/{kind}"].append(elapsed)
+            results.latencies[route].append(elapsed)
+            results.turns += 1
+        except httpx.HTTPError as e:
+            results.errors[f"{route}:{type(e).__name__}"] += 1
+            return
+    results.sessions += 1
+
+
+async def user_loop(client, queue: asyncio.Queue, args, results: Results, rng: random.Random):
+    while True:
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        if rng.random() < args.rag_share:
+            await run_session(client, "rag-chat", rag_chat_script(rng, args.rag_questions), args.model, results)
+        else:
+            await run_session(client, "chat", chat_script(rng, args.rag_questions), args.model, results)
+
+
+async def sample_pool(client: httpx.AsyncClient, results: Results, interval: float, stop: asyncio.Event):
+    while not stop.is_set():
+        try:
+            _, gauges = scrape((await client.get("/metrics")).text)
+            if "loanbot_db_pool_checked_out" in gauges:
+                results.pool_samples.append(gauges["loanbot_db_pool_checked_out"])
+        except httpx.HTTPError:
+            pass
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def drive(args) -> dict:
+    results = Results()
+    rng = random.Random(args.seed)
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(args.sessions):
+        queue.put_nowait(i)
+
+    limits = httpx.Limits(max_connections=args.users + 2)
+    async with httpx.AsyncClient(base_url=args.target, timeout=args.timeout, limits=limits) as client:
+        before, _ = scrape((await client.get("/metrics")).text)
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(sample_pool(client, results, 1.0, stop))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            user_loop(client, queue, args, results, random.Random(rng.random())) for _ in range(args.users)
+        ))
+        duration = time.perf_counter() - started
+
+        stop.set()
+        await sampler
+        after, gauges = scrape((await client.get("/metrics")).text)
+
+    pool = results.pool_samples
+    return {
+        "config": {
+            "users": args.users, "sessions": args.sessions, "rag_share": args.rag_share, "model": args.model,
+            "openai_latency": args.openai_latency, "serper_latency": args.serper_latency,
+        },
+        "duration_s": round(duration, 2),
+        "throughput": {
+            "turns_per_s": round(results.turns / duration, 2) if duration else 0.0,
+            "sessions_per_s": round(results.sessions / duration, 3) if duration else 0.0,
+            "turns": results.turns,
+            "sessions": results.sessions,
+        },
+        "errors": dict(results.errors),
+        "client_latency": {key: summarize(values) for key, values in sorted(results.latencies.items())},
+        "server_stages": stage_report(before, after),
+        "db_pool": {
+            "size": gauges.get("loanbot_db_pool_size"),
+            "checked_out_max": max(pool) if pool else None,
+            "checked_out_avg": round(sum(pool) / len(pool), 2) if pool else None,
+        },
+    }
+
+
+# ---------- process management ----------
+
+def wait_until_up(url: str, timeout: float, process: Optional[subprocess.Popen] = None):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"❌ Process for {url} exited with code {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"❌ {url} not ready after {timeout:.0f}s")
+
+
+def start_stack(args) -> List[subprocess.Popen]:
+    fakes_url = f"http://127.0.0.1:{args.fakes_port}"
+    fakes = subprocess.Popen(
+        [sys.executable, "-m", "loadtest.fakes", "--port", str(args.fakes_port),
+         "--openai-latency", args.openai_latency, "--serper-latency", args.serper_latency],
+        cwd=BACKEND_DIR,
+    )
+    wait_until_up(f"{fakes_url}/calls", 30, fakes)
+
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": "loadtest",
+        "OPENAI_BASE_URL": f"{fakes_url}/v1",
+        "OPENAI_MAX_RETRIES": "0",
+        "SERPER_API_KEY": "loadtest",
+        "SERPER_API_URL": f"{fakes_url}/search",
+        "DATABASE_URL": args.database_url,
+        "SQL_ECHO": "0",
+        "STARTUP_WARMUP": "blocking",
+        "LOG_SAMPLE_RATE": os.getenv("LOG_SAMPLE_RATE", "0"),
+        # Scripted users type much faster than people; keep per-user/session rate limits out of the way
+        "USER_RATE_PER_MINUTE": os.getenv("USER_RATE_PER_MINUTE", "6000"),
+        "SESSION_RATE_PER_MINUTE": os.getenv("SESSION_RATE_PER_MINUTE", "6000"),
+    }
+    env.pop("GEMINI_API_KEY", None)
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(args.app_port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    wait_until_up(f"http://127.0.0.1:{args.app_port}/ready", args.startup_timeout, app)
+    return [fakes, app]
+
+
+def print_report(report: dict):
+    t = report["throughput"]
+    print(f"\n📈 {t['turns']} turns / {t['sessions']} sessions in {report['duration_s']}s "
+          f"→ {t['turns_per_s']} turns/s, {t['sessions_per_s']} sessions/s")
+    if report["errors"]:
+        print(f"❌ Errors: {report['errors']}")
+
+    print("\n⏱️ Client latency (ms)")
+    print(f"  {'route/turn':<22}{'count':>7}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for key, s in report["client_latency"].items():
+        print(f"  {key:<22}{s['count']:>7}{s['p50_ms']:>10}{s['p95_ms']:>10}{s['p99_ms']:>10}{s['max_ms']:>10}")
+
+    print("\n🔬 Server stages (ms, from /metrics histograms)")
+    print(f"  {'route':<10}{'stage':<20}{'count':>7}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for route, stages in report["server_stages"].items():
+        for stage, s in stages.items():
+            print(f"  {route:<10}{stage:<20}{s['count']:>7}{s['p50_ms']:>10}{s['p95_ms']:>10}{s['p99_ms']:>10}")
+
+    pool = report["db_pool"]
+    print(f"\n🗄️ DB pool: size {pool['size']}, checked out max {pool['checked_out_max']}, avg {pool['checked_out_avg']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test /api/chat and /api/rag-chat against fake upstreams.")
+    parser.add_argument("--users", type=int, default=10, help="concurrent simulated users")
+    parser.add_argument("--sessions", type=int, default=50, help="total conversations to replay")
+    parser.add_argument("--rag-share", type=float, default=0.5, help="fraction of sessions sent to /api/rag-chat")
+    parser.add_argument("--rag-questions", type=int, default=2, help="FAQ questions per conversation")
+    parser.add_argument("--model", default="GPT-4")
+    parser.add_argument("--openai-latency", default="lognormal:800:0.5", help="see loadtest.fakes")
+    parser.add_argument("--serper-latency", default="lognormal:300:0.4")
+    parser.add_argument("--database-url", default="sqlite+aiosqlite:///./loadtest.db",
+                        help="local DB for the app (e.g. a throwaway Postgres: postgresql+asyncpg://...)")
+    parser.add_argument("--target", help="URL of an already running app; skips starting fakes and app")
+    parser.add_argument("--app-port", type=int, default=8129)
+    parser.add_argument("--fakes-port", type=int, default=9100)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers (DB pool stats come from one worker)")
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    parser.add_argument("--timeout", type=float, default=120, help="per-request client timeout in seconds")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    processes: List[subprocess.Popen] = []
+    try:
+        if not args.target:
+            processes = start_stack(args)
+            args.target = f"http://127.0.0.1:{args.app_port}"
+        report = asyncio.run(drive(args))
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
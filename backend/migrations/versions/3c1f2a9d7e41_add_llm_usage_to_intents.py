@@ -0,0 +1,35 @@
+"""Add llm_usage to intents
+
+Revision ID: 3c1f2a9d7e41
+Revises: 907c446f5c3a
+Create Date: 2025-07-02 10:12:44.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1f2a9d7e41'
+down_revision: Union[str, None] = '907c446f5c3a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_intents() -> bool:
+    # `intents` is created by the app on startup (Intent.metadata.create_all), not by an earlier revision
+    return sa.inspect(op.get_bind()).has_table('intents')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if _has_intents():
+        op.add_column('intents', sa.Column('llm_usage', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if _has_intents():
+        op.drop_column('intents', 'llm_usage')
@@ -0,0 +1,157 @@
+"""Partition intents by month and add session_summaries
+
+Revision ID: 5e9b07c2d4a8
+Revises: 3c1f2a9d7e41
+Create Date: 2025-07-21 09:40:12.503117
+
+On PostgreSQL `intents` becomes a table range-partitioned on created_at, one
+partition per month plus a default; existing rows are copied over and ids keep
+their sequence. The primary key becomes (id, created_at), as PostgreSQL
+requires the partition key in it. Other databases only get the new
+(session_id, created_at) index. `session_summaries` holds the sessions that
+the retention job (app.services.intent_storage) compacted.
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.services.intent_storage import ensure_partitions, is_partitioned, month_start
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e9b07c2d4a8'
+down_revision: Union[str, None] = '3c1f2a9d7e41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = (
+    "id, name, description, loan_type, last_user_query, user_uuid, session_id, "
+    "user_message, bot_response, intent, parameters, context, llm_usage, created_at"
+)
+
+
+def _has_table(name: str) -> bool:
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def _create_partitioned_intents() -> None:
+    op.execute("""
+        CREATE TABLE intents (
+            id INTEGER NOT NULL DEFAULT nextval('intents_id_seq'),
+            name VARCHAR,
+            description VARCHAR,
+            loan_type VARCHAR,
+            last_user_query TEXT,
+            user_uuid UUID NOT NULL,
+            session_id VARCHAR NOT NULL,
+            user_message TEXT NOT NULL,
+            bot_response TEXT,
+            intent VARCHAR,
+            parameters JSON,
+            context JSON,
+            llm_usage JSON,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute("CREATE TABLE intents_default PARTITION OF intents DEFAULT")
+    op.create_index('ix_intents_id', 'intents', ['id'])
+    op.create_index('ix_intents_user_uuid', 'intents', ['user_uuid'])
+    op.create_index('ix_intents_session_created', 'intents', ['session_id', 'created_at'])
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if not _has_table('session_summaries'):
+        op.create_table('session_summaries',
+        sa.Column('session_id', sa.String(), nullable=False),
+        sa.Column('user_uuid', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('turns', sa.Integer(), nullable=False),
+        sa.Column('first_at', sa.DateTime(), nullable=False),
+        sa.Column('last_at', sa.DateTime(), nullable=False),
+        sa.Column('intents', sa.JSON(), nullable=True),
+        sa.Column('answer_tiers', sa.JSON(), nullable=True),
+        sa.Column('parameters', sa.JSON(), nullable=True),
+        sa.Column('memory', sa.JSON(), nullable=True),
+        sa.Column('llm_usage', sa.JSON(), nullable=True),
+        sa.Column('compacted_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('session_id')
+        )
+        op.create_index(op.f('ix_session_summaries_user_uuid'), 'session_summaries', ['user_uuid'], unique=False)
+
+    if bind.dialect.name != 'postgresql':
+        # `intents` is created by the app on startup (Intent.metadata.create_all), not by an earlier revision
+        if _has_table('intents'):
+            indexes = {ix['name'] for ix in sa.inspect(bind).get_indexes('intents')}
+            if 'ix_intents_session_created' not in indexes:
+                op.create_index('ix_intents_session_created', 'intents', ['session_id', 'created_at'])
+            if 'ix_intents_session_id' in indexes:
+                op.drop_index('ix_intents_session_id', table_name='intents')
+        return
+
+    if is_partitioned(bind):
+        return
+    oldest = None  # first month that needs a partition for copied rows
+    if _has_table('intents'):
+        oldest = bind.execute(sa.text("SELECT min(created_at) FROM intents")).scalar()
+        op.rename_table('intents', 'intents_unpartitioned')
+        op.execute("ALTER TABLE intents_unpartitioned RENAME CONSTRAINT intents_pkey TO intents_unpartitioned_pkey")
+        for index in ('ix_intents_id', 'ix_intents_user_uuid', 'ix_intents_session_id', 'ix_intents_session_created'):
+            op.execute(f"DROP INDEX IF EXISTS {index}")
+    else:
+        op.execute("CREATE SEQUENCE IF NOT EXISTS intents_id_seq")
+
+    _create_partitioned_intents()
+    since = month_start(oldest.date()) if oldest else month_start(datetime.utcnow().date())
+    ensure_partitions(bind, since=since)
+
+    # An existing sequence belongs to the old id column; hand it over before dropping the old table
+    op.execute("ALTER SEQUENCE intents_id_seq OWNED BY intents.id")
+    if _has_table('intents_unpartitioned'):
+        op.execute(f"INSERT INTO intents ({COLUMNS}) SELECT {COLUMNS} FROM intents_unpartitioned")
+        op.drop_table('intents_unpartitioned')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql' and is_partitioned(bind):
+        op.rename_table('intents', 'intents_partitioned')
+        op.execute("ALTER TABLE intents_partitioned RENAME CONSTRAINT intents_pkey TO intents_partitioned_pkey")
+        op.execute("""
+            CREATE TABLE intents (
+                id INTEGER NOT NULL DEFAULT nextval('intents_id_seq') PRIMARY KEY,
+                name VARCHAR,
+                description VARCHAR,
+                loan_type VARCHAR,
+                last_user_query TEXT,
+                user_uuid UUID NOT NULL,
+                session_id VARCHAR NOT NULL,
+                user_message TEXT NOT NULL,
+                bot_response TEXT,
+                intent VARCHAR,
+                parameters JSON,
+                context JSON,
+                llm_usage JSON,
+                created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
+            )
+        """)
+        op.execute(f"INSERT INTO intents ({COLUMNS}) SELECT {COLUMNS} FROM intents_partitioned")
+        op.execute("ALTER SEQUENCE intents_id_seq OWNED BY intents.id")
+        op.drop_table('intents_partitioned')
+        op.create_index('ix_intents_id', 'intents', ['id'])
+        op.create_index('ix_intents_user_uuid', 'intents', ['user_uuid'])
+        op.create_index('ix_intents_session_id', 'intents', ['session_id'])
+    elif _has_table('intents'):
+        indexes = {ix['name'] for ix in sa.inspect(bind).get_indexes('intents')}
+        if 'ix_intents_session_id' not in indexes:
+            op.create_index('ix_intents_session_id', 'intents', ['session_id'])
+        if 'ix_intents_session_created' in indexes:
+            op.drop_index('ix_intents_session_created', table_name='intents')
+    if _has_table('session_summaries'):
+        op.drop_index(op.f('ix_session_summaries_user_uuid'), table_name='session_summaries')
+        op.drop_table('session_summaries')
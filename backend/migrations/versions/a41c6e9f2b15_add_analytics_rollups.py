@@ -0,0 +1,72 @@
+"""Add conversation analytics rollup tables
+
+Revision ID: a41c6e9f2b15
+Revises: 5e9b07c2d4a8
+Create Date: 2025-07-28 14:05:37.219846
+
+The rollups are filled from existing `intents` rows by the first run of
+app.services.analytics (watermark starts at 0).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41c6e9f2b15'
+down_revision: Union[str, None] = '5e9b07c2d4a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+STAGES = ('greeting', 'loan_inquiry', 'loan_rag', 'farewell', 'high_income_check', 'irrelevant')
+
+
+def _has_table(name: str) -> bool:
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The app also creates these on startup (Intent.metadata.create_all)
+    if not _has_table('analytics_daily'):
+        op.create_table('analytics_daily',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('sessions', sa.Integer(), nullable=False),
+        sa.Column('turns', sa.Integer(), nullable=False),
+        *(sa.Column(stage, sa.Integer(), nullable=False) for stage in STAGES),
+        sa.PrimaryKeyConstraint('day')
+        )
+    if not _has_table('analytics_daily_loan_types'):
+        op.create_table('analytics_daily_loan_types',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('loan_type', sa.String(), nullable=False),
+        sa.Column('sessions', sa.Integer(), nullable=False),
+        sa.Column('turns', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'loan_type')
+        )
+    if not _has_table('analytics_sessions'):
+        op.create_table('analytics_sessions',
+        sa.Column('session_id', sa.String(), nullable=False),
+        sa.Column('first_day', sa.Date(), nullable=False),
+        sa.Column('last_at', sa.DateTime(), nullable=False),
+        sa.Column('turns', sa.Integer(), nullable=False),
+        sa.Column('stages', sa.Integer(), nullable=False),
+        sa.Column('loan_type', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('session_id')
+        )
+    if not _has_table('analytics_watermark'):
+        op.create_table('analytics_watermark',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('last_intent_id', sa.Integer(), nullable=False),
+        sa.Column('last_created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name in ('analytics_watermark', 'analytics_sessions', 'analytics_daily_loan_types', 'analytics_daily'):
+        if _has_table(name):
+            op.drop_table(name)
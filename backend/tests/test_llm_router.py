@@ -0,0 +1,93 @@
+import contextvars
+import time
+
+import pytest
+
+from app.services.deadline import DeadlineExceeded, start_deadline
+from app.services.llm import CircuitBreaker, LLMProvider, ProviderError, ProviderQuotaError
+from app.services.llm_router import LLMRouter
+
+
+class StubProvider(LLMProvider):
+    name = "stub"
+    MODEL_CHOICES = {"Stub": "stub-1"}
+    default_model = "stub-1"
+
+    def __init__(self):
+        self.outcomes = []  # exceptions to raise or responses to return, in call order
+
+    def generate_response(self, message, model=None, timeout=None):
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+
+def open_router():
+    """A router whose only circuit has tripped and is already half-open."""
+    provider = StubProvider()
+    router = LLMRouter([provider], hedging=False)
+    router.breakers["stub"] = CircuitBreaker(failure_threshold=5, recovery_timeout=0.0)
+    provider.outcomes = [ProviderQuotaError("quota", "stub") for _ in range(5)]
+    for _ in range(5):
+        with pytest.raises(ProviderQuotaError):
+            router.generate_response("hi")
+    assert router.breakers["stub"].state == "half-open"
+    return router, provider
+
+
+@pytest.mark.parametrize("trial_error", [ProviderError("bad request", "stub"), ValueError("unexpected")])
+def test_failed_trial_call_frees_the_half_open_slot(trial_error):
+    router, provider = open_router()
+    provider.outcomes = [trial_error, "ok"]
+    with pytest.raises(type(trial_error)):
+        router.generate_response("hi")
+
+    assert router.generate_response("hi") == "ok"
+    assert router.breakers["stub"].state == "closed"
+
+
+def test_retryable_trial_failure_reopens_the_circuit():
+    router, provider = open_router()
+    router.breakers["stub"].recovery_timeout = 60.0
+    router.breakers["stub"].opened_at -= 60.0  # recovery period over: next call is the trial
+    provider.outcomes = [ProviderQuotaError("quota", "stub")]
+    with pytest.raises(ProviderQuotaError):
+        router.generate_response("hi")
+
+    assert router.breakers["stub"].state == "open"
+    with pytest.raises(ProviderError, match="all circuits open"):
+        router.generate_response("hi")
+
+
+def test_spent_budget_does_not_take_the_half_open_slot():
+    router, provider = open_router()
+    context = contextvars.copy_context()
+    context.run(start_deadline, 1)
+    time.sleep(0.01)
+    with pytest.raises(DeadlineExceeded):
+        context.run(router.generate_response, "hi")
+
+    provider.outcomes = ["ok"]
+    assert router.generate_response("hi") == "ok"
+
+
+def test_known_model_of_an_unconfigured_provider_falls_back_to_the_default():
+    router = LLMRouter([StubProvider()], hedging=False, known_models=["GPT-4", "gpt-4"])
+
+    def select(model):
+        router.set_model(model)
+        return router.model
+
+    assert contextvars.copy_context().run(select, "Stub") == "Stub"
+    assert contextvars.copy_context().run(select, "GPT-4") == "stub-1"
+    with pytest.raises(ValueError, match="Invalid model name"):
+        contextvars.copy_context().run(select, "GPT-9")
+
+
+@pytest.mark.parametrize("task", ["is_loan_related", "is_greeting", "is_exit", "extract_parameters"])
+def test_classifiers_let_a_spent_budget_through(task):
+    provider = StubProvider()
+    provider.outcomes = [DeadlineExceeded("budget spent")]
+    with pytest.raises(DeadlineExceeded):
+        getattr(provider, task)("maybe")
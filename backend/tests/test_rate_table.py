@@ -0,0 +1,45 @@
+import pytest
+
+from app.rag.rate_table import LenderRateTable, extract_facts, is_ranking_question
+
+
+def test_tenure_range_keeps_the_longest():
+    facts = extract_facts(
+        "What is the repayment period for a personal loan from IDFC FIRST Bank?",
+        "IDFC FIRST Bank offers flexible repayment plans for personal loans, ranging from 2 months to 60 months.",
+        "personal",
+    )
+    assert facts["max_tenure_months"] == 60
+
+
+def test_amounts_for_other_products_are_not_attributed():
+    table = LenderRateTable.from_rows([
+        ("personal loan from Tata Capital NBFC India",
+         "What is the maximum loan amount I can get from Tata Capital NBFC India?",
+         "Tata Capital NBFC India offers loans up to ₹10 Crores for property and up to ₹90 lakhs for business loans."),
+        ("personal loan from Tata Capital NBFC India",
+         "What is the starting interest rate for personal loans at Tata Capital NBFC India?",
+         "The starting interest rate for personal loans at Tata Capital NBFC India is 11.50% per annum."),
+    ])
+    assert table.row(0)["max_amount"] is None
+
+
+def test_clauses_without_a_product_still_count():
+    facts = extract_facts(
+        "What is the maximum amount I can borrow as an education loan from Tata Capital NBFC India?",
+        "You can borrow up to ₹ 85 Lakhs without collateral and up to ₹ 2 crore with collateral.",
+        "education",
+    )
+    assert facts["max_amount"] == 2e7
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("When is the best time to apply for a personal loan?", False),
+    ("What is the most important document for a home loan?", False),
+    ("Which is the cheapest home loan?", True),
+    ("Lowest interest rate for a personal loan", True),
+    ("Which bank gives the maximum loan amount for education?", True),
+    ("Compare personal loans", True),
+])
+def test_ranking_questions_need_a_comparison_or_a_figure(message, expected):
+    assert is_ranking_question(message) is expected
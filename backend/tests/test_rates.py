@@ -0,0 +1,14 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import rates
+
+client = TestClient(FastAPI(routes=rates.router.routes))
+
+
+@pytest.mark.parametrize("path", ["/rates?loan_type=xyz", "/rates/compare?lender=SBI&lender=HDFC&loan_type=xyz"])
+def test_unknown_loan_type_is_rejected(path):
+    response = client.get(path)
+    assert response.status_code == 400
+    assert "loan_type" in response.json()["detail"]
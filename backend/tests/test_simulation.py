@@ -0,0 +1,54 @@
+import json
+
+import pytest
+from pydantic import ValidationError
+
+from app.schemas import SimulationRequest
+from app.services.loan_simulation import MAX_COMBINATIONS, answer_borrowing_question, grid_size, simulate
+
+
+@pytest.mark.parametrize("field, value", [
+    ("tenures_months", [0, 12]),
+    ("rates", [-1.0]),
+    ("lenders", {"SBI": -0.5}),
+    ("amounts", [0]),
+    ("amounts", [100000.0] * 51),
+])
+def test_simulation_request_rejects_bad_grids(field, value):
+    with pytest.raises(ValidationError):
+        SimulationRequest(monthly_income=80000, **{field: value})
+
+
+def test_valid_request_simulates_to_json():
+    request = SimulationRequest(monthly_income=80000, loan_type="personal", tenures_months=[12, 24], rates=[0, 11.5])
+    result = simulate(request.monthly_income, loan_type=request.loan_type, tenures=request.tenures_months,
+                      rates=request.rates)
+    json.dumps(result, allow_nan=False)
+    assert len(result["combinations"]) == 2 * 2 * 4
+
+
+def test_grid_size_matches_simulation_and_caps_large_grids():
+    assert grid_size("home") == len(simulate(80000, loan_type="home")["combinations"])
+    assert grid_size(None, amounts=[1e5] * 50, tenures=[12] * 50, rates=[9.0] * 50) > MAX_COMBINATIONS
+
+
+@pytest.mark.parametrize("message", [
+    "How much can I borrow?",
+    "How much loan can I get for a home?",
+    "How much am I eligible for?",
+    "What is the maximum loan amount for me?",
+    "Can I afford a 50 lakh home loan?",
+])
+def test_borrowing_capacity_questions_are_simulated(message):
+    assert answer_borrowing_question(message, "home", "80000") is not None
+
+
+@pytest.mark.parametrize("message", [
+    "How much is the processing fee for an SBI personal loan?",
+    "How much time does it take to get a home loan approved?",
+    "How much interest will I pay on a 5 lakh loan?",
+    "How much down payment do I need for a home loan?",
+    "How much can I borrow as a personal loan from Standard Chartered India?",
+])
+def test_other_how_much_questions_are_left_to_the_faq(message):
+    assert answer_borrowing_question(message, "personal", "80000") is None